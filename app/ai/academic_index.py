@@ -0,0 +1,120 @@
+from bisect import bisect_left, insort
+from heapq import merge
+from itertools import groupby
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+import os
+import time
+from ..models.models import Utilisateur, RoleEnum
+
+# Rebuild from the database after this many seconds, to pick up writes made by other workers
+ACADEMIC_INDEX_TTL = float(os.getenv("ACADEMIC_INDEX_TTL", "300"))
+
+# (filiere value, niveau) of a student; either may be missing on incomplete profiles
+BucketKey = Tuple[Optional[str], Optional[int]]
+
+
+def _bucket_key(filiere, niveau) -> BucketKey:
+    filiere = filiere.value if hasattr(filiere, 'value') else filiere
+    niveau = int(niveau.value if hasattr(niveau, 'value') else niveau) if niveau else None
+    return (filiere or None, niveau)
+
+
+class AcademicBucketIndex:
+    """
+    Active students grouped by (filiere, niveau), each bucket a sorted list of user ids.
+
+    Filiere/niveau matchers give every student of a bucket the same score, so a
+    ranking is produced by visiting buckets in score order (ties merged by id)
+    and stopping once enough users are found, instead of scoring every profile.
+    """
+
+    def __init__(self, ttl: float = ACADEMIC_INDEX_TTL):
+        self.ttl = ttl
+        self._buckets: Dict[BucketKey, List[int]] = {}
+        self._bucket_of: Dict[int, BucketKey] = {}
+        self.loaded_at: Optional[float] = None
+
+    async def ensure_loaded(self):
+        """Build the index with a single query on first use, or once the TTL has expired"""
+        if self.loaded_at is not None and time.monotonic() - self.loaded_at < self.ttl:
+            return
+        rows = await Utilisateur.filter(
+            user_roles__role=RoleEnum.STUDENT, user_roles__statut='active'
+        ).distinct().values_list('id', 'filiere', 'niveau')
+        buckets: Dict[BucketKey, List[int]] = {}
+        bucket_of: Dict[int, BucketKey] = {}
+        for user_id, filiere, niveau in sorted(set(rows)):
+            key = _bucket_key(filiere, niveau)
+            buckets.setdefault(key, []).append(user_id)
+            bucket_of[user_id] = key
+        self._buckets = buckets
+        self._bucket_of = bucket_of
+        self.loaded_at = time.monotonic()
+
+    def set_user(self, user_id: int, filiere, niveau):
+        """Add a student or move them to their new bucket (called when a profile is rewritten)"""
+        self.remove_user(user_id)
+        key = _bucket_key(filiere, niveau)
+        insort(self._buckets.setdefault(key, []), user_id)
+        self._bucket_of[user_id] = key
+
+    def remove_user(self, user_id: int):
+        key = self._bucket_of.pop(user_id, None)
+        if key is None:
+            return
+        bucket = self._buckets[key]
+        del bucket[bisect_left(bucket, user_id)]
+        if not bucket:
+            del self._buckets[key]
+
+    def student_ids(self) -> Set[int]:
+        return set(self._bucket_of)
+
+    def __len__(self) -> int:
+        return len(self._bucket_of)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._bucket_of
+
+    def ranked(self, bucket_score: Callable[[Optional[str], Optional[int]], float], limit: int,
+               min_score: float = 0.0, exclude_ids: Iterable[int] = (),
+               candidate_ids: Optional[Set[int]] = None) -> List[Tuple[int, float]]:
+        """
+        Best `limit` students by bucket score, ties broken by id
+
+        Args:
+            bucket_score: Score of a (filiere, niveau) bucket
+            min_score: Only students scoring strictly above it are returned
+            exclude_ids: Users to leave out (typically the requester)
+            candidate_ids: Restrict to these users (None means every indexed student)
+
+        Returns:
+            (user id, score) pairs, best first
+        """
+        exclude_ids = set(exclude_ids)
+        scored = sorted(
+            ((bucket_score(*key), key) for key in self._buckets),
+            key=lambda x: -x[0]
+        )
+        results = []
+        for score, group in groupby(scored, key=lambda x: x[0]):
+            if score <= min_score or len(results) >= limit:
+                break
+            for user_id in merge(*(self._buckets[key] for _, key in group)):
+                if user_id in exclude_ids or (candidate_ids is not None and user_id not in candidate_ids):
+                    continue
+                results.append((user_id, score))
+                if len(results) >= limit:
+                    break
+        return results
+
+
+_academic_index: Optional[AcademicBucketIndex] = None
+
+
+def get_academic_index() -> AcademicBucketIndex:
+    """Return the process-wide filiere/niveau bucket index"""
+    global _academic_index
+    if _academic_index is None:
+        _academic_index = AcademicBucketIndex()
+    return _academic_index
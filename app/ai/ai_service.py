@@ -1,16 +1,42 @@
 from typing import List, Dict, Optional
+import asyncio
+import os
+import time
 from .recommendation_service import RecommendationService
-from ..models.models import RoleEnum
+from .model_registry import ModelRegistry
+from .snapshot import RecommendationSnapshot
+from .compatibility import compatibility_factors, compatibility_report, compatibility_matrix
+from .team_formation import form_teams, TEAM_FORMATION_TIME_LIMIT
+from .mentor_assignment import assign_mentors, mentor_assignment_scores, MENTOR_CAPACITY
+from ..models.models import (
+    RoleEnum, FiliereEnum, NiveauEnum, RequestTypeEnum, Utilisateur, UtilisateurGroupe,
+    UtilisateurMentor, UtilisateurRequest
+)
 import numpy as np
+
+# Time budget of each get_smart_recommendations section, in milliseconds
+DEFAULT_SECTION_BUDGET_MS = float(os.getenv("RECOMMENDATION_SECTION_BUDGET_MS", "1500"))
+SECTION_BUDGETS_MS = {
+    'study_buddies': DEFAULT_SECTION_BUDGET_MS,
+    'mentors': DEFAULT_SECTION_BUDGET_MS,
+    'interdisciplinary_collaborators': DEFAULT_SECTION_BUDGET_MS,
+    # May have to encode changed profiles before scoring
+    'semantic_matches': float(os.getenv("SEMANTIC_SECTION_BUDGET_MS", "4000")),
+    'recommended_groups': DEFAULT_SECTION_BUDGET_MS
+}
+
+
 class AIService:
     """
     Main AI service that provides intelligent recommendations for student connections
     """
     
-    def __init__(self):
-        self.recommendation_service = RecommendationService()
+    def __init__(self, registry: Optional[ModelRegistry] = None):
+        self.recommendation_service = RecommendationService(registry)
     
-    async def get_smart_recommendations(self, user_id: int, recommendation_type: str = "all", limit: int = 10) -> Dict:
+    async def get_smart_recommendations(self, user_id: int, recommendation_type: str = "all", limit: int = 10,
+                                        debug: bool = False,
+                                        budgets_ms: Optional[Dict[str, float]] = None) -> Dict:
         """
         Get comprehensive recommendations based on user profile and preferences
         
@@ -18,11 +44,20 @@ class AIService:
             user_id: ID of the user requesting recommendations
             recommendation_type: Type of recommendations ('study_buddies', 'mentors', 'collaborators', 'all')
             limit: Maximum number of recommendations per category
+            debug: Add a 'debug' block with per-section latency
+            budgets_ms: Per-section time budgets overriding SECTION_BUDGETS_MS
         
         Returns:
-            Dictionary with different types of recommendations
+            Dictionary with different types of recommendations; a section that missed
+            its budget comes back empty with 'degraded': True
         """
-        user_profile = await self.recommendation_service.get_user_profile_data(user_id)
+        started_at = time.perf_counter()
+        # Every section scores against the same request-scoped data
+        snapshot = RecommendationSnapshot(self.recommendation_service, user_id)
+        if recommendation_type == 'all':
+            # One pool load serves every section; role pools are filtered from it in memory
+            await snapshot.pool()
+        user_profile = await snapshot.user_profile()
         user_roles = [role.value if hasattr(role, 'value') else str(role) for role in user_profile.get('roles', [])]
         
         recommendations = {
@@ -37,48 +72,68 @@ class AIService:
             }
         }
         
-        # Study buddies - for students
+        # Sections run concurrently against the snapshot, each within its own budget
+        service = self.recommendation_service
+        sections = []
+        # Study buddies and mentors - for students
         if recommendation_type in ['study_buddies', 'all'] and RoleEnum.STUDENT.value in user_roles:
-            study_buddies = await self.recommendation_service.find_study_buddies(user_id, limit//2)
-            recommendations['study_buddies'] = {
-                'count': len(study_buddies),
-                'recommendations': study_buddies
-            }
-        
-        # Mentors - for students
+            sections.append(('study_buddies', service.find_study_buddies(user_id, limit//2, snapshot=snapshot)))
         if recommendation_type in ['mentors', 'all'] and RoleEnum.STUDENT.value in user_roles:
-            mentors = await self.recommendation_service.find_mentors(user_id, limit//3)
-            recommendations['mentors'] = {
-                'count': len(mentors),
-                'recommendations': mentors
-            }
-        
+            sections.append(('mentors', service.find_mentors(user_id, limit//3, snapshot=snapshot)))
         # Interdisciplinary collaborators
         if recommendation_type in ['collaborators', 'all']:
-            collaborators = await self.recommendation_service.find_interdisciplinary_collaborators(user_id, limit//3)
-            recommendations['interdisciplinary_collaborators'] = {
-                'count': len(collaborators),
-                'recommendations': collaborators
-            }
-        
+            sections.append(('interdisciplinary_collaborators', service.find_interdisciplinary_collaborators(user_id, limit//3, snapshot=snapshot)))
         # Semantic matches (people with similar overall profiles)
         if recommendation_type in ['semantic', 'all']:
-            semantic_matches = await self.recommendation_service.get_semantic_matches(user_id, limit//4)
-            recommendations['semantic_matches'] = {
-                'count': len(semantic_matches),
-                'recommendations': semantic_matches
-            }
-        
+            sections.append(('semantic_matches', service.get_semantic_matches(user_id, limit//4, snapshot=snapshot)))
         # Group recommendations
         if recommendation_type in ['groups', 'all']:
-            group_recommendations = await self.recommendation_service.get_group_recommendations(user_id, limit//2)
-            recommendations['recommended_groups'] = {
-                'count': len(group_recommendations),
-                'recommendations': group_recommendations
+            sections.append(('recommended_groups', service.get_group_recommendations(user_id, limit//2, snapshot=snapshot)))
+        
+        budgets = {**SECTION_BUDGETS_MS, **(budgets_ms or {})}
+        outcomes = await asyncio.gather(*(
+            self._run_section(coro, budgets.get(name, DEFAULT_SECTION_BUDGET_MS)) for name, coro in sections
+        ))
+        
+        timings = {}
+        for (name, _), (results, degraded, latency_ms) in zip(sections, outcomes):
+            recommendations[name] = {
+                'count': len(results),
+                'recommendations': results,
+                'degraded': degraded
+            }
+            timings[name] = {
+                'latency_ms': round(latency_ms, 2),
+                'budget_ms': budgets.get(name, DEFAULT_SECTION_BUDGET_MS),
+                'degraded': degraded
+            }
+        
+        if debug:
+            recommendations['debug'] = {
+                'sections': timings,
+                'total_ms': round((time.perf_counter() - started_at) * 1000, 2),
+                'pool_loads': snapshot.pool_loads
             }
         
         return recommendations
     
+    @staticmethod
+    async def _run_section(coro, budget_ms: float):
+        """Run one section within its budget; returns (results, degraded, latency_ms)"""
+        started_at = time.perf_counter()
+        try:
+            results = await asyncio.wait_for(coro, budget_ms / 1000)
+            degraded = False
+        except asyncio.TimeoutError:
+            results = []
+            degraded = True
+        except Exception as e:
+            # A failing section is left empty instead of failing the whole response
+            print(f"Error in recommendation section: {e}")
+            results = []
+            degraded = True
+        return results, degraded, (time.perf_counter() - started_at) * 1000
+    
     async def analyze_user_compatibility(self, user1_id: int, user2_id: int) -> Dict:
         """
         Analyze compatibility between two users for collaboration/mentorship
@@ -93,121 +148,222 @@ class AIService:
         user1_profile = await self.recommendation_service.get_user_profile_data(user1_id)
         user2_profile = await self.recommendation_service.get_user_profile_data(user2_id)
         
-        # Encode profiles for semantic similarity
-        user1_vector = self.recommendation_service.matcher.encode_profile(user1_profile)
-        user2_vector = self.recommendation_service.matcher.encode_profile(user2_profile)
+        # Encode profiles for semantic similarity (reusing stored embeddings)
+        user1_vector, user2_vector = await self.recommendation_service.embedding_store.get_vectors(
+            [user1_profile, user2_profile], self.recommendation_service.matcher
+        )
         
-        compatibility_score = 0.0
-        compatibility_factors = []
+        factors = compatibility_factors(user1_profile, user1_vector, [user2_profile], [user2_vector])
+        return compatibility_report(user1_profile, user2_profile, factors, 0)
+    
+    async def analyze_compatibility_batch(self, user_id: int, other_ids: List[int]) -> Dict:
+        """
+        Analyze compatibility between one user and many others in a single pass
         
-        # Semantic similarity
-        if user1_vector.size > 0 and user2_vector.size > 0:
-            semantic_similarity = np.dot(user1_vector, user2_vector) / (
-                np.linalg.norm(user1_vector) * np.linalg.norm(user2_vector)
-            )
-            compatibility_score += semantic_similarity * 0.3
-            compatibility_factors.append({
-                'factor': 'semantic_similarity',
-                'score': float(semantic_similarity),
-                'weight': 0.3
-            })
+        Args:
+            user_id: User the others are compared with
+            other_ids: Users to compare (duplicates and user_id itself are ignored)
+            
+        Returns:
+            One analysis per found user, in the order of other_ids, each identical to
+            analyze_user_compatibility(user_id, other_id); unknown ids are listed in 'missing_ids'
+        """
+        other_ids = [uid for uid in dict.fromkeys(other_ids) if uid != user_id]
+        profiles = {
+            p['id']: p for p in await self.recommendation_service.get_profiles_bulk([user_id] + other_ids)
+        }
+        if user_id not in profiles:
+            raise ValueError(f"User {user_id} not found")
         
-        # Interest overlap
-        user1_interests = set(user1_profile.get('interests', []))
-        user2_interests = set(user2_profile.get('interests', []))
-        if user1_interests or user2_interests:
-            interest_overlap = len(user1_interests & user2_interests) / len(user1_interests | user2_interests) if (user1_interests | user2_interests) else 0
-            compatibility_score += interest_overlap * 0.25
-            compatibility_factors.append({
-                'factor': 'shared_interests',
-                'score': interest_overlap,
-                'weight': 0.25,
-                'shared_interests': list(user1_interests & user2_interests)
-            })
+        user_profile = profiles[user_id]
+        others = [profiles[uid] for uid in other_ids if uid in profiles]
+        vectors = await self.recommendation_service.embedding_store.get_vectors(
+            [user_profile] + others, self.recommendation_service.matcher
+        )
         
-        # Academic compatibility
-        academic_score = 0.0
-        if user1_profile.get('filiere') and user2_profile.get('filiere'):
-            filiere1 = user1_profile['filiere'].value if hasattr(user1_profile['filiere'], 'value') else str(user1_profile['filiere'])
-            filiere2 = user2_profile['filiere'].value if hasattr(user2_profile['filiere'], 'value') else str(user2_profile['filiere'])
-            
-            if filiere1 == filiere2:
-                academic_score += 0.6  # Same program
-            else:
-                academic_score += 0.3  # Different programs can be good for diversity
-        
-        if user1_profile.get('niveau') and user2_profile.get('niveau'):
-            niveau1 = user1_profile['niveau'].value if hasattr(user1_profile['niveau'], 'value') else int(user1_profile['niveau'])
-            niveau2 = user2_profile['niveau'].value if hasattr(user2_profile['niveau'], 'value') else int(user2_profile['niveau'])
+        factors = compatibility_factors(user_profile, vectors[0], others, vectors[1:])
+        return {
+            'user_id': user_id,
+            'count': len(others),
+            'results': [compatibility_report(user_profile, other, factors, i) for i, other in enumerate(others)],
+            'missing_ids': [uid for uid in other_ids if uid not in profiles]
+        }
+    
+    async def cohort_user_ids(self, groupe_id: Optional[int] = None, filiere: Optional[FiliereEnum] = None,
+                              niveau: Optional[NiveauEnum] = None) -> List[int]:
+        """
+        Users of a cohort: the active members of a group, or the students of a filiere/niveau
+        
+        Args:
+            groupe_id: Group whose active members form the cohort
+            filiere: Program of the students (used when groupe_id is not given)
+            niveau: Level of the students (optional filter on top of filiere)
             
-            niveau_diff = abs(niveau1 - niveau2)
-            if niveau_diff == 0:
-                academic_score += 0.4  # Same level
-            elif niveau_diff == 1:
-                academic_score += 0.3  # Close levels
-            elif niveau_diff == 2:
-                academic_score += 0.1  # Moderate difference
-        
-        compatibility_score += academic_score * 0.2
-        compatibility_factors.append({
-            'factor': 'academic_compatibility',
-            'score': academic_score,
-            'weight': 0.2
-        })
-        
-        # Role compatibility
-        user1_roles = set([role.value if hasattr(role, 'value') else str(role) for role in user1_profile.get('roles', [])])
-        user2_roles = set([role.value if hasattr(role, 'value') else str(role) for role in user2_profile.get('roles', [])])
-        
-        role_compatibility = 0.0
-        if RoleEnum.STUDENT.value in user1_roles and RoleEnum.MENTOR.value in user2_roles:
-            role_compatibility = 0.9  # Perfect mentor-student match
-        elif RoleEnum.STUDENT.value in user2_roles and RoleEnum.MENTOR.value in user1_roles:
-            role_compatibility = 0.9  # Perfect mentor-student match
-        elif RoleEnum.STUDENT.value in user1_roles and RoleEnum.STUDENT.value in user2_roles:
-            role_compatibility = 0.7  # Good peer match
-        else:
-            role_compatibility = 0.5  # Other combinations
-        
-        compatibility_score += role_compatibility * 0.25
-        compatibility_factors.append({
-            'factor': 'role_compatibility',
-            'score': role_compatibility,
-            'weight': 0.25
-        })
-        
-        # Generate recommendations based on compatibility
-        recommendations = []
-        if compatibility_score > 0.7:
-            recommendations.append("Highly compatible - excellent match for collaboration")
-        elif compatibility_score > 0.5:
-            recommendations.append("Good compatibility - worth connecting")
-        elif compatibility_score > 0.3:
-            recommendations.append("Moderate compatibility - potential for specific projects")
+        Returns:
+            Sorted user IDs
+        """
+        if groupe_id is not None:
+            user_ids = await UtilisateurGroupe.filter(
+                groupe_id=groupe_id, statut="actif"
+            ).values_list('utilisateur_id', flat=True)
         else:
-            recommendations.append("Low compatibility - may not be the best match")
+            query = Utilisateur.filter(
+                user_roles__role=RoleEnum.STUDENT, user_roles__statut='active'
+            )
+            if filiere is not None:
+                query = query.filter(filiere=filiere)
+            if niveau is not None:
+                query = query.filter(niveau=niveau)
+            user_ids = await query.distinct().values_list('id', flat=True)
+        return sorted(set(user_ids))
+    
+    async def compatibility_matrix(self, user_ids: List[int]):
+        """
+        Pairwise compatibility of a set of users
+        
+        Returns:
+            (profiles ordered by user id, symmetric matrix of compatibility scores
+            matching analyze_user_compatibility up to float rounding)
+        """
+        profiles = await self.recommendation_service.get_profiles_bulk(user_ids)
+        vectors = await self.recommendation_service.embedding_store.get_vectors(
+            profiles, self.recommendation_service.matcher
+        )
+        return profiles, compatibility_matrix(profiles, vectors)
+    
+    async def form_teams(self, user_ids: List[int], team_size: int = 4,
+                         time_limit: float = TEAM_FORMATION_TIME_LIMIT) -> Dict:
+        """
+        Split users into balanced project teams maximising compatibility and competence coverage
+        
+        Args:
+            user_ids: Cohort to split
+            team_size: Maximum team size (team sizes differ by at most one)
+            time_limit: Seconds allowed to the swap local search
+            
+        Returns:
+            Teams with their members, average pairwise compatibility and covered
+            competences, plus the solver objective and statistics
+        """
+        profiles, matrix = await self.compatibility_matrix(user_ids)
+        
+        competence_index: Dict[str, int] = {}
+        for profile in profiles:
+            for comp in profile['competences']:
+                competence_index.setdefault(comp['nom'].lower(), len(competence_index))
+        skills = np.zeros((len(profiles), len(competence_index)), dtype=bool)
+        for i, profile in enumerate(profiles):
+            for comp in profile['competences']:
+                skills[i, competence_index[comp['nom'].lower()]] = True
+        
+        loop = asyncio.get_running_loop()
+        solution = await loop.run_in_executor(
+            None, lambda: form_teams(matrix, skills, team_size, time_limit=time_limit)
+        )
+        
+        teams = []
+        for members, score in zip(solution['teams'], solution['team_scores']):
+            covered = sorted({comp['nom'] for i in members for comp in profiles[i]['competences']})
+            teams.append({
+                'members': [
+                    {'id': profiles[i]['id'], 'name': f"{profiles[i]['nom']} {profiles[i]['prenom']}"}
+                    for i in members
+                ],
+                'avg_compatibility': score['avg_compatibility'],
+                'competences': covered
+            })
         
         return {
-            'compatibility_score': float(compatibility_score),
-            'compatibility_level': 'high' if compatibility_score > 0.7 else 'medium' if compatibility_score > 0.4 else 'low',
-            'factors': compatibility_factors,
-            'recommendations': recommendations,
-            'users': {
-                'user1': {
-                    'id': user1_profile['id'],
-                    'name': f"{user1_profile['nom']} {user1_profile['prenom']}",
-                    'roles': list(user1_roles),
-                    'filiere': user1_profile['filiere'].value if user1_profile.get('filiere') else None,
-                    'niveau': user1_profile['niveau'].value if user1_profile.get('niveau') else None
-                },
-                'user2': {
-                    'id': user2_profile['id'],
-                    'name': f"{user2_profile['nom']} {user2_profile['prenom']}",
-                    'roles': list(user2_roles),
-                    'filiere': user2_profile['filiere'].value if user2_profile.get('filiere') else None,
-                    'niveau': user2_profile['niveau'].value if user2_profile.get('niveau') else None
-                }
+            'count': len(teams),
+            'team_size': team_size,
+            'teams': teams,
+            'objective': solution['objective'],
+            'total_compatibility': solution['total_compatibility'],
+            'skills_covered': solution['coverage'],
+            'solver': {
+                'initial_objective': solution['initial_objective'],
+                'swaps': solution['swaps'],
+                'passes': solution['passes'],
+                'elapsed_s': solution['elapsed_s']
+            }
+        }
+    
+    async def propose_mentor_assignments(self, capacity: int = MENTOR_CAPACITY,
+                                         filiere: Optional[FiliereEnum] = None,
+                                         niveau: Optional[NiveauEnum] = None,
+                                         dry_run: bool = False) -> Dict:
+        """
+        Assign mentors to a whole student cohort at once, so popular mentors are not
+        proposed to everyone, and write the proposals as pending MENTORING requests
+        
+        Students that already have an active mentor or a pending mentoring request are
+        skipped; each mentor's capacity is reduced by their active mentees and pending requests.
+        
+        Args:
+            capacity: Maximum mentees per mentor
+            filiere: Restrict the cohort to the students of this filiere
+            niveau: Restrict the cohort to the students of this niveau
+            dry_run: Compute the assignment without writing requests
+            
+        Returns:
+            Proposed (student, mentor, score) pairs and cohort statistics
+        """
+        mentored = await UtilisateurMentor.filter(status='active').values_list('utilisateur_id', 'mentor_id')
+        pending = await UtilisateurRequest.filter(
+            type=RequestTypeEnum.MENTORING, status='pending'
+        ).values_list('sender_id', 'receiver_id')
+        
+        busy_students = {student_id for student_id, _ in mentored} | {sender_id for sender_id, _ in pending}
+        mentor_load: Dict[int, int] = {}
+        for _, mentor_id in list(mentored) + list(pending):
+            mentor_load[mentor_id] = mentor_load.get(mentor_id, 0) + 1
+        
+        student_ids = [uid for uid in await self.cohort_user_ids(filiere=filiere, niveau=niveau) if uid not in busy_students]
+        students = await self.recommendation_service.get_profiles_bulk(student_ids)
+        mentors = await self.recommendation_service.get_profiles_bulk(roles=[RoleEnum.MENTOR, RoleEnum.TEACHER])
+        capacities = [capacity - mentor_load.get(mentor['id'], 0) for mentor in mentors]
+        
+        def solve():
+            scores, senior = mentor_assignment_scores(self.recommendation_service.matcher, students, mentors)
+            return senior, assign_mentors(scores, capacities)
+        
+        loop = asyncio.get_running_loop()
+        senior, pairs = await loop.run_in_executor(None, solve)
+        
+        assignments = [
+            {
+                'student_id': students[i]['id'],
+                'mentor_id': mentors[j]['id'],
+                'score': score,
+                'match_type': 'senior_same_program' if senior[i, j] else 'skill_complementarity'
             }
+            for i, j, score in pairs
+        ]
+        
+        created = 0
+        if not dry_run and assignments:
+            await UtilisateurRequest.bulk_create([
+                UtilisateurRequest(
+                    type=RequestTypeEnum.MENTORING,
+                    message=f"Proposition de mentorat automatique (score {a['score']:.2f})",
+                    sender_id=a['student_id'],
+                    receiver_id=a['mentor_id'],
+                    status="pending"
+                )
+                for a in assignments
+            ], batch_size=500)
+            created = len(assignments)
+        
+        return {
+            'students': len(students),
+            'mentors': len(mentors),
+            'capacity': capacity,
+            'assigned': len(assignments),
+            'unassigned': len(students) - len(assignments),
+            'total_score': float(sum(a['score'] for a in assignments)),
+            'dry_run': dry_run,
+            'created': created,
+            'assignments': assignments
         }
     
     async def moderate_content(self, text: str) -> Dict:
@@ -0,0 +1,324 @@
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import os
+import time
+import numpy as np
+from .vector_search import normalize_rows, top_k
+from .quantization import QuantizedMatrix
+
+# Below this many profiles /recommendations/semantic keeps using exact search
+SEMANTIC_ANN_MIN_CORPUS = int(os.getenv("SEMANTIC_ANN_MIN_CORPUS", "5000"))
+# Number of inverted lists probed per query
+SEMANTIC_ANN_NPROBE = int(os.getenv("SEMANTIC_ANN_NPROBE", "16"))
+SEMANTIC_INDEX_PATH = os.getenv("SEMANTIC_INDEX_PATH", "data/semantic_index.npz")
+# Storage of indexed vectors: int8 (per-vector scale), float16 or float32
+SEMANTIC_INDEX_DTYPE = os.getenv("SEMANTIC_INDEX_DTYPE", "int8")
+# Searches return this many times the requested hits, for an exact float32 re-rank by the caller
+SEMANTIC_RERANK_FACTOR = int(os.getenv("SEMANTIC_RERANK_FACTOR", "4"))
+
+
+class ExactIndex:
+    """
+    Flat cosine index over normalised vectors, keyed by user id.
+
+    Rows live in one contiguous QuantizedMatrix (int8 by default, a quarter of
+    the float32 memory), so scores are approximate; deleted rows are recycled.
+    Subclasses only change which rows are scanned for a query.
+    """
+
+    kind = 'exact'
+
+    def __init__(self, dim: Optional[int] = None, dtype: str = SEMANTIC_INDEX_DTYPE):
+        self.dim = dim
+        self.dtype = dtype
+        self._vectors = QuantizedMatrix(dim or 0, dtype)
+        self._ids = np.zeros(0, dtype=np.int64)  # row -> user id, -1 for free rows
+        self._rows: Dict[int, int] = {}
+        self._free: List[int] = []
+        self._size = 0  # rows in use, including free ones
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, item_id: int) -> bool:
+        return item_id in self._rows
+
+    def ids(self) -> List[int]:
+        return list(self._rows)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the stored vectors"""
+        return self._vectors.nbytes
+
+    def _allocate_row(self) -> int:
+        if self._free:
+            return self._free.pop()
+        if self._size == self._vectors.capacity:
+            capacity = max(1024, self._vectors.capacity * 2)
+            self._vectors.resize(capacity)
+            ids = np.full(capacity, -1, dtype=np.int64)
+            ids[:self._size] = self._ids[:self._size]
+            self._ids = ids
+        self._size += 1
+        return self._size - 1
+
+    def upsert(self, item_id: int, vector: np.ndarray):
+        """Insert a vector, or replace it if the id is already indexed"""
+        vector = normalize_rows(vector)[0]
+        if self.dim is None or self._size == 0 and self.dim != vector.size:
+            self.dim = vector.size
+            self._vectors = QuantizedMatrix(self.dim, self.dtype)
+        row = self._rows.get(item_id)
+        if row is None:
+            row = self._allocate_row()
+            self._rows[item_id] = row
+            self._ids[row] = item_id
+        self._vectors.set_row(row, vector)
+        self._on_upsert(row)
+
+    def upsert_many(self, item_ids: Sequence[int], vectors: Sequence[np.ndarray]):
+        for item_id, vector in zip(item_ids, vectors):
+            self.upsert(item_id, vector)
+
+    def delete(self, item_id: int) -> bool:
+        row = self._rows.pop(item_id, None)
+        if row is None:
+            return False
+        self._on_delete(row)
+        self._ids[row] = -1
+        self._vectors.clear_row(row)
+        self._free.append(row)
+        return True
+
+    def _on_upsert(self, row: int):
+        pass
+
+    def _on_delete(self, row: int):
+        pass
+
+    def _candidate_rows(self, query: np.ndarray) -> Optional[np.ndarray]:
+        """Rows to score for a query; None means every row"""
+        return None
+
+    def search(self, vector: np.ndarray, k: int,
+               exclude: Optional[Iterable[int]] = None) -> List[Tuple[int, float]]:
+        """
+        Return up to k (user id, cosine score) pairs, best first.
+        Scores come from the stored (quantised) vectors: callers needing exact
+        float32 order should ask for more hits and re-rank them.
+        """
+        if not self._rows:
+            return []
+        query = normalize_rows(vector)[0]
+        rows = self._candidate_rows(query)
+        if rows is None:
+            row_ids = self._ids[:self._size]
+            scores = self._vectors.dot(query, slice(0, self._size))
+        else:
+            row_ids = self._ids[rows]
+            scores = self._vectors.dot(query, rows)
+
+        valid = row_ids >= 0
+        if exclude:
+            valid &= ~np.isin(row_ids, np.fromiter(exclude, dtype=np.int64))
+        scores = np.where(valid, scores, -np.inf)
+
+        best = top_k(scores, k)
+        return [(int(row_ids[i]), float(scores[i])) for i in best if valid[i]]
+
+    def exact_search(self, vector: np.ndarray, k: int,
+                     exclude: Optional[Iterable[int]] = None) -> List[Tuple[int, float]]:
+        return ExactIndex.search(self, vector, k, exclude)
+
+    def recall_report(self, queries: np.ndarray, k: int = 10) -> Dict:
+        """Compare search results against exact search for a batch of query vectors"""
+        queries = np.atleast_2d(queries)
+        start = time.perf_counter()
+        approx = [self.search(q, k) for q in queries]
+        approx_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        exact = [self.exact_search(q, k) for q in queries]
+        exact_time = time.perf_counter() - start
+
+        recalls = []
+        for approx_hits, exact_hits in zip(approx, exact):
+            if exact_hits:
+                expected = {item_id for item_id, _ in exact_hits}
+                recalls.append(len(expected & {item_id for item_id, _ in approx_hits}) / len(expected))
+
+        return {
+            'index': self.kind,
+            'corpus_size': len(self),
+            'queries': len(queries),
+            'k': k,
+            'recall_at_k': float(np.mean(recalls)) if recalls else 0.0,
+            'dtype': self.dtype,
+            'memory_mb': round(self.nbytes / 2 ** 20, 2),
+            'search_ms': round(approx_time * 1000 / max(len(queries), 1), 3),
+            'exact_ms': round(exact_time * 1000 / max(len(queries), 1), 3)
+        }
+
+    def _state(self) -> Dict[str, np.ndarray]:
+        return {
+            'kind': np.array(self.kind),
+            'dim': np.array(self.dim or 0),
+            'dtype': np.array(self.dtype),
+            'codes': self._vectors.codes[:self._size],
+            'scales': self._vectors.scales[:self._size],
+            'ids': self._ids[:self._size]
+        }
+
+    def _restore(self, state):
+        self.dim = int(state['dim']) or None
+        if 'codes' in state.files:
+            self.dtype = str(state['dtype'])
+            self._vectors = QuantizedMatrix(self.dim or 0, self.dtype)
+            self._vectors.codes = np.array(state['codes'])
+            self._vectors.scales = np.array(state['scales'], dtype=np.float32)
+        else:
+            # Index saved before quantisation: float32 matrix
+            matrix = np.array(state['matrix'], dtype=np.float32).reshape(-1, self.dim or 0)
+            self._vectors = QuantizedMatrix.from_float32(matrix, self.dtype)
+        self._ids = np.array(state['ids'], dtype=np.int64)
+        self._size = len(self._ids)
+        self._rows = {int(item_id): row for row, item_id in enumerate(self._ids) if item_id >= 0}
+        self._free = [row for row, item_id in enumerate(self._ids) if item_id < 0]
+
+    def save(self, path: str):
+        """Write the index to disk; the file is replaced atomically"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **self._state())
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def load(path: str) -> "ExactIndex":
+        with np.load(path, allow_pickle=False) as state:
+            kind = str(state['kind'])
+            index = IVFIndex() if kind == IVFIndex.kind else ExactIndex()
+            index._restore(state)
+        return index
+
+
+class IVFIndex(ExactIndex):
+    """
+    Inverted-file index: vectors are bucketed by their nearest k-means centroid
+    and a query only scans the n_probe closest buckets.
+    Until train() is called it behaves like ExactIndex.
+    """
+
+    kind = 'ivf'
+
+    def __init__(self, dim: Optional[int] = None, n_probe: int = SEMANTIC_ANN_NPROBE,
+                 dtype: str = SEMANTIC_INDEX_DTYPE):
+        super().__init__(dim, dtype)
+        self.n_probe = n_probe
+        self.centroids: Optional[np.ndarray] = None
+        self._assign = np.zeros(0, dtype=np.int64)  # row -> list, -1 when unassigned
+        self._lists: List[set] = []
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def train(self, n_lists: Optional[int] = None, iterations: int = 10,
+              sample_size: int = 20000, seed: int = 0):
+        """Fit centroids with spherical k-means on a sample, then bucket every row"""
+        live_rows = np.flatnonzero(self._ids[:self._size] >= 0)
+        if live_rows.size == 0:
+            return
+        n_lists = n_lists or max(1, int(np.sqrt(live_rows.size)))
+        n_lists = min(n_lists, live_rows.size)
+
+        rng = np.random.default_rng(seed)
+        sample = self._vectors.decode(rng.choice(live_rows, min(sample_size, live_rows.size), replace=False))
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(n_lists):
+                members = sample[labels == c]
+                if len(members):
+                    centroids[c] = members.sum(axis=0)
+            centroids = normalize_rows(centroids)
+
+        self.centroids = centroids
+        self._assign = np.full(self._vectors.capacity, -1, dtype=np.int64)
+        self._lists = [set() for _ in range(n_lists)]
+        for start in range(0, live_rows.size, 8192):
+            rows = live_rows[start:start + 8192]
+            labels = np.argmax(self._vectors.decode(rows) @ centroids.T, axis=1)
+            self._assign[rows] = labels
+            for row, label in zip(rows.tolist(), labels.tolist()):
+                self._lists[label].add(row)
+
+    def _on_upsert(self, row: int):
+        if not self.is_trained:
+            return
+        if self._assign.shape[0] < self._vectors.capacity:
+            assign = np.full(self._vectors.capacity, -1, dtype=np.int64)
+            assign[:self._assign.shape[0]] = self._assign
+            self._assign = assign
+        self._on_delete(row)
+        label = int(np.argmax(self.centroids @ self._vectors.decode(np.array([row]))[0]))
+        self._assign[row] = label
+        self._lists[label].add(row)
+
+    def _on_delete(self, row: int):
+        if self.is_trained and row < self._assign.shape[0] and self._assign[row] >= 0:
+            self._lists[self._assign[row]].discard(row)
+            self._assign[row] = -1
+
+    def _candidate_rows(self, query: np.ndarray) -> Optional[np.ndarray]:
+        if not self.is_trained:
+            return None
+        n_probe = min(self.n_probe, len(self._lists))
+        probed = top_k(self.centroids @ query, n_probe)
+        rows = [np.fromiter(self._lists[label], dtype=np.int64, count=len(self._lists[label]))
+                for label in probed]
+        return np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+
+    def _state(self) -> Dict[str, np.ndarray]:
+        state = super()._state()
+        state['n_probe'] = np.array(self.n_probe)
+        if self.is_trained:
+            state['centroids'] = self.centroids
+            state['assign'] = self._assign[:self._size]
+        return state
+
+    def _restore(self, state):
+        super()._restore(state)
+        self.n_probe = int(state['n_probe'])
+        if 'centroids' in state.files:
+            self.centroids = np.array(state['centroids'], dtype=np.float32)
+            self._assign = np.array(state['assign'], dtype=np.int64)
+            self._lists = [set() for _ in range(len(self.centroids))]
+            for row, label in enumerate(self._assign.tolist()):
+                if label >= 0:
+                    self._lists[label].add(row)
+
+
+_semantic_index: Optional[IVFIndex] = None
+
+
+def get_semantic_index() -> IVFIndex:
+    """Return the process-wide semantic index, loading it from disk if saved"""
+    global _semantic_index
+    if _semantic_index is None:
+        index = None
+        if os.path.exists(SEMANTIC_INDEX_PATH):
+            try:
+                index = ExactIndex.load(SEMANTIC_INDEX_PATH)
+            except Exception as e:
+                print(f"Error loading semantic index: {e}")
+        _semantic_index = index if isinstance(index, IVFIndex) else IVFIndex()
+    return _semantic_index
+
+
+def set_semantic_index(index: IVFIndex):
+    """Replace the process-wide semantic index with a rebuilt one"""
+    global _semantic_index
+    _semantic_index = index
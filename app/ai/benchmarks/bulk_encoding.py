@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Cold-cache profile encoding: one forward pass per profile against length-sorted batched passes
+
+Usage: python -m app.ai.benchmarks.bulk_encoding --profiles 3000 --batch-size 64
+"""
+
+import argparse
+import time
+import numpy as np
+from app.ai.benchmarks.mentor_assignment import synthetic_profiles
+from app.ai.student_matcher import StudentMatcher
+
+
+def run(profiles: int, batch_size: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    pool = synthetic_profiles(profiles, 0, 80, 8, rng)
+    matcher = StudentMatcher()
+    if matcher.encode_profile(pool[0]).size == 0:  # also loads the model outside the timings
+        print("Sentence model unavailable")
+        return
+
+    start = time.perf_counter()
+    one_by_one = [matcher.encode_profile(profile) for profile in pool]
+    single_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batched = matcher.encode_profiles(pool, batch_size)
+    batched_time = time.perf_counter() - start
+
+    print({
+        'profiles': profiles,
+        'batch_size': batch_size,
+        'one_by_one_s': round(single_time, 3),
+        'batched_s': round(batched_time, 3),
+        'speedup': round(single_time / batched_time, 1) if batched_time else None,
+        'max_abs_diff': float(max(np.abs(a - b).max() for a, b in zip(one_by_one, batched)))
+    })
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--profiles", type=int, default=3000)
+    parser.add_argument("--batch-size", type=int, default=64)
+    args = parser.parse_args()
+    run(args.profiles, args.batch_size)
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Recall of MinHash LSH candidates against exact Jaccard on synthetic interest/competence sets
+
+Usage: python -m app.ai.benchmarks.minhash_recall --users 20000 --bands 48 --rows 3
+"""
+
+import argparse
+import time
+import numpy as np
+from app.ai.minhash import MinHashLSH, profile_tokens
+
+
+def synthetic_token_sets(n: int, interests: int = 60, competences: int = 80, seed: int = 0):
+    """Skewed popularity (a few interests like "IA" or "Web" are held by most users)"""
+    rng = np.random.default_rng(seed)
+    interest_p = 1.0 / np.arange(1, interests + 1)
+    interest_p /= interest_p.sum()
+    competence_p = 1.0 / np.arange(1, competences + 1)
+    competence_p /= competence_p.sum()
+    for _ in range(n):
+        user_interests = rng.choice(interests, size=rng.integers(1, 6), replace=False, p=interest_p)
+        user_competences = rng.choice(competences, size=rng.integers(1, 8), replace=False, p=competence_p)
+        yield profile_tokens(user_interests.tolist(), user_competences.tolist())
+
+
+def run(users: int, bands: int, rows: int, threshold: float, sample: int):
+    index = MinHashLSH(bands=bands, rows=rows)
+    start = time.perf_counter()
+    for user_id, tokens in enumerate(synthetic_token_sets(users)):
+        index.upsert(user_id, tokens)
+    build_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for user_id in range(min(sample, users)):
+        index.query(user_id)
+    query_ms = (time.perf_counter() - start) * 1000 / min(sample, users)
+
+    report = index.measure_recall(threshold=threshold, sample_size=sample)
+    report['users'] = users
+    report['build_s'] = round(build_time, 2)
+    report['avg_query_ms'] = round(query_ms, 3)
+    print(report)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--bands", type=int, default=48)
+    parser.add_argument("--rows", type=int, default=3)
+    parser.add_argument("--threshold", type=float, default=0.3)
+    parser.add_argument("--sample", type=int, default=100)
+    args = parser.parse_args()
+    run(args.users, args.bands, args.rows, args.threshold, args.sample)
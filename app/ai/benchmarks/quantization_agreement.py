@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Ranking agreement of int8/float16 embedding storage against float32, with and without exact re-rank
+
+For each storage type: memory of the corpus, recall@k and top-1 agreement of the
+compact scan alone, and of the compact scan followed by a float32 re-rank of
+k * rerank-factor candidates (what /recommendations/semantic does).
+
+Usage: python -m app.ai.benchmarks.quantization_agreement --size 100000 --k 10
+"""
+
+import argparse
+import time
+import numpy as np
+from app.ai.benchmarks.ann_recall import synthetic_embeddings
+from app.ai.quantization import QuantizedMatrix, INT8, FLOAT16, FLOAT32
+from app.ai.vector_search import normalize_rows, top_k
+
+
+def run(size: int, k: int, queries: int, rerank_factor: int):
+    corpus = normalize_rows(synthetic_embeddings(size))
+    query_vectors = normalize_rows(synthetic_embeddings(queries, seed=1))
+    exact = [top_k(corpus @ q, k) for q in query_vectors]
+
+    for dtype in (FLOAT32, FLOAT16, INT8):
+        matrix = QuantizedMatrix.from_float32(corpus, dtype)
+        scan_recall, rerank_recall, scan_top1, rerank_top1 = [], [], [], []
+        start = time.perf_counter()
+        for q, expected in zip(query_vectors, exact):
+            approx_scores = matrix.dot(q)
+            scanned = top_k(approx_scores, k)
+            shortlist = top_k(approx_scores, k * rerank_factor)
+            reranked = shortlist[top_k(corpus[shortlist] @ q, k)]
+
+            expected_set = set(expected.tolist())
+            scan_recall.append(len(expected_set & set(scanned.tolist())) / k)
+            rerank_recall.append(len(expected_set & set(reranked.tolist())) / k)
+            scan_top1.append(scanned[0] == expected[0])
+            rerank_top1.append(reranked[0] == expected[0])
+        elapsed = time.perf_counter() - start
+
+        print({
+            'dtype': dtype,
+            'corpus_size': size,
+            'memory_mb': round(matrix.nbytes / 2 ** 20, 2),
+            'k': k,
+            'scan_recall_at_k': round(float(np.mean(scan_recall)), 4),
+            'scan_top1_agreement': round(float(np.mean(scan_top1)), 4),
+            'rerank_recall_at_k': round(float(np.mean(rerank_recall)), 4),
+            'rerank_top1_agreement': round(float(np.mean(rerank_top1)), 4),
+            'query_ms': round(elapsed * 1000 / queries, 3)
+        })
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=100000)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--rerank-factor", type=int, default=4)
+    args = parser.parse_args()
+    run(args.size, args.k, args.queries, args.rerank_factor)
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Skill swap ranking: per-candidate loop versus the vectorised SkillMatrix engine
+
+Checks that both produce the same ranking and scores, and prints timings.
+Usage: python -m app.ai.benchmarks.skill_swap --sizes 1000 10000 50000
+"""
+
+import argparse
+import random
+import time
+from typing import Dict, List
+from app.ai.recommendation_service import RecommendationService
+from app.models.models import FiliereEnum, NiveauEnum
+
+LEVELS = ['Débutant', 'Intermédiaire', 'Avancé', 'Expert', 'Maître', '3', 'beginner', '']
+
+
+def synthetic_profiles(n: int, n_skills: int = 60, seed: int = 0) -> List[Dict]:
+    rng = random.Random(seed)
+    skills = [f"Skill {i}" for i in range(n_skills)]
+    profiles = []
+    for user_id in range(1, n + 1):
+        competences = [
+            {'nom': name, 'niveau': rng.choice(LEVELS)}
+            for name in rng.sample(skills, rng.randint(0, 8))
+        ]
+        profiles.append({
+            'id': user_id,
+            'nom': f"Nom{user_id}",
+            'prenom': f"Prenom{user_id}",
+            'roles': [],
+            'score': 0,
+            'filiere': rng.choice([None] + list(FiliereEnum)),
+            'niveau': rng.choice([None] + list(NiveauEnum)),
+            'interests': [],
+            'competences': competences
+        })
+    return profiles
+
+
+def legacy_rank(service: RecommendationService, user_profile: Dict,
+                candidate_profiles: List[Dict], limit: int) -> List[Dict]:
+    """The previous implementation: full explanation for every candidate, then a full sort"""
+    user_skills = {}
+    for comp in user_profile.get('competences', []):
+        user_skills[comp.get('nom', '').lower()] = service._normalize_skill_level(comp.get('niveau', ''))
+
+    recommendations = []
+    for candidate in candidate_profiles:
+        if not candidate.get('competences'):
+            continue
+        swap_score, swap_details = service._calculate_swap_score(
+            user_skills, candidate['competences'], user_profile, candidate
+        )
+        if swap_score > 0:
+            recommendations.append({**candidate, 'swap_score': swap_score, 'swap_details': swap_details})
+    recommendations.sort(key=lambda x: x['swap_score'], reverse=True)
+    return recommendations[:limit]
+
+
+def run(sizes: List[int], limit: int, queries: int):
+    service = RecommendationService()
+    for n in sizes:
+        profiles = synthetic_profiles(n)
+        legacy_time = engine_time = 0.0
+        for user_profile in profiles[:queries]:
+            candidates = [p for p in profiles if p['id'] != user_profile['id']]
+
+            start = time.perf_counter()
+            expected = legacy_rank(service, user_profile, candidates, limit)
+            legacy_time += time.perf_counter() - start
+
+            start = time.perf_counter()
+            actual = service._rank_skill_swaps(user_profile, candidates, limit)
+            engine_time += time.perf_counter() - start
+
+            assert [(r['id'], r['swap_score'], r['swap_details']) for r in actual] == \
+                   [(r['id'], r['swap_score'], r['swap_details']) for r in expected], \
+                f"Ranking mismatch for user {user_profile['id']}"
+
+        print({
+            'users': n,
+            'queries': queries,
+            'legacy_ms': round(legacy_time * 1000 / queries, 2),
+            'matrix_ms': round(engine_time * 1000 / queries, 2),
+            'speedup': round(legacy_time / engine_time, 1) if engine_time else None,
+            'identical_ranking': True
+        })
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=5)
+    args = parser.parse_args()
+    run(args.sizes, args.limit, args.queries)
@@ -0,0 +1,321 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict, defaultdict
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Set, Tuple, Union
+import asyncio
+import os
+import time
+
+RECOMMENDATION_CACHE_TTL = float(os.getenv("RECOMMENDATION_CACHE_TTL", "300"))
+RECOMMENDATION_CACHE_SIZE = int(os.getenv("RECOMMENDATION_CACHE_SIZE", "10000"))
+# How long past expiry (or invalidation) an entry may still be served while it is refreshed
+RECOMMENDATION_CACHE_MAX_STALE = float(os.getenv("RECOMMENDATION_CACHE_MAX_STALE", "3600"))
+
+CACHE_HIT = "HIT"
+CACHE_STALE = "STALE"
+CACHE_MISS = "MISS"
+
+# Tag carried by every cached candidate pool: any profile write invalidates them
+POOLS_TAG = "pools"
+
+
+def user_tag(user_id: int) -> str:
+    return f"user:{user_id}"
+
+
+# Tags of an entry, or a function computing them from the value (e.g. the users it lists)
+Tags = Union[Iterable[str], Callable[[Any], Iterable[str]]]
+
+
+class CacheEntry:
+    """A cached value: fresh until expires_at, then servable as stale until stale_until"""
+    __slots__ = ('value', 'stored_at', 'expires_at', 'stale_until')
+
+    def __init__(self, value: Any, stored_at: float, expires_at: float, stale_until: float):
+        self.value = value
+        self.stored_at = stored_at
+        self.expires_at = expires_at
+        self.stale_until = stale_until
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.stored_at
+
+    @property
+    def is_fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+
+class CacheBackend(ABC):
+    """
+    Storage interface of RecommendationCache.
+
+    Methods are async so a networked store (e.g. Redis: SET with EX for entries,
+    one SADD set per tag for invalidation) can implement it; such a backend
+    would serialise values, which are plain dicts/lists of profile data.
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[CacheEntry]:
+        """Entry of key, fresh or stale; None once past its stale_until"""
+
+    @abstractmethod
+    async def set(self, key: str, entry: CacheEntry, tags: Iterable[str] = ()):
+        pass
+
+    @abstractmethod
+    async def delete_tag(self, tag: str) -> int:
+        """Delete every entry stored with this tag; returns the number deleted"""
+
+    @abstractmethod
+    async def expire_tag(self, tag: str) -> int:
+        """Mark every entry stored with this tag as stale; returns the number marked"""
+
+    @abstractmethod
+    async def clear(self):
+        pass
+
+    @abstractmethod
+    def __len__(self) -> int:
+        pass
+
+
+class MemoryBackend(CacheBackend):
+    """In-process backend: size-bounded LRU with per-entry expiry and a tag index"""
+
+    def __init__(self, max_items: int = RECOMMENDATION_CACHE_SIZE):
+        self.max_items = max_items
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._tags_by_key: Dict[str, Set[str]] = {}
+        self._keys_by_tag: Dict[str, Set[str]] = defaultdict(set)
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get(self, key: str) -> Optional[CacheEntry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.stale_until <= time.time():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    async def set(self, key: str, entry: CacheEntry, tags: Iterable[str] = ()):
+        self._remove(key)
+        self._entries[key] = entry
+        tags = set(tags)
+        self._tags_by_key[key] = tags
+        for tag in tags:
+            self._keys_by_tag[tag].add(key)
+        while len(self._entries) > self.max_items:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    async def delete_tag(self, tag: str) -> int:
+        keys = self._keys_by_tag.pop(tag, set())
+        for key in list(keys):
+            self._remove(key)
+        return len(keys)
+
+    async def expire_tag(self, tag: str) -> int:
+        keys = self._keys_by_tag.get(tag, set())
+        now = time.time()
+        for key in keys:
+            entry = self._entries[key]
+            entry.expires_at = min(entry.expires_at, now)
+        return len(keys)
+
+    async def clear(self):
+        self._entries.clear()
+        self._tags_by_key.clear()
+        self._keys_by_tag.clear()
+
+    def _remove(self, key: str):
+        self._entries.pop(key, None)
+        for tag in self._tags_by_key.pop(key, ()):
+            keys = self._keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_tag[tag]
+
+
+class RecommendationCache:
+    """
+    TTL cache in front of RecommendationService results and shared inputs.
+
+    Identical concurrent lookups are coalesced (single-flight): one task computes
+    the value and every caller awaits it, so a caller cancelled midway (section
+    budget, client disconnect) does not cancel the others. Entries are tagged
+    with the users they depend on so profile writes can invalidate them.
+    Read endpoints use get_or_revalidate (stale-while-revalidate): an expired
+    entry is served at once while a background task refreshes it.
+    """
+
+    def __init__(self, backend: Optional[CacheBackend] = None, ttl: float = RECOMMENDATION_CACHE_TTL,
+                 max_stale: float = RECOMMENDATION_CACHE_MAX_STALE):
+        self.backend = backend or MemoryBackend()
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self._inflight: Dict[Tuple[int, str], asyncio.Future] = {}
+        self._refreshes: Set[asyncio.Task] = set()
+        # Invalidation counter, and its value when each tag was last invalidated: a value
+        # is not stored if one of its tags was invalidated while it was being computed
+        self._sequence = 0
+        self._invalidated_at: Dict[str, int] = {}
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.invalidations = 0
+        self.refresh_errors = 0
+
+    @staticmethod
+    def make_key(method: str, user_id: Optional[int], limit: Optional[int], model_version: str) -> str:
+        return f"{method}:{user_id}:{limit}:{model_version}"
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Any]],
+                             tags: Tags = (), ttl: Optional[float] = None) -> Any:
+        """Cached value of key, computing it once for all concurrent callers on a miss"""
+        entry = await self.backend.get(key)
+        if entry is not None and entry.is_fresh:
+            self.hits += 1
+            return entry.value
+        return await self._compute(key, compute, tags, ttl)
+
+    async def get_or_revalidate(self, key: str, compute: Callable[[], Awaitable[Any]],
+                                tags: Tags = (), ttl: Optional[float] = None,
+                                revalidate: Optional[Callable[[], Awaitable[Any]]] = None) -> Tuple[Any, str, float]:
+        """
+        Stale-while-revalidate lookup
+
+        Args:
+            compute: Produces the value on a miss (awaited by the caller)
+            revalidate: Refreshes a stale value in the background (defaults to compute);
+                a None result leaves the stale entry in place
+
+        Returns:
+            (value, cache status HIT/STALE/MISS, age of the value in seconds)
+        """
+        entry = await self.backend.get(key)
+        if entry is not None:
+            if entry.is_fresh:
+                self.hits += 1
+                return entry.value, CACHE_HIT, entry.age
+            self.stale_hits += 1
+            self._schedule_refresh(key, revalidate or compute, tags, ttl)
+            return entry.value, CACHE_STALE, entry.age
+        return await self._compute(key, compute, tags, ttl), CACHE_MISS, 0.0
+
+    def _schedule_refresh(self, key: str, compute: Callable[[], Awaitable[Any]],
+                          tags: Tags, ttl: Optional[float]):
+        loop = asyncio.get_running_loop()
+        if (id(loop), key) in self._inflight:
+            return
+        task = self._start_flight(key, compute, tags, ttl)
+        self._refreshes.add(task)
+        task.add_done_callback(self._refresh_done)
+
+    def _refresh_done(self, task: asyncio.Task):
+        self._refreshes.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self.refresh_errors += 1
+            print(f"Error refreshing cached value: {task.exception()}")
+
+    async def _compute(self, key: str, compute: Callable[[], Awaitable[Any]],
+                       tags: Tags, ttl: Optional[float]) -> Any:
+        inflight = self._inflight.get((id(asyncio.get_running_loop()), key))
+        if inflight is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            inflight = self._start_flight(key, compute, tags, ttl)
+        # Shielded: a caller that times out or disconnects stops waiting, but the
+        # computation keeps running for the other callers and still fills the cache
+        return await asyncio.shield(inflight)
+
+    def _start_flight(self, key: str, compute: Callable[[], Awaitable[Any]],
+                      tags: Tags, ttl: Optional[float]) -> asyncio.Task:
+        """Run compute as a task of its own, not tied to the lifetime of the caller that started it"""
+        loop = asyncio.get_running_loop()
+        flight_key = (id(loop), key)
+        task = loop.create_task(self._fill(key, compute, tags, ttl))
+        self._inflight[flight_key] = task
+        task.add_done_callback(lambda _: self._flight_done(flight_key, task))
+        return task
+
+    def _flight_done(self, flight_key: Tuple[int, str], task: asyncio.Task):
+        if self._inflight.get(flight_key) is task:
+            del self._inflight[flight_key]
+        if not self._inflight:
+            # Computations started from now on begin after every recorded invalidation
+            self._invalidated_at.clear()
+        # Mark retrieved so an error nobody awaited (every caller gave up) is not logged as unhandled
+        if not task.cancelled():
+            task.exception()
+
+    async def _fill(self, key: str, compute: Callable[[], Awaitable[Any]],
+                    tags: Tags, ttl: Optional[float]) -> Any:
+        started_at = self._sequence
+        value = await compute()
+        if value is None:
+            return value
+        value_tags = list(tags(value) if callable(tags) else tags)
+        if all(self._invalidated_at.get(tag, 0) <= started_at for tag in value_tags):
+            await self.set(key, value, value_tags, ttl)
+        return value
+
+    async def set(self, key: str, value: Any, tags: Iterable[str] = (), ttl: Optional[float] = None):
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        await self.backend.set(key, CacheEntry(value, now, expires_at, expires_at + self.max_stale), tags)
+
+    async def invalidate_user(self, user_id: int):
+        """
+        Profile write hook: entries tagged with the user become stale (served once
+        more while they are refreshed) and cached candidate pools are dropped, so
+        every recompute sees the new profile.
+
+        Entries carry the tags of every user they depend on, so this also expires
+        other users' recommendation lists that include this user. A compute in
+        flight is only discarded if its value carries one of the invalidated tags;
+        computes of unrelated users still fill the cache.
+        """
+        self.invalidations += 1
+        self._sequence += 1
+        for tag in (user_tag(user_id), POOLS_TAG):
+            self._invalidated_at[tag] = self._sequence
+        await self.backend.expire_tag(user_tag(user_id))
+        await self.backend.delete_tag(POOLS_TAG)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.stale_hits + self.misses + self.coalesced
+        return {
+            'backend': type(self.backend).__name__,
+            'items': len(self.backend),
+            'ttl_s': self.ttl,
+            'max_stale_s': self.max_stale,
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'hit_rate': round((self.hits + self.stale_hits + self.coalesced) / lookups, 3) if lookups else 0.0,
+            'background_refreshes': len(self._refreshes),
+            'refresh_errors': self.refresh_errors,
+            'invalidations': self.invalidations
+        }
+
+
+_cache: Optional[RecommendationCache] = None
+
+
+def get_recommendation_cache() -> RecommendationCache:
+    """Return the process-wide recommendation cache"""
+    global _cache
+    if _cache is None:
+        _cache = RecommendationCache()
+    return _cache
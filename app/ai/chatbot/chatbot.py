@@ -3,6 +3,7 @@ from .database_queries import DatabaseQueries
 from typing import Dict, List, Optional
 import json
 import re
+import threading
 
 class FrenchChatbot:
     def __init__(self):
@@ -68,7 +69,7 @@ class FrenchChatbot:
     
     async def process_message(self, message: str, user_id: int) -> Dict:
         try:
-            intent, confidence = self.intent_classifier.classify_intent(message)
+            intent, confidence = await self.intent_classifier.classify_intent_async(message)
             
             response = {
                 "intent": intent,
@@ -231,4 +232,23 @@ class FrenchChatbot:
                 "J'ai besoin d'aide",
                 "Je cherche un parrain",
                 "Je veux échanger mes compétences"
-            ]
\ No newline at end of file
+            ]
+
+
+_chatbot: Optional[FrenchChatbot] = None
+_chatbot_lock = threading.Lock()
+
+
+def get_chatbot() -> FrenchChatbot:
+    """
+    Return the process-wide chatbot, building it on first use.
+
+    Building loads the chatbot model and embeds every intent example, so it is
+    done by the startup warm-up (or the first chat request), not at import time.
+    """
+    global _chatbot
+    if _chatbot is None:
+        with _chatbot_lock:
+            if _chatbot is None:
+                _chatbot = FrenchChatbot()
+    return _chatbot
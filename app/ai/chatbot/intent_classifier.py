@@ -1,20 +1,18 @@
 from sentence_transformers import SentenceTransformer
 import numpy as np
-from typing import Dict, List, Tuple
+from typing import Dict, List, Tuple, Optional
 import json
 from sklearn.metrics.pairwise import cosine_similarity
+from ..model_registry import ModelRegistry, get_model_registry, CHATBOT_MODEL
 
 class IntentClassifier:
-    def __init__(self, model_path: str = None):
+    def __init__(self, model_path: str = None, registry: Optional[ModelRegistry] = None):
+        self.registry = registry or get_model_registry()
+        self.batcher = None
         if model_path is None:
-            # Try to load from local models directory first
-            import os
-            local_model_path = os.path.join(os.path.dirname(__file__), '..', 'ai_models', 'multilingual-chatbot')
-            if os.path.exists(local_model_path):
-                self.model = SentenceTransformer(local_model_path)
-            else:
-                # Fallback to downloading from HuggingFace
-                self.model = SentenceTransformer("all-mpnet-base-v2")
+            # Shared model, loaded once per process (local copy first, then HuggingFace)
+            self.model = self.registry.chatbot_model
+            self.batcher = self.registry.batcher(CHATBOT_MODEL)
         else:
             self.model = SentenceTransformer(model_path)
         self.intents = {
@@ -78,13 +76,30 @@ class IntentClassifier:
         self._compute_intent_embeddings()
     
     def _compute_intent_embeddings(self):
+        if not self.model:
+            return  # Model unavailable: every message is classified as "unknown"
         for intent, examples in self.intents.items():
             embeddings = self.model.encode(examples)
             self.intent_embeddings[intent] = np.mean(embeddings, axis=0)
     
     def classify_intent(self, text: str, threshold: float = 0.5) -> Tuple[str, float]:
+        if not self.model:
+            return "unknown", 0.0
         text_embedding = self.model.encode([text])
-        
+        return self._best_intent(text_embedding, threshold)
+    
+    async def classify_intent_async(self, text: str, threshold: float = 0.5) -> Tuple[str, float]:
+        """Same as classify_intent, with the encode batched across concurrent chat messages"""
+        if not self.model:
+            return "unknown", 0.0
+        if self.batcher is None:
+            return await self.registry.executor.run(CHATBOT_MODEL, self.classify_intent, text, threshold)
+        text_embedding = await self.batcher.submit(text)
+        return self._best_intent([text_embedding], threshold)
+    
+    def _best_intent(self, text_embedding, threshold: float) -> Tuple[str, float]:
+        if np.asarray(text_embedding).size == 0:
+            return "unknown", 0.0
         best_intent = None
         best_score = 0
         
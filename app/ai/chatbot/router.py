@@ -1,7 +1,8 @@
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from typing import List, Optional, Union
-from .chatbot import FrenchChatbot
+from .chatbot import FrenchChatbot, get_chatbot
 from app.models.models import HistoriqueChatbot, Utilisateur
 import json
 
@@ -18,7 +19,9 @@ class ChatResponse(BaseModel):
     data: Optional[Union[dict, List[dict]]] = None
     suggestions: Optional[List[str]] = None
 
-chatbot = FrenchChatbot()
+async def _chatbot() -> FrenchChatbot:
+    # Built off the event loop when a request arrives before the startup warm-up finished
+    return await run_in_threadpool(get_chatbot)
 
 @router.post("/chat", response_model=ChatResponse)
 async def chat_with_bot(chat_message: ChatMessage):
@@ -29,6 +32,7 @@ async def chat_with_bot(chat_message: ChatMessage):
             raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
         
         # Process message with chatbot
+        chatbot = await _chatbot()
         response = await chatbot.process_message(chat_message.message, chat_message.user_id)
         
         # Get suggestions for next actions
@@ -88,6 +92,7 @@ async def get_suggestions(user_id: int):
         if not user:
             raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
         
+        chatbot = await _chatbot()
         suggestions = await chatbot.get_suggestions(user_id)
         
         return {"suggestions": suggestions}
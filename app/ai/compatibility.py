@@ -0,0 +1,225 @@
+from typing import Dict, List
+import numpy as np
+from .utils import enum_value
+from .vector_search import normalize_rows
+from ..models.models import RoleEnum
+
+SEMANTIC_WEIGHT = 0.3
+INTEREST_WEIGHT = 0.25
+ACADEMIC_WEIGHT = 0.2
+ROLE_WEIGHT = 0.25
+
+
+def _role_values(profile: Dict) -> List[str]:
+    return [role.value if hasattr(role, 'value') else str(role) for role in profile.get('roles', [])]
+
+
+def compatibility_factors(user_profile: Dict, user_vector: np.ndarray,
+                          others: List[Dict], other_vectors: List[np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    Compatibility factors of one user against many others, as arrays (one entry per other).
+
+    Every array is computed row by row with the same operation order whatever the
+    number of others, so a single pair and a batch give bit-identical scores.
+
+    Returns:
+        Dict of float64 arrays 'semantic', 'interests', 'academic', 'role', 'total'
+        and boolean arrays 'has_semantic', 'has_interests' telling which optional
+        factors apply to each pair
+    """
+    n = len(others)
+
+    # Semantic similarity (float32 cosine, as produced by the sentence model)
+    has_vector = np.array([v is not None and v.size > 0 for v in other_vectors], dtype=bool)
+    semantic = np.zeros(n, dtype=np.float64)
+    has_semantic = has_vector & (user_vector is not None and user_vector.size > 0)
+    if has_semantic.any():
+        rows = np.flatnonzero(has_semantic)
+        normalized = normalize_rows([other_vectors[i] for i in rows])
+        user_normalized = normalize_rows(user_vector)[0]
+        semantic[rows] = (normalized * user_normalized).sum(axis=1).astype(np.float64)
+
+    # Interest overlap (Jaccard on interest titles)
+    user_interests = set(user_profile.get('interests', []))
+    other_interests = [set(p.get('interests', [])) for p in others]
+    shared = np.array([len(user_interests & s) for s in other_interests], dtype=np.float64)
+    sizes = np.array([len(s) for s in other_interests], dtype=np.float64)
+    union = len(user_interests) + sizes - shared
+    has_interests = union > 0
+    interests = np.divide(shared, union, out=np.zeros(n, dtype=np.float64), where=has_interests)
+
+    # Academic compatibility: same program, or diversity, plus closeness of levels
+    academic = np.zeros(n, dtype=np.float64)
+    user_filiere = enum_value(user_profile.get('filiere')) if user_profile.get('filiere') else None
+    if user_filiere is not None:
+        filieres = [enum_value(p['filiere']) if p.get('filiere') else None for p in others]
+        has_filiere = np.array([f is not None for f in filieres], dtype=bool)
+        same_filiere = np.array([f == user_filiere for f in filieres], dtype=bool)
+        academic += np.where(has_filiere, np.where(same_filiere, 0.6, 0.3), 0.0)
+    if user_profile.get('niveau'):
+        user_niveau = int(enum_value(user_profile['niveau']))
+        niveaux = np.array([int(enum_value(p['niveau'])) if p.get('niveau') else -100 for p in others], dtype=np.int64)
+        diff = np.abs(niveaux - user_niveau)
+        academic += np.select([diff == 0, diff == 1, diff == 2], [0.4, 0.3, 0.1], 0.0)
+
+    # Role compatibility: mentor/student pairs first, then peers
+    user_roles = set(_role_values(user_profile))
+    other_roles = [set(_role_values(p)) for p in others]
+    user_student = RoleEnum.STUDENT.value in user_roles
+    user_mentor = RoleEnum.MENTOR.value in user_roles
+    other_student = np.array([RoleEnum.STUDENT.value in r for r in other_roles], dtype=bool)
+    other_mentor = np.array([RoleEnum.MENTOR.value in r for r in other_roles], dtype=bool)
+    role = np.select(
+        [(user_student & other_mentor), (other_student & user_mentor), (user_student & other_student)],
+        [0.9, 0.9, 0.7], 0.5
+    )
+
+    total = np.zeros(n, dtype=np.float64)
+    total += np.where(has_semantic, semantic * SEMANTIC_WEIGHT, 0.0)
+    total += np.where(has_interests, interests * INTEREST_WEIGHT, 0.0)
+    total += academic * ACADEMIC_WEIGHT
+    total += role * ROLE_WEIGHT
+
+    return {
+        'semantic': semantic,
+        'has_semantic': has_semantic,
+        'interests': interests,
+        'has_interests': has_interests,
+        'academic': academic,
+        'role': role,
+        'total': total
+    }
+
+
+def compatibility_report(user_profile: Dict, other_profile: Dict,
+                         factors: Dict[str, np.ndarray], index: int) -> Dict:
+    """Compatibility analysis of one pair, built from entry `index` of compatibility_factors"""
+    compatibility_score = float(factors['total'][index])
+    compatibility_factors_list = []
+
+    if factors['has_semantic'][index]:
+        compatibility_factors_list.append({
+            'factor': 'semantic_similarity',
+            'score': float(factors['semantic'][index]),
+            'weight': SEMANTIC_WEIGHT
+        })
+
+    if factors['has_interests'][index]:
+        user1_interests = set(user_profile.get('interests', []))
+        user2_interests = set(other_profile.get('interests', []))
+        compatibility_factors_list.append({
+            'factor': 'shared_interests',
+            'score': float(factors['interests'][index]),
+            'weight': INTEREST_WEIGHT,
+            'shared_interests': list(user1_interests & user2_interests)
+        })
+
+    compatibility_factors_list.append({
+        'factor': 'academic_compatibility',
+        'score': float(factors['academic'][index]),
+        'weight': ACADEMIC_WEIGHT
+    })
+    compatibility_factors_list.append({
+        'factor': 'role_compatibility',
+        'score': float(factors['role'][index]),
+        'weight': ROLE_WEIGHT
+    })
+
+    # Generate recommendations based on compatibility
+    recommendations = []
+    if compatibility_score > 0.7:
+        recommendations.append("Highly compatible - excellent match for collaboration")
+    elif compatibility_score > 0.5:
+        recommendations.append("Good compatibility - worth connecting")
+    elif compatibility_score > 0.3:
+        recommendations.append("Moderate compatibility - potential for specific projects")
+    else:
+        recommendations.append("Low compatibility - may not be the best match")
+
+    return {
+        'compatibility_score': compatibility_score,
+        'compatibility_level': 'high' if compatibility_score > 0.7 else 'medium' if compatibility_score > 0.4 else 'low',
+        'factors': compatibility_factors_list,
+        'recommendations': recommendations,
+        'users': {
+            'user1': _user_summary(user_profile),
+            'user2': _user_summary(other_profile)
+        }
+    }
+
+
+def _user_summary(profile: Dict) -> Dict:
+    return {
+        'id': profile['id'],
+        'name': f"{profile['nom']} {profile['prenom']}",
+        'roles': list(set(_role_values(profile))),
+        'filiere': profile['filiere'].value if profile.get('filiere') else None,
+        'niveau': profile['niveau'].value if profile.get('niveau') else None
+    }
+
+
+def compatibility_matrix(profiles: List[Dict], vectors: List[np.ndarray]) -> np.ndarray:
+    """
+    Pairwise compatibility_score of a set of users as a symmetric n x n matrix
+    (zero diagonal), using the same factors and weights as compatibility_factors
+    """
+    n = len(profiles)
+    if n == 0:
+        return np.zeros((0, 0), dtype=np.float64)
+
+    # Semantic similarity
+    has_vector = np.array([v is not None and v.size > 0 for v in vectors], dtype=bool)
+    semantic = np.zeros((n, n), dtype=np.float64)
+    rows = np.flatnonzero(has_vector)
+    if rows.size:
+        normalized = normalize_rows([vectors[i] for i in rows])
+        semantic[np.ix_(rows, rows)] = (normalized @ normalized.T).astype(np.float64)
+    has_semantic = np.outer(has_vector, has_vector)
+
+    # Interest overlap
+    interest_index: Dict[str, int] = {}
+    interest_sets = [set(p.get('interests', [])) for p in profiles]
+    for interests in interest_sets:
+        for title in interests:
+            interest_index.setdefault(title, len(interest_index))
+    memberships = np.zeros((n, max(len(interest_index), 1)), dtype=np.float64)
+    for i, interests in enumerate(interest_sets):
+        memberships[i, [interest_index[t] for t in interests]] = 1.0
+    shared = memberships @ memberships.T
+    sizes = memberships.sum(axis=1)
+    union = sizes[:, None] + sizes[None, :] - shared
+    has_interests = union > 0
+    interests = np.divide(shared, union, out=np.zeros((n, n), dtype=np.float64), where=has_interests)
+
+    # Academic compatibility
+    filieres = [enum_value(p['filiere']) if p.get('filiere') else None for p in profiles]
+    codes = {f: i for i, f in enumerate(dict.fromkeys(f for f in filieres if f is not None))}
+    filiere_codes = np.array([codes[f] if f is not None else -1 for f in filieres], dtype=np.int64)
+    has_filiere = filiere_codes >= 0
+    academic = np.where(
+        np.outer(has_filiere, has_filiere),
+        np.where(filiere_codes[:, None] == filiere_codes[None, :], 0.6, 0.3), 0.0
+    )
+    niveaux = np.array([int(enum_value(p['niveau'])) if p.get('niveau') else -100 for p in profiles], dtype=np.int64)
+    diff = np.abs(niveaux[:, None] - niveaux[None, :])
+    has_niveau = niveaux > 0
+    academic += np.where(
+        np.outer(has_niveau, has_niveau),
+        np.select([diff == 0, diff == 1, diff == 2], [0.4, 0.3, 0.1], 0.0), 0.0
+    )
+
+    # Role compatibility
+    roles = [set(_role_values(p)) for p in profiles]
+    student = np.array([RoleEnum.STUDENT.value in r for r in roles], dtype=bool)
+    mentor = np.array([RoleEnum.MENTOR.value in r for r in roles], dtype=bool)
+    role = np.select(
+        [np.outer(student, mentor), np.outer(mentor, student), np.outer(student, student)],
+        [0.9, 0.9, 0.7], 0.5
+    )
+
+    total = np.where(has_semantic, semantic * SEMANTIC_WEIGHT, 0.0)
+    total += np.where(has_interests, interests * INTEREST_WEIGHT, 0.0)
+    total += academic * ACADEMIC_WEIGHT
+    total += role * ROLE_WEIGHT
+    np.fill_diagonal(total, 0.0)
+    return total
@@ -0,0 +1,199 @@
+from typing import Iterable, List, Optional, Sequence, Tuple
+import os
+import struct
+import time
+import numpy as np
+from .quantization import QuantizedMatrix, quantize_int8, DTYPES, INT8
+from .vector_search import normalize_rows, top_k
+
+SEMANTIC_CORPUS_PATH = os.getenv("SEMANTIC_CORPUS_PATH", "data/semantic_corpus.bin")
+# Storage of the mapped matrix: float32, float16 or int8 (per-vector scale)
+SEMANTIC_CORPUS_DTYPE = os.getenv("SEMANTIC_CORPUS_DTYPE", "float32")
+# Readers look for a newer version at most this often (seconds)
+SEMANTIC_CORPUS_CHECK_INTERVAL = float(os.getenv("SEMANTIC_CORPUS_CHECK_INTERVAL", "5"))
+# Past this age the corpus is republished from the database before being used again
+SEMANTIC_CORPUS_MAX_AGE = float(os.getenv("SEMANTIC_CORPUS_MAX_AGE", "3600"))
+# Profiles re-encoded since publication are re-ranked on top of the scan; past this many, it is rebuilt instead
+SEMANTIC_CORPUS_MAX_CHANGED = int(os.getenv("SEMANTIC_CORPUS_MAX_CHANGED", "500"))
+
+# magic, version, rows, dim, dtype code, created_at; padded to HEADER_SIZE bytes
+_MAGIC = b"SCOLCORP"
+_HEADER = struct.Struct("<8sQQIB3xd")
+HEADER_SIZE = 64
+
+
+def _align(offset: int, alignment: int = 8) -> int:
+    return (offset + alignment - 1) // alignment * alignment
+
+
+def _layout(rows: int, dim: int, dtype: str) -> Tuple[int, int, int, int]:
+    """Byte offsets of the matrix, scales and ids sections, and the file size"""
+    itemsize = 1 if dtype == INT8 else np.dtype(dtype).itemsize
+    matrix_offset = HEADER_SIZE
+    scales_offset = _align(matrix_offset + rows * dim * itemsize)
+    ids_offset = _align(scales_offset + rows * 4)
+    return matrix_offset, scales_offset, ids_offset, ids_offset + rows * 8
+
+
+def read_version(path: str) -> Optional[int]:
+    """Version of the corpus file at path, None if there is no valid file"""
+    try:
+        with open(path, 'rb') as f:
+            magic, version, *_ = _HEADER.unpack(f.read(_HEADER.size))
+    except (OSError, struct.error):
+        return None
+    return version if magic == _MAGIC else None
+
+
+def write_corpus_file(path: str, ids: Sequence[int], vectors: Sequence[np.ndarray],
+                      dtype: str = SEMANTIC_CORPUS_DTYPE, created_at: Optional[float] = None) -> int:
+    """
+    Publish a new version of the corpus: header, normalised vector matrix, scales, user ids.
+
+    The file is written next to path and renamed over it, so readers only ever
+    see a complete version; those still mapping the previous file keep it until
+    they reopen.
+
+    Args:
+        created_at: When the vectors were read from the database (now by default);
+            embeddings saved after it are not assumed to be in the file
+
+    Returns:
+        The version written (strictly greater than the one it replaces)
+    """
+    if dtype not in DTYPES:
+        raise ValueError(f"Unknown embedding dtype {dtype!r}, expected one of {DTYPES}")
+    matrix = normalize_rows(vectors) if len(vectors) else np.zeros((0, 0), dtype=np.float32)
+    if dtype == INT8:
+        codes, scales = quantize_int8(matrix) if len(matrix) else (matrix.astype(np.int8), np.zeros(0, dtype=np.float32))
+    else:
+        codes, scales = matrix.astype(dtype), np.ones(len(matrix), dtype=np.float32)
+    rows, dim = matrix.shape
+
+    version = max(time.time_ns(), (read_version(path) or 0) + 1)
+    matrix_offset, scales_offset, ids_offset, size = _layout(rows, dim, dtype)
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        header = _HEADER.pack(_MAGIC, version, rows, dim, DTYPES.index(dtype),
+                              created_at if created_at is not None else time.time())
+        f.write(header.ljust(HEADER_SIZE, b"\0"))
+        f.write(np.ascontiguousarray(codes).tobytes())
+        f.seek(scales_offset)
+        f.write(np.asarray(scales, dtype='<f4').tobytes())
+        f.seek(ids_offset)
+        f.write(np.asarray(ids, dtype='<i8').tobytes())
+        f.truncate(size)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return version
+
+
+class MappedCorpus:
+    """
+    Read-only, memory-mapped view of the corpus file published by write_corpus_file.
+
+    Every worker maps the same file, so the vectors live once in the page cache
+    instead of once per process. refresh() notices a newly published file (the
+    path now names another inode) and maps it in place of the old one.
+    """
+
+    def __init__(self, path: str = SEMANTIC_CORPUS_PATH, check_interval: float = SEMANTIC_CORPUS_CHECK_INTERVAL):
+        self.path = path
+        self.check_interval = check_interval
+        self.version: Optional[int] = None
+        self.created_at: Optional[float] = None
+        self._vectors: Optional[QuantizedMatrix] = None
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._file_key: Optional[Tuple[int, int]] = None
+        self._checked_at: Optional[float] = None
+        self.reloads = 0
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.created_at if self.created_at is not None else float('inf')
+
+    def ids(self) -> np.ndarray:
+        return self._ids
+
+    def refresh(self, force: bool = False) -> bool:
+        """Map the latest published version if it changed; returns whether a corpus is mapped"""
+        now = time.monotonic()
+        if not force and self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return self._vectors is not None
+        self._checked_at = now
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return self._vectors is not None
+        if (stat.st_dev, stat.st_ino) != self._file_key:
+            try:
+                self._open()
+            except (OSError, ValueError) as e:
+                print(f"Error mapping semantic corpus: {e}")
+        return self._vectors is not None
+
+    def _open(self):
+        # Header and arrays are read through one descriptor, so they belong to the same version
+        with open(self.path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            magic, version, rows, dim, dtype_code, created_at = _HEADER.unpack(f.read(_HEADER.size))
+            if magic != _MAGIC:
+                raise ValueError(f"{self.path} is not a corpus file")
+            dtype = DTYPES[dtype_code]
+            matrix_offset, scales_offset, ids_offset, size = _layout(rows, dim, dtype)
+            if stat.st_size < size:
+                raise ValueError(f"{self.path} is truncated")
+
+            vectors = QuantizedMatrix(dim, dtype)
+            if rows:
+                vectors.codes = np.memmap(f, dtype=np.int8 if dtype == INT8 else dtype, mode='r',
+                                          offset=matrix_offset, shape=(rows, dim))
+                vectors.scales = np.memmap(f, dtype='<f4', mode='r', offset=scales_offset, shape=(rows,))
+                ids = np.memmap(f, dtype='<i8', mode='r', offset=ids_offset, shape=(rows,))
+            else:
+                ids = np.zeros(0, dtype=np.int64)
+
+        self._vectors, self._ids = vectors, ids
+        self.version, self.created_at = version, created_at
+        self._file_key = (stat.st_dev, stat.st_ino)
+        self.reloads += 1
+
+    def search(self, vector: np.ndarray, k: int,
+               exclude: Optional[Iterable[int]] = None) -> List[Tuple[int, float]]:
+        """Return up to k (user id, cosine score) pairs from a full scan of the mapped matrix, best first"""
+        if self._vectors is None or not len(self._ids):
+            return []
+        scores = self._vectors.dot(normalize_rows(vector)[0])
+        if exclude:
+            scores[np.isin(self._ids, np.fromiter(exclude, dtype=np.int64))] = -np.inf
+        best = top_k(scores, k)
+        return [(int(self._ids[i]), float(scores[i])) for i in best if np.isfinite(scores[i])]
+
+    def stats(self):
+        return {
+            'path': self.path,
+            'version': self.version,
+            'rows': len(self),
+            'dtype': self._vectors.dtype if self._vectors is not None else None,
+            'age_s': round(self.age, 1) if self.created_at is not None else None,
+            'reloads': self.reloads
+        }
+
+
+_mapped_corpus: Optional[MappedCorpus] = None
+
+
+def get_mapped_corpus() -> MappedCorpus:
+    """Return this process's view of the shared semantic corpus file"""
+    global _mapped_corpus
+    if _mapped_corpus is None:
+        _mapped_corpus = MappedCorpus()
+    return _mapped_corpus
@@ -0,0 +1,18 @@
+from fastapi import Depends
+from .model_registry import ModelRegistry, get_model_registry
+from .recommendation_service import RecommendationService
+from .ai_service import AIService
+
+
+def get_recommendation_service(
+    registry: ModelRegistry = Depends(get_model_registry)
+) -> RecommendationService:
+    """Recommendation service backed by the shared model registry"""
+    return RecommendationService(registry)
+
+
+def get_ai_service(
+    registry: ModelRegistry = Depends(get_model_registry)
+) -> AIService:
+    """AI service backed by the shared model registry"""
+    return AIService(registry)
@@ -0,0 +1,185 @@
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+import hashlib
+import threading
+import os
+import numpy as np
+from .quantization import encode_vector, decode_vector, stored_nbytes
+from ..models.models import ProfileEmbedding
+
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "20000"))
+# In-memory storage of cached vectors: float16 (as persisted, half of float32), int8 or float32
+EMBEDDING_CACHE_DTYPE = os.getenv("EMBEDDING_CACHE_DTYPE", "float16")
+
+# Keeps IN (...) lists below SQLite's bound-parameter limit
+EMBEDDING_QUERY_CHUNK_SIZE = 900
+
+
+def content_hash(profile_text: str, model_name: str) -> str:
+    """Key of a profile embedding: changes whenever the text or the model changes"""
+    return hashlib.sha256(f"{model_name}\n{profile_text}".encode('utf-8')).hexdigest()
+
+
+class EmbeddingStore:
+    """
+    Two-tier store for profile embeddings.
+
+    Vectors are keyed on a hash of the text built by StudentMatcher.build_profile_text
+    plus the model name, so only profiles whose text changed are re-encoded.
+    Hot vectors live in an in-memory LRU, stored compactly (float16 by default)
+    and decoded to float32 on read; every vector is also persisted as float16 in
+    the ProfileEmbedding table so restarts and other workers reuse them.
+    """
+
+    def __init__(self, max_memory_items: int = EMBEDDING_CACHE_SIZE, dtype: str = EMBEDDING_CACHE_DTYPE):
+        self.max_memory_items = max_memory_items
+        self.dtype = dtype
+        self._memory: "OrderedDict[str, object]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    def _memory_get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            stored = self._memory.get(key)
+            if stored is None:
+                return None
+            self._memory.move_to_end(key)
+        return decode_vector(stored, self.dtype)
+
+    def _memory_put(self, key: str, vector: np.ndarray) -> np.ndarray:
+        """Cache a vector; returns it as later reads will (decoded from the compact form)"""
+        stored = encode_vector(vector, self.dtype)
+        with self._lock:
+            previous = self._memory.pop(key, None)
+            if previous is not None:
+                self._memory_bytes -= stored_nbytes(previous)
+            self._memory[key] = stored
+            self._memory_bytes += stored_nbytes(stored)
+            while len(self._memory) > self.max_memory_items:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= stored_nbytes(evicted)
+        return decode_vector(stored, self.dtype)
+
+    async def get_vectors(self, profiles: List[Dict], matcher) -> List[np.ndarray]:
+        """
+        Return the embedding of each profile, encoding only the ones not stored yet
+
+        Args:
+            profiles: Profiles as returned by RecommendationService.get_profiles_bulk
+            matcher: StudentMatcher used to build profile texts and encode misses
+
+        Returns:
+            One float32 vector per profile, in input order (empty array if the model is unavailable)
+        """
+        model_name = matcher.model_name
+        texts = [matcher.build_profile_text(profile) for profile in profiles]
+        keys = [content_hash(text, model_name) for text in texts]
+        vectors: List[Optional[np.ndarray]] = [self._memory_get(key) for key in keys]
+        self.hits += sum(1 for v in vectors if v is not None)
+
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if not missing:
+            return vectors
+
+        # Durable tier: reuse persisted vectors whose hash still matches
+        stored = await self.load_rows([profiles[i]['id'] for i in missing], model_name)
+        to_encode = []
+        for i in missing:
+            row = stored.get(profiles[i]['id'])
+            if row is not None and row.content_hash == keys[i]:
+                vector = np.frombuffer(row.vector, dtype=np.float16).astype(np.float32)
+                vectors[i] = self._memory_put(keys[i], vector)
+                self.db_hits += 1
+            else:
+                to_encode.append(i)
+
+        self.misses += len(to_encode)
+        encoded = await matcher.encode_texts_async([texts[i] for i in to_encode])
+        saved = await self.save_vectors(
+            [profiles[i]['id'] for i in to_encode], [keys[i] for i in to_encode], encoded, model_name
+        )
+        for i, vector in zip(to_encode, saved):
+            vectors[i] = vector
+        return vectors
+
+    async def save_vectors(self, user_ids: List[int], keys: List[str], vectors: List[np.ndarray],
+                           model_name: str) -> List[np.ndarray]:
+        """
+        Cache freshly encoded vectors and persist them as float16 ProfileEmbedding rows
+
+        Rows are upserted on (utilisateur, model_name), so concurrent writers of the
+        same user (parallel requests, the warm-up of each worker, the precompute
+        job) overwrite each other instead of failing on the unique constraint.
+
+        Args:
+            keys: content_hash of each user's profile text
+
+        Returns:
+            The vectors as later reads will return them (empty arrays are kept but not stored)
+        """
+        saved = []
+        rows = {}
+        for user_id, key, vector in zip(user_ids, keys, vectors):
+            vector = np.asarray(vector, dtype=np.float32)
+            if vector.size == 0:
+                saved.append(vector)
+                continue
+            # Same precision whether this call encoded the vector or a later one reads it back
+            saved.append(self._memory_put(key, vector))
+            rows[user_id] = ProfileEmbedding(
+                utilisateur_id=user_id,
+                model_name=model_name,
+                content_hash=key,
+                dimension=vector.size,
+                vector=vector.astype(np.float16).tobytes()
+            )
+
+        if rows:
+            await ProfileEmbedding.bulk_create(
+                list(rows.values()),
+                on_conflict=['utilisateur_id', 'model_name'],
+                update_fields=['content_hash', 'dimension', 'vector', 'updated_at']
+            )
+
+        return saved
+
+    async def load_rows(self, user_ids: List[int], model_name: str) -> Dict[int, ProfileEmbedding]:
+        """Persisted embedding rows of these users for model_name, keyed by user id"""
+        rows = {}
+        for i in range(0, len(user_ids), EMBEDDING_QUERY_CHUNK_SIZE):
+            chunk = user_ids[i:i + EMBEDDING_QUERY_CHUNK_SIZE]
+            for row in await ProfileEmbedding.filter(utilisateur_id__in=chunk, model_name=model_name):
+                rows[row.utilisateur_id] = row
+        return rows
+
+    async def changed_since(self, timestamp: float, model_name: str, limit: int) -> List[int]:
+        """Users (at most limit) whose model_name embedding was saved after timestamp (seconds since the epoch)"""
+        return list(await ProfileEmbedding.filter(
+            model_name=model_name, updated_at__gt=datetime.fromtimestamp(timestamp, tz=timezone.utc)
+        ).limit(limit).values_list('utilisateur_id', flat=True))
+
+    def stats(self) -> Dict:
+        return {
+            'memory_items': len(self._memory),
+            'max_memory_items': self.max_memory_items,
+            'memory_dtype': self.dtype,
+            'memory_bytes': self._memory_bytes,
+            'memory_hits': self.hits,
+            'db_hits': self.db_hits,
+            'encoded': self.misses
+        }
+
+
+_store: Optional[EmbeddingStore] = None
+
+
+def get_embedding_store() -> EmbeddingStore:
+    """Return the process-wide embedding store"""
+    global _store
+    if _store is None:
+        _store = EmbeddingStore()
+    return _store
@@ -0,0 +1,84 @@
+from typing import Dict, List, Optional
+import asyncio
+import os
+import time
+import numpy as np
+
+# Minimum seconds between two semantic index rebuilds started by full-scan requests
+SEMANTIC_REBUILD_INTERVAL = float(os.getenv("SEMANTIC_REBUILD_INTERVAL", "300"))
+
+
+class SemanticIndexRebuilder:
+    """
+    Background rebuild of the semantic ANN index and corpus file.
+
+    Full-scan requests hand over the vectors they loaded. At most one rebuild
+    runs at a time, and at most one starts per interval. The k-means training,
+    the index save and the corpus file fsync happen on a worker thread, so no
+    request waits for them. The finished index is swapped in on the event loop.
+    Profile updates made during the rebuild are applied to it before the swap.
+    """
+
+    def __init__(self, interval: float = SEMANTIC_REBUILD_INTERVAL):
+        self.interval = interval
+        self.last_started_at: Optional[float] = None
+        self.rebuilds = 0
+        self.errors = 0
+        self._task: Optional[asyncio.Task] = None
+        self._pending_upserts: Dict[int, np.ndarray] = {}
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def schedule(self, service, user_ids: List[int], vectors: List[np.ndarray],
+                 loaded_at: Optional[float] = None) -> bool:
+        """Start a rebuild from these vectors unless one is running or ran recently; returns whether it started"""
+        now = time.monotonic()
+        if self.running or (self.last_started_at is not None and now - self.last_started_at < self.interval):
+            return False
+        self.last_started_at = now
+        self._pending_upserts = {}
+        self._task = asyncio.get_running_loop().create_task(self._run(service, user_ids, vectors, loaded_at))
+        return True
+
+    def record_upsert(self, user_id: int, vector: np.ndarray):
+        """Keep a profile update made during a rebuild, so the new index gets it too"""
+        if self.running:
+            self._pending_upserts[user_id] = vector
+
+    async def wait(self):
+        if self._task is not None:
+            await asyncio.shield(self._task)
+
+    async def _run(self, service, user_ids: List[int], vectors: List[np.ndarray], loaded_at: Optional[float]):
+        try:
+            index = await asyncio.get_running_loop().run_in_executor(
+                None, service.build_semantic_indexes, user_ids, vectors, loaded_at
+            )
+            service.install_semantic_index(index, self._pending_upserts)
+            self.rebuilds += 1
+        except Exception as e:
+            self.errors += 1
+            print(f"Error rebuilding semantic indexes: {e}")
+        finally:
+            self._pending_upserts = {}
+
+    def stats(self) -> Dict:
+        return {
+            'running': self.running,
+            'rebuilds': self.rebuilds,
+            'errors': self.errors,
+            'interval_s': self.interval
+        }
+
+
+_rebuilder: Optional[SemanticIndexRebuilder] = None
+
+
+def get_index_rebuilder() -> SemanticIndexRebuilder:
+    """Return the process-wide semantic index rebuilder"""
+    global _rebuilder
+    if _rebuilder is None:
+        _rebuilder = SemanticIndexRebuilder()
+    return _rebuilder
@@ -0,0 +1,80 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Tuple
+import asyncio
+import functools
+import os
+import time
+
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "2"))
+# Forward passes allowed to run at the same time for one model
+INFERENCE_MODEL_CONCURRENCY = int(os.getenv("INFERENCE_MODEL_CONCURRENCY", "1"))
+
+
+class _ModelTimings:
+    def __init__(self):
+        self.calls = 0
+        self.in_flight = 0
+        self.waiting = 0
+        self.total_queue_seconds = 0.0
+        self.max_queue_seconds = 0.0
+        self.total_run_seconds = 0.0
+
+    def to_dict(self) -> Dict:
+        return {
+            'calls': self.calls,
+            'in_flight': self.in_flight,
+            'waiting': self.waiting,
+            'avg_queue_ms': round(self.total_queue_seconds * 1000 / self.calls, 3) if self.calls else 0.0,
+            'max_queue_ms': round(self.max_queue_seconds * 1000, 3),
+            'avg_run_ms': round(self.total_run_seconds * 1000 / self.calls, 3) if self.calls else 0.0
+        }
+
+
+class InferenceExecutor:
+    """
+    Runs blocking model calls on a dedicated thread pool so the event loop stays free.
+
+    Each model gets its own concurrency limit; time spent waiting for a slot
+    (queue time) and running is recorded per model. Torch releases the GIL during
+    forward passes, so threads share the already loaded models without copying them.
+    """
+
+    def __init__(self, max_workers: int = INFERENCE_WORKERS,
+                 model_concurrency: int = INFERENCE_MODEL_CONCURRENCY):
+        self.max_workers = max_workers
+        self.model_concurrency = model_concurrency
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="inference")
+        self._semaphores: Dict[Tuple[int, str], asyncio.Semaphore] = {}
+        self._timings: Dict[str, _ModelTimings] = {}
+
+    def _semaphore(self, model_name: str) -> asyncio.Semaphore:
+        key = (id(asyncio.get_running_loop()), model_name)
+        if key not in self._semaphores:
+            self._semaphores[key] = asyncio.Semaphore(self.model_concurrency)
+        return self._semaphores[key]
+
+    async def run(self, model_name: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run fn(*args, **kwargs) on the pool once a slot for model_name is free"""
+        timings = self._timings.setdefault(model_name, _ModelTimings())
+        loop = asyncio.get_running_loop()
+        queued_at = time.perf_counter()
+        timings.waiting += 1
+        async with self._semaphore(model_name):
+            timings.waiting -= 1
+            started_at = time.perf_counter()
+            queue_time = started_at - queued_at
+            timings.calls += 1
+            timings.in_flight += 1
+            timings.total_queue_seconds += queue_time
+            timings.max_queue_seconds = max(timings.max_queue_seconds, queue_time)
+            try:
+                return await loop.run_in_executor(self._pool, functools.partial(fn, *args, **kwargs))
+            finally:
+                timings.in_flight -= 1
+                timings.total_run_seconds += time.perf_counter() - started_at
+
+    def stats(self) -> Dict[str, Dict]:
+        return {name: timings.to_dict() for name, timings in self._timings.items()}
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
@@ -0,0 +1,88 @@
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import os
+import time
+from .vector_search import top_k_pairs
+from ..models.models import UtilisateurCentreInteret
+
+# Rebuild from the database after this many seconds, to pick up writes made by other workers
+INTEREST_INDEX_TTL = float(os.getenv("INTEREST_INDEX_TTL", "300"))
+
+
+class InterestIndex:
+    """
+    Inverted index CentreInteret id -> user ids, plus each user's interest set.
+
+    Jaccard similarity is computed only for users sharing at least one interest
+    with the target; union sizes come from the stored per-user interest counts.
+    """
+
+    def __init__(self, ttl: float = INTEREST_INDEX_TTL):
+        self.ttl = ttl
+        self._users_by_interest: Dict[int, Set[int]] = defaultdict(set)
+        self._interests_by_user: Dict[int, Set[int]] = {}
+        self.loaded_at: Optional[float] = None
+
+    async def ensure_loaded(self):
+        """Build the index with a single query on first use, or once the TTL has expired"""
+        if self.loaded_at is not None and time.monotonic() - self.loaded_at < self.ttl:
+            return
+        rows = await UtilisateurCentreInteret.all().values_list('utilisateur_id', 'centreInteret_id')
+        users_by_interest: Dict[int, Set[int]] = defaultdict(set)
+        interests_by_user: Dict[int, Set[int]] = defaultdict(set)
+        for user_id, interest_id in rows:
+            users_by_interest[interest_id].add(user_id)
+            interests_by_user[user_id].add(interest_id)
+        self._users_by_interest = users_by_interest
+        self._interests_by_user = dict(interests_by_user)
+        self.loaded_at = time.monotonic()
+
+    def set_user_interests(self, user_id: int, interest_ids: Iterable[int]):
+        """Replace a user's interests (called when a profile is rewritten)"""
+        for interest_id in self._interests_by_user.pop(user_id, set()):
+            self._users_by_interest[interest_id].discard(user_id)
+        interest_ids = set(interest_ids)
+        if interest_ids:
+            self._interests_by_user[user_id] = interest_ids
+            for interest_id in interest_ids:
+                self._users_by_interest[interest_id].add(user_id)
+
+    def interests_of(self, user_id: int) -> Set[int]:
+        return self._interests_by_user.get(user_id, set())
+
+    def users_with(self, interest_id: int) -> Set[int]:
+        return self._users_by_interest.get(interest_id, set())
+
+    def overlap_counts(self, interest_ids: Iterable[int],
+                       candidate_ids: Optional[Set[int]] = None) -> Dict[int, int]:
+        """Number of shared interests for every user sharing at least one of interest_ids"""
+        counts: Dict[int, int] = defaultdict(int)
+        for interest_id in set(interest_ids):
+            for user_id in self._users_by_interest.get(interest_id, ()):
+                if candidate_ids is None or user_id in candidate_ids:
+                    counts[user_id] += 1
+        return counts
+
+    def jaccard(self, user_id: int, candidate_ids: Optional[Set[int]] = None, k: Optional[int] = None,
+                min_score: Optional[float] = None) -> List[Tuple[int, float]]:
+        """(candidate id, Jaccard similarity) for candidates sharing an interest, best first, ties by id"""
+        target = self.interests_of(user_id)
+        
+        def scores():
+            for candidate_id, shared in self.overlap_counts(target, candidate_ids).items():
+                if candidate_id != user_id:
+                    union = len(target) + len(self._interests_by_user[candidate_id]) - shared
+                    yield candidate_id, shared / union
+        
+        return top_k_pairs(scores(), k, min_score)
+
+
+_interest_index: Optional[InterestIndex] = None
+
+
+def get_interest_index() -> InterestIndex:
+    """Return the process-wide interest index"""
+    global _interest_index
+    if _interest_index is None:
+        _interest_index = InterestIndex()
+    return _interest_index
@@ -0,0 +1,250 @@
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+import asyncio
+import os
+from fastapi.encoders import jsonable_encoder
+from tortoise import timezone
+from .model_registry import get_model_registry
+from .recommendation_service import RecommendationService
+from .cache import get_recommendation_cache, user_tag, CACHE_MISS
+from ..models.models import MaterializedRecommendation
+
+# Recomputes queued behind profile writes are spread over this many concurrent workers
+MATERIALIZER_WORKERS = int(os.getenv("MATERIALIZER_WORKERS", "1"))
+# Users listed with a refreshed user that are recomputed after them (new lists first, then old ones)
+MATERIALIZER_CASCADE_LIMIT = int(os.getenv("MATERIALIZER_CASCADE_LIMIT", "20"))
+
+# Service method producing each materialised recommendation type, called as (user_id, limit)
+RECOMMENDATION_TYPES: Dict[str, Callable[[RecommendationService, int, int], Awaitable[List[Dict]]]] = {
+    'skill_swap': lambda service, user_id, limit: service.skill_swap(user_id, limit),
+    'study_buddies': lambda service, user_id, limit: service.find_study_buddies(user_id, limit),
+    'mentors': lambda service, user_id, limit: service.find_mentors(user_id, limit),
+    'interdisciplinary': lambda service, user_id, limit: service.find_interdisciplinary_collaborators(user_id, limit),
+    'groups': lambda service, user_id, limit: service.get_group_recommendations(user_id, limit),
+    'semantic': lambda service, user_id, limit: service.get_semantic_matches(user_id, limit),
+}
+
+# Default limit of each /recommendations endpoint, materialised for every refreshed user
+DEFAULT_LIMITS = {
+    'skill_swap': 10,
+    'study_buddies': 5,
+    'mentors': 5,
+    'interdisciplinary': 5,
+    'groups': 5,
+    'semantic': 5,
+}
+
+# Types whose payload ids are users (group recommendations hold group ids)
+_USER_TYPES = {'skill_swap', 'study_buddies', 'mentors', 'interdisciplinary', 'semantic'}
+
+
+class RecommendationMaterializer:
+    """
+    Stores the ranked results of every recommendation type per user in the
+    MaterializedRecommendation table, so endpoints read one row instead of
+    recomputing rankings on every call.
+
+    Rows are keyed by (user, type, limit) because some rankers split their
+    budget by limit, so a shorter list is not always a prefix of a longer one.
+    Profile, role and group membership writes enqueue the user; a background
+    worker recomputes that user's rows (re-encoding their profile embedding first
+    after a profile write), then the rows of the first cascade_limit users appearing
+    in their new or old lists (the ones whose rankings most likely include them).
+    """
+
+    def __init__(self, workers: int = MATERIALIZER_WORKERS, cascade_limit: int = MATERIALIZER_CASCADE_LIMIT):
+        self.workers = workers
+        self.cascade_limit = cascade_limit
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks: List[asyncio.Task] = []
+        self._pending: Set[int] = set()
+        self._reembed: Set[int] = set()
+        self._service: Optional[RecommendationService] = None
+        self.cache = get_recommendation_cache()
+
+        self.refreshed_users = 0
+        self.refreshed_rows = 0
+        self.errors = 0
+
+    @property
+    def service(self) -> RecommendationService:
+        if self._service is None:
+            self._service = RecommendationService(get_model_registry())
+        return self._service
+
+    def _ensure_workers(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._queue = asyncio.Queue()
+            self._loop = loop
+            self._tasks = []
+            self._pending.clear()
+            self._reembed.clear()
+        self._tasks = [task for task in self._tasks if not task.done()]
+        while len(self._tasks) < self.workers:
+            self._tasks.append(loop.create_task(self._run()))
+
+    def enqueue(self, *user_ids: int, cascade: bool = True, reembed: bool = False):
+        """
+        Schedule a background recompute of these users' stored recommendations
+
+        Args:
+            cascade: Also recompute the users listed in their recommendations
+            reembed: Re-encode their profile embeddings first (after a profile write)
+        """
+        self._ensure_workers()
+        if reembed:
+            self._reembed.update(user_ids)
+        for user_id in user_ids:
+            if user_id not in self._pending:
+                self._pending.add(user_id)
+                self._queue.put_nowait((user_id, cascade))
+
+    async def _run(self):
+        while True:
+            user_id, cascade = await self._queue.get()
+            self._pending.discard(user_id)
+            try:
+                if user_id in self._reembed:
+                    self._reembed.discard(user_id)
+                    await self.service.refresh_user_embedding(user_id)
+                neighbours = await self.refresh_user(user_id)
+                if cascade:
+                    self.enqueue(*neighbours[:self.cascade_limit], cascade=False)
+            except Exception as e:
+                self.errors += 1
+                print(f"Error materializing recommendations for user {user_id}: {e}")
+
+    async def refresh_user(self, user_id: int) -> List[int]:
+        """
+        Recompute every stored row of a user, plus the default-limit rows
+
+        Returns:
+            Ids of the users listed in the user's new recommendations, then of those
+            only listed in the previous ones
+        """
+        rows = await MaterializedRecommendation.filter(utilisateur_id=user_id)
+        targets = {(t, limit) for t, limit in DEFAULT_LIMITS.items()}
+        targets |= {(row.recommendation_type, row.result_limit) for row in rows if row.recommendation_type in RECOMMENDATION_TYPES}
+        previous = [(row.recommendation_type, row.payload) for row in rows]
+
+        neighbours: Dict[int, None] = {}
+        for recommendation_type, limit in sorted(targets):
+            payload, _ = await self.compute(self.service, user_id, recommendation_type, limit)
+            neighbours.update(dict.fromkeys(self._user_ids(recommendation_type, payload)))
+        for recommendation_type, payload in previous:
+            neighbours.update(dict.fromkeys(self._user_ids(recommendation_type, payload)))
+
+        self.refreshed_users += 1
+        neighbours.pop(user_id, None)
+        return list(neighbours)
+
+    @staticmethod
+    def _user_ids(recommendation_type: str, payload: List[Dict]) -> List[int]:
+        # In ranking order
+        if recommendation_type not in _USER_TYPES:
+            return []
+        return [item['id'] for item in payload if 'id' in item]
+
+    @classmethod
+    def _tags(cls, user_id: int, recommendation_type: str, payload: List[Dict]) -> List[str]:
+        # The user and everyone listed: a profile write by any of them expires the cached list
+        return [user_tag(uid) for uid in sorted({user_id, *cls._user_ids(recommendation_type, payload)})]
+
+    async def compute(self, service: RecommendationService, user_id: int,
+                      recommendation_type: str, limit: int) -> Tuple[List[Dict], datetime]:
+        """Run the ranker now and store its results"""
+        results = await RECOMMENDATION_TYPES[recommendation_type](service, user_id, limit)
+        payload = jsonable_encoder(results)
+        row = MaterializedRecommendation(
+            utilisateur_id=user_id,
+            recommendation_type=recommendation_type,
+            result_limit=limit,
+            payload=payload,
+            computed_at=timezone.now()
+        )
+        # Single upsert: the worker, ?fresh=true and cache misses may store the same row concurrently
+        await MaterializedRecommendation.bulk_create(
+            [row],
+            on_conflict=['utilisateur_id', 'recommendation_type', 'result_limit'],
+            update_fields=['payload', 'computed_at']
+        )
+        self.refreshed_rows += 1
+        # Write through so cached reads see the recomputed rows immediately
+        await self.cache.set(
+            self.cache.make_key(recommendation_type, user_id, limit, service.matcher.model_name),
+            (payload, row.computed_at, 'computed'), tags=self._tags(user_id, recommendation_type, payload)
+        )
+        return payload, row.computed_at
+
+    async def get(self, service: RecommendationService, user_id: int, recommendation_type: str,
+                  limit: int, fresh: bool = False) -> Dict:
+        """
+        Stored recommendations of a user, computed on demand when missing or when fresh is set.
+        Reads go through the recommendation cache, keyed by (type, user, limit, model version):
+        an expired or invalidated entry is served stale while it is recomputed in the background.
+
+        Returns:
+            Dict with 'results', 'computed_at', 'source' ('materialized' or 'computed'),
+            'cache' (HIT, STALE or MISS) and 'age' (seconds since the value was cached)
+        """
+        if fresh:
+            payload, computed_at = await self.compute(service, user_id, recommendation_type, limit)
+            value, cache_status, age = (payload, computed_at, 'computed'), CACHE_MISS, 0.0
+        else:
+            key = self.cache.make_key(recommendation_type, user_id, limit, service.matcher.model_name)
+            value, cache_status, age = await self.cache.get_or_revalidate(
+                key,
+                lambda: self._read(service, user_id, recommendation_type, limit),
+                tags=lambda value: self._tags(user_id, recommendation_type, value[0]),
+                revalidate=lambda: self._revalidate(service, user_id, recommendation_type, limit)
+            )
+        payload, computed_at, source = value
+        return {
+            'results': payload,
+            'computed_at': computed_at,
+            'source': source,
+            'cache': cache_status,
+            'age': age
+        }
+
+    async def _revalidate(self, service: RecommendationService, user_id: int,
+                          recommendation_type: str, limit: int) -> Optional[Tuple[List[Dict], datetime, str]]:
+        # The stored row may predate the invalidation, so recompute instead of reading it;
+        # a user already queued here is recomputed (and written through) by the worker
+        if user_id in self._pending:
+            return None
+        payload, computed_at = await self.compute(service, user_id, recommendation_type, limit)
+        return payload, computed_at, 'computed'
+
+    async def _read(self, service: RecommendationService, user_id: int,
+                    recommendation_type: str, limit: int) -> Tuple[List[Dict], datetime, str]:
+        row = await MaterializedRecommendation.get_or_none(
+            utilisateur_id=user_id, recommendation_type=recommendation_type, result_limit=limit
+        )
+        if row is not None:
+            return row.payload, row.computed_at, 'materialized'
+        payload, computed_at = await self.compute(service, user_id, recommendation_type, limit)
+        return payload, computed_at, 'computed'
+
+    def stats(self) -> Dict:
+        return {
+            'queue_depth': self._queue.qsize() if self._queue else 0,
+            'cascade_limit': self.cascade_limit,
+            'workers': len([task for task in self._tasks if not task.done()]),
+            'refreshed_users': self.refreshed_users,
+            'refreshed_rows': self.refreshed_rows,
+            'errors': self.errors
+        }
+
+
+_materializer: Optional[RecommendationMaterializer] = None
+
+
+def get_materializer() -> RecommendationMaterializer:
+    """Return the process-wide recommendation materializer"""
+    global _materializer
+    if _materializer is None:
+        _materializer = RecommendationMaterializer()
+    return _materializer
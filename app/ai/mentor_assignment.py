@@ -0,0 +1,80 @@
+from typing import Dict, List, Tuple
+import os
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from .utils import enum_value
+
+# Mentees a mentor takes on by default, existing mentorships and pending requests included
+MENTOR_CAPACITY = int(os.getenv("MENTOR_CAPACITY", "5"))
+# Same bonus as RecommendationService.find_mentors for a senior mentor of the same filiere
+SENIORITY_BONUS = 0.2
+
+# Score of a pair that must not be matched (a user cannot mentor themselves)
+_FORBIDDEN = -1.0
+
+
+def seniority_bonus_matrix(students: List[Dict], mentors: List[Dict]) -> np.ndarray:
+    """SENIORITY_BONUS where the mentor shares the student's filiere at a higher niveau"""
+    def codes(profiles: List[Dict]):
+        filieres = np.array([enum_value(p['filiere']) if p.get('filiere') else '' for p in profiles], dtype=object)
+        niveaux = np.array([int(enum_value(p['niveau'])) if p.get('niveau') else 0 for p in profiles], dtype=np.int64)
+        return filieres, niveaux
+
+    student_filieres, student_niveaux = codes(students)
+    mentor_filieres, mentor_niveaux = codes(mentors)
+    senior = (
+        (student_filieres[:, None] == mentor_filieres[None, :])
+        & (student_filieres[:, None] != '')
+        & (student_niveaux[:, None] > 0)
+        & (mentor_niveaux[None, :] > student_niveaux[:, None])
+    )
+    return np.where(senior, SENIORITY_BONUS, 0.0)
+
+
+def assign_mentors(scores: np.ndarray, capacities: List[int]) -> List[Tuple[int, int, float]]:
+    """
+    Many-to-one assignment maximising the total score, each mentor j taking at most capacities[j] students.
+
+    Solved as a rectangular assignment on an expanded matrix with one column per
+    mentor slot. Pairs scoring 0 or less are never proposed.
+
+    Args:
+        scores: n_students x n_mentors match scores
+        capacities: Remaining slots of each mentor
+
+    Returns:
+        (student index, mentor index, score) for every assigned student
+    """
+    capacities = np.minimum(np.maximum(np.asarray(capacities, dtype=np.int64), 0), scores.shape[0])
+    slot_mentor = np.repeat(np.arange(scores.shape[1]), capacities)
+    if scores.shape[0] == 0 or slot_mentor.size == 0:
+        return []
+
+    rows, slots = linear_sum_assignment(scores[:, slot_mentor], maximize=True)
+    return [
+        (int(i), int(slot_mentor[slot]), float(scores[i, slot_mentor[slot]]))
+        for i, slot in zip(rows, slots)
+        if scores[i, slot_mentor[slot]] > 0
+    ]
+
+
+def mentor_assignment_scores(matcher, students: List[Dict], mentors: List[Dict]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    find_mentors scores for every (student, mentor) pair: skill complementarity from
+    StudentMatcher.recommend_mentors plus the same-filiere seniority bonus
+
+    Returns:
+        (n_students x n_mentors scores, boolean matrix of the pairs that got the bonus)
+    """
+    scores = matcher.mentor_score_matrix(
+        [[comp['nom'] for comp in p['competences']] for p in students],
+        [[comp['nom'] for comp in p['competences']] for p in mentors]
+    ).astype(np.float64)
+    # find_mentors only applies the bonus to mentors with some complementarity
+    senior = (scores > 0) & (seniority_bonus_matrix(students, mentors) > 0)
+    scores += np.where(senior, SENIORITY_BONUS, 0.0)
+
+    student_ids = np.array([p['id'] for p in students], dtype=np.int64)
+    mentor_ids = np.array([p['id'] for p in mentors], dtype=np.int64)
+    scores[student_ids[:, None] == mentor_ids[None, :]] = _FORBIDDEN
+    return scores, senior
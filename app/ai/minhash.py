@@ -0,0 +1,240 @@
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set
+import os
+import time
+import numpy as np
+from ..models.models import UtilisateurCentreInteret, UtilisateurCompetence
+
+MINHASH_LSH_ENABLED = os.getenv("MINHASH_LSH_ENABLED", "false").lower() in ("1", "true", "yes")
+# Candidate pools smaller than this are scanned exactly even when LSH is enabled
+MINHASH_MIN_CORPUS = int(os.getenv("MINHASH_MIN_CORPUS", "20000"))
+MINHASH_BANDS = int(os.getenv("MINHASH_BANDS", "48"))
+MINHASH_ROWS = int(os.getenv("MINHASH_ROWS", "3"))
+MINHASH_SIGNATURES_PATH = os.getenv("MINHASH_SIGNATURES_PATH", "data/minhash_signatures.npz")
+# Seconds between two resynchronisations with the database (profile writes of other workers)
+MINHASH_INDEX_TTL = float(os.getenv("MINHASH_INDEX_TTL", "300"))
+
+_PRIME = (1 << 31) - 1
+_EMPTY = np.iinfo(np.uint64).max
+
+
+def profile_tokens(interest_ids: Iterable[int], competence_ids: Iterable[int]) -> Set[int]:
+    """Token set of a user: interests and competences kept apart by parity"""
+    return {2 * i for i in interest_ids} | {2 * c + 1 for c in competence_ids}
+
+
+def jaccard(a: Set[int], b: Set[int]) -> float:
+    union = len(a | b)
+    return len(a & b) / union if union else 0.0
+
+
+class MinHashLSH:
+    """
+    MinHash signatures over each user's UtilisateurCentreInteret and
+    UtilisateurCompetence sets, bucketed with LSH banding.
+
+    Two users become candidates when all `rows` hashes of at least one band agree,
+    which happens with probability 1 - (1 - J^rows)^bands for Jaccard J.
+    """
+
+    def __init__(self, bands: int = MINHASH_BANDS, rows: int = MINHASH_ROWS, seed: int = 1,
+                 ttl: float = MINHASH_INDEX_TTL):
+        self.bands = bands
+        self.rows = rows
+        self.seed = seed
+        self.ttl = ttl
+        rng = np.random.default_rng(seed)
+        num_perm = bands * rows
+        self._a = rng.integers(1, _PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _PRIME, size=num_perm, dtype=np.uint64)
+        self._signatures: Dict[int, np.ndarray] = {}
+        self._tokens: Dict[int, Set[int]] = {}
+        self._buckets: List[Dict[bytes, Set[int]]] = [defaultdict(set) for _ in range(bands)]
+        self.loaded_at: Optional[float] = None
+        self.dirty = False  # Changed since the signatures were last saved
+
+    @property
+    def loaded(self) -> bool:
+        return self.loaded_at is not None
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._signatures
+
+    def signature(self, tokens: Iterable[int]) -> np.ndarray:
+        tokens = np.fromiter(tokens, dtype=np.uint64)
+        if tokens.size == 0:
+            return np.full(self._a.size, _EMPTY, dtype=np.uint64)
+        hashes = (self._a[:, None] * tokens[None, :] + self._b[:, None]) % _PRIME
+        return hashes.min(axis=1)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[b * self.rows:(b + 1) * self.rows].tobytes() for b in range(self.bands)]
+
+    def upsert(self, user_id: int, tokens: Iterable[int], signature: Optional[np.ndarray] = None):
+        """Insert or refresh a user's signature and LSH buckets"""
+        tokens = set(tokens)
+        self.delete(user_id)
+        self._tokens[user_id] = tokens
+        if not tokens:
+            return  # Users without interests or skills never collide with anyone
+        signature = self.signature(tokens) if signature is None else signature
+        self._signatures[user_id] = signature
+        for band, key in enumerate(self._band_keys(signature)):
+            self._buckets[band][key].add(user_id)
+
+    def update_user(self, user_id: int, interest_ids: Iterable[int], competence_ids: Iterable[int]):
+        """Incremental update after a profile write; ignored until the index has been built"""
+        if self.loaded:
+            self.upsert(user_id, profile_tokens(interest_ids, competence_ids))
+            self.dirty = True
+
+    def delete(self, user_id: int):
+        self._tokens.pop(user_id, None)
+        signature = self._signatures.pop(user_id, None)
+        if signature is None:
+            return
+        for band, key in enumerate(self._band_keys(signature)):
+            bucket = self._buckets[band].get(key)
+            if bucket is not None:
+                bucket.discard(user_id)
+                if not bucket:
+                    del self._buckets[band][key]
+
+    def query(self, user_id: int) -> Set[int]:
+        """Users sharing at least one LSH band with user_id (approximate Jaccard neighbours)"""
+        signature = self._signatures.get(user_id)
+        if signature is None:
+            return set()
+        candidates: Set[int] = set()
+        for band, key in enumerate(self._band_keys(signature)):
+            candidates |= self._buckets[band].get(key, set())
+        candidates.discard(user_id)
+        return candidates
+
+    def estimated_jaccard(self, user_a: int, user_b: int) -> float:
+        sig_a, sig_b = self._signatures.get(user_a), self._signatures.get(user_b)
+        if sig_a is None or sig_b is None:
+            return 0.0
+        return float(np.mean(sig_a == sig_b))
+
+    def measure_recall(self, threshold: float = 0.2, sample_size: int = 200, seed: int = 0) -> Dict:
+        """
+        Recall of LSH candidates against exact Jaccard: for sampled users, the share
+        of users with Jaccard >= threshold that LSH returns as candidates.
+        """
+        rng = np.random.default_rng(seed)
+        user_ids = list(self._signatures)
+        if not user_ids:
+            return {'threshold': threshold, 'sampled_users': 0, 'recall': 0.0, 'candidate_fraction': 0.0}
+        sample = rng.choice(user_ids, min(sample_size, len(user_ids)), replace=False)
+
+        found = expected = candidates_total = 0
+        for user_id in sample.tolist():
+            tokens = self._tokens[user_id]
+            relevant = {
+                other for other in user_ids
+                if other != user_id and jaccard(tokens, self._tokens[other]) >= threshold
+            }
+            candidates = self.query(user_id)
+            expected += len(relevant)
+            found += len(relevant & candidates)
+            candidates_total += len(candidates)
+
+        return {
+            'bands': self.bands,
+            'rows': self.rows,
+            'threshold': threshold,
+            'sampled_users': len(sample),
+            'recall': found / expected if expected else 1.0,
+            'candidate_fraction': candidates_total / (len(sample) * max(len(user_ids) - 1, 1))
+        }
+
+    async def ensure_loaded(self, path: Optional[str] = MINHASH_SIGNATURES_PATH):
+        """
+        Load the signatures on first use (from the persisted file if available), then
+        resynchronise them with the database once the TTL has expired
+
+        Only users whose interests or skills changed are hashed again. The file is
+        rewritten after changes, so restarts and other workers start from it.
+        """
+        if self.loaded_at is not None and time.monotonic() - self.loaded_at < self.ttl:
+            return
+        if self.loaded_at is None and path and os.path.exists(path) and self.load(path):
+            self.loaded_at = time.monotonic()
+            return
+
+        if await self.sync():
+            self.dirty = True
+        self.loaded_at = time.monotonic()
+
+        if path and self.dirty:
+            try:
+                self.save(path)
+                self.dirty = False
+            except OSError as e:
+                print(f"Error saving MinHash signatures: {e}")
+
+    async def sync(self) -> int:
+        """Bring every user's token set in line with the database; returns how many users changed"""
+        interest_rows = await UtilisateurCentreInteret.all().values_list('utilisateur_id', 'centreInteret_id')
+        competence_rows = await UtilisateurCompetence.all().values_list('utilisateur_id', 'competence_id')
+        interests, competences = defaultdict(set), defaultdict(set)
+        for user_id, interest_id in interest_rows:
+            interests[user_id].add(interest_id)
+        for user_id, competence_id in competence_rows:
+            competences[user_id].add(competence_id)
+
+        changed = 0
+        user_ids = set(interests) | set(competences)
+        for user_id in set(self._tokens) - user_ids:
+            self.delete(user_id)
+            changed += 1
+        for user_id in user_ids:
+            tokens = profile_tokens(interests[user_id], competences[user_id])
+            if self._tokens.get(user_id) != tokens:
+                self.upsert(user_id, tokens)
+                changed += 1
+        return changed
+
+    def save(self, path: str):
+        """Persist signatures and token sets; the file is replaced atomically"""
+        user_ids = np.array(list(self._tokens), dtype=np.int64)
+        token_lists = [np.fromiter(self._tokens[u], dtype=np.int64) for u in user_ids.tolist()]
+        offsets = np.cumsum([0] + [len(t) for t in token_lists]).astype(np.int64)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"  # Workers may save concurrently
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                params=np.array([self.bands, self.rows, self.seed], dtype=np.int64),
+                user_ids=user_ids,
+                tokens=np.concatenate(token_lists) if token_lists else np.zeros(0, dtype=np.int64),
+                offsets=offsets
+            )
+        os.replace(tmp_path, path)
+
+    def load(self, path: str) -> bool:
+        """Load persisted signatures; returns False if they were built with other parameters"""
+        with np.load(path, allow_pickle=False) as state:
+            if state['params'].tolist() != [self.bands, self.rows, self.seed]:
+                return False
+            tokens, offsets = state['tokens'], state['offsets']
+            for i, user_id in enumerate(state['user_ids'].tolist()):
+                self.upsert(user_id, tokens[offsets[i]:offsets[i + 1]].tolist())
+        return True
+
+
+_minhash_index: Optional[MinHashLSH] = None
+
+
+def get_minhash_index() -> MinHashLSH:
+    """Return the process-wide MinHash LSH index"""
+    global _minhash_index
+    if _minhash_index is None:
+        _minhash_index = MinHashLSH()
+    return _minhash_index
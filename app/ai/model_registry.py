@@ -0,0 +1,212 @@
+from sentence_transformers import SentenceTransformer
+from transformers import pipeline
+from typing import Any, Callable, Dict, List, Optional
+import threading
+import time
+import os
+import numpy as np
+from .batching import MicroBatcher
+from .inference_executor import InferenceExecutor
+
+SENTENCE_MODEL = 'sentence'
+TOXICITY_MODEL = 'toxicity'
+CHATBOT_MODEL = 'chatbot'
+
+SENTENCE_MODEL_NAME = 'all-MiniLM-L6-v2'
+TOXICITY_MODEL_NAME = 'unitary/toxic-bert'
+CHATBOT_MODEL_NAME = 'all-mpnet-base-v2'
+
+
+def _load_sentence_model():
+    return SentenceTransformer(SENTENCE_MODEL_NAME)
+
+
+def _load_toxicity_classifier():
+    return pipeline(
+        "text-classification",
+        model=TOXICITY_MODEL_NAME,
+        device=-1  # Use CPU
+    )
+
+
+def _load_chatbot_model():
+    # Try to load from local models directory first
+    local_model_path = os.path.join(os.path.dirname(__file__), 'ai_models', 'multilingual-chatbot')
+    if os.path.exists(local_model_path):
+        return SentenceTransformer(local_model_path)
+    # Fallback to downloading from HuggingFace
+    return SentenceTransformer(CHATBOT_MODEL_NAME)
+
+
+def _encode_batch(model, texts: List[str]) -> List[np.ndarray]:
+    if model is None:
+        return [np.array([]) for _ in texts]
+    return list(model.encode(texts, batch_size=len(texts)))
+
+
+def _classify_batch(classifier, texts: List[str]) -> List[List[Dict]]:
+    if classifier is None:
+        return [[] for _ in texts]
+    # One top label per text; wrapped so each caller sees the single-text output shape
+    return [[result] for result in classifier(texts)]
+
+
+def _estimate_model_memory(model: Any) -> int:
+    """Return the size in bytes of the parameters and buffers held by a model"""
+    module = getattr(model, 'model', model)  # pipelines wrap the torch module
+    total = 0
+    try:
+        for tensor in list(module.parameters()) + list(module.buffers()):
+            total += tensor.numel() * tensor.element_size()
+    except (AttributeError, TypeError):
+        return 0
+    return total
+
+
+class ModelStats:
+    """Load counters for a single registered model"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.load_count = 0
+        self.load_time_seconds = 0.0
+        self.memory_bytes = 0
+        self.loaded_at: Optional[float] = None
+        self.error: Optional[str] = None
+
+    def to_dict(self) -> Dict:
+        return {
+            'name': self.name,
+            'loaded': self.loaded_at is not None,
+            'load_count': self.load_count,
+            'load_time_seconds': round(self.load_time_seconds, 3),
+            'memory_mb': round(self.memory_bytes / (1024 * 1024), 2),
+            'loaded_at': self.loaded_at,
+            'error': self.error
+        }
+
+
+class ModelRegistry:
+    """
+    Process-wide holder for the AI models.
+
+    Each model is loaded lazily on first use and then shared by every
+    service instance, so request handlers never pay deserialisation cost twice.
+    """
+
+    def __init__(self, executor: Optional[InferenceExecutor] = None):
+        self.executor = executor or InferenceExecutor()
+        self._loaders: Dict[str, Callable[[], Any]] = {}
+        self._batch_processors: Dict[str, Callable[[Any, List[Any]], List[Any]]] = {}
+        self._batchers: Dict[str, MicroBatcher] = {}
+        self._models: Dict[str, Any] = {}
+        self._stats: Dict[str, ModelStats] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._registry_lock = threading.Lock()
+
+    def register(self, name: str, loader: Callable[[], Any],
+                 batch_processor: Optional[Callable[[Any, List[Any]], List[Any]]] = None):
+        """
+        Register a loader; the model is not loaded until first requested.
+        batch_processor(model, items) runs one batched forward pass for the model's micro-batcher.
+        """
+        with self._registry_lock:
+            self._loaders[name] = loader
+            if batch_processor is not None:
+                self._batch_processors[name] = batch_processor
+                self._batchers.pop(name, None)
+            self._stats.setdefault(name, ModelStats(name))
+            self._locks.setdefault(name, threading.Lock())
+
+    def get(self, name: str) -> Optional[Any]:
+        """Return the model, loading it on first access. Returns None if loading failed."""
+        if name in self._models:
+            return self._models[name]
+        if name not in self._loaders:
+            raise KeyError(f"Unknown model: {name}")
+
+        stats = self._stats[name]
+        with self._locks[name]:
+            # Another thread may have loaded it while we waited
+            if name in self._models:
+                return self._models[name]
+            if stats.error is not None:
+                return None
+
+            start = time.perf_counter()
+            try:
+                model = self._loaders[name]()
+            except Exception as e:
+                stats.error = str(e)
+                print(f"Error loading model {name}: {e}")
+                return None
+
+            stats.load_count += 1
+            stats.load_time_seconds = time.perf_counter() - start
+            stats.memory_bytes = _estimate_model_memory(model)
+            stats.loaded_at = time.time()
+            stats.error = None
+            self._models[name] = model
+            return model
+
+    def batcher(self, name: str) -> MicroBatcher:
+        """Micro-batcher that groups concurrent single-item calls to a model"""
+        with self._registry_lock:
+            if name not in self._batchers:
+                processor = self._batch_processors[name]
+                self._batchers[name] = MicroBatcher(
+                    name, lambda items: processor(self.get(name), items),
+                    executor=self.executor
+                )
+            return self._batchers[name]
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._models
+
+    def reset(self, name: str):
+        """Drop a loaded (or failed) model so the next access reloads it"""
+        with self._locks[name]:
+            self._models.pop(name, None)
+            self._stats[name].error = None
+            self._stats[name].loaded_at = None
+
+    def stats(self) -> Dict[str, Dict]:
+        result = {}
+        executor_stats = self.executor.stats()
+        for name, stats in self._stats.items():
+            result[name] = stats.to_dict()
+            if name in self._batchers:
+                result[name]['batching'] = self._batchers[name].stats()
+            if name in executor_stats:
+                result[name]['executor'] = executor_stats[name]
+        return result
+
+    @property
+    def sentence_model(self) -> Optional[SentenceTransformer]:
+        return self.get(SENTENCE_MODEL)
+
+    @property
+    def toxicity_classifier(self):
+        return self.get(TOXICITY_MODEL)
+
+    @property
+    def chatbot_model(self) -> Optional[SentenceTransformer]:
+        return self.get(CHATBOT_MODEL)
+
+
+_registry: Optional[ModelRegistry] = None
+_registry_init_lock = threading.Lock()
+
+
+def get_model_registry() -> ModelRegistry:
+    """Return the process-wide model registry (usable as a FastAPI dependency)"""
+    global _registry
+    if _registry is None:
+        with _registry_init_lock:
+            if _registry is None:
+                registry = ModelRegistry()
+                registry.register(SENTENCE_MODEL, _load_sentence_model, _encode_batch)
+                registry.register(TOXICITY_MODEL, _load_toxicity_classifier, _classify_batch)
+                registry.register(CHATBOT_MODEL, _load_chatbot_model, _encode_batch)
+                _registry = registry
+    return _registry
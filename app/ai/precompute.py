@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Offline precomputation of profile embeddings and similarity indexes
+
+Encodes every user profile whose stored embedding is missing or stale (profile
+text or sentence model changed) in length-sorted batches spread over worker
+processes, and saves them in the embedding store. Then rebuilds the semantic
+ANN index, the shared semantic corpus file and the MinHash signatures, so the
+API does not build them while serving requests (after a model upgrade, before
+term starts).
+
+A checkpoint is written after every chunk of users; an interrupted run resumes
+after the last completed chunk. --dry-run only reports how much work there is.
+
+Usage: python -m app.ai.precompute --workers 4 --batch-size 256
+       python -m app.ai.precompute --dry-run
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Dict, List, Optional
+import argparse
+import asyncio
+import json
+import os
+import time
+import numpy as np
+from tortoise import Tortoise
+from .embedding_store import content_hash
+from .minhash import MinHashLSH, MINHASH_SIGNATURES_PATH
+from .recommendation_service import RecommendationService
+from .student_matcher import StudentMatcher, length_sorted_batches
+from ..models.models import Utilisateur
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite://data/schoolcollab.db")
+PRECOMPUTE_WORKERS = int(os.getenv("PRECOMPUTE_WORKERS", "2"))
+PRECOMPUTE_BATCH_SIZE = int(os.getenv("PRECOMPUTE_BATCH_SIZE", "256"))
+# Users loaded, encoded and saved per step; the checkpoint advances one chunk at a time
+PRECOMPUTE_CHUNK_SIZE = int(os.getenv("PRECOMPUTE_CHUNK_SIZE", "4096"))
+PRECOMPUTE_CHECKPOINT_PATH = os.getenv("PRECOMPUTE_CHECKPOINT_PATH", "data/precompute_checkpoint.json")
+
+_worker_matcher: Optional[StudentMatcher] = None
+
+
+def _init_worker(threads: int):
+    global _worker_matcher
+    try:
+        import torch
+        torch.set_num_threads(threads)  # workers share the cores instead of each using all of them
+    except ImportError:
+        pass
+    _worker_matcher = StudentMatcher()
+
+
+def _encode_in_worker(texts: List[str]) -> List[np.ndarray]:
+    return _worker_matcher.encode_texts(texts, len(texts))
+
+
+class BatchEncoder:
+    """Encodes profile texts on a pool of worker processes, or in this process when workers <= 1"""
+
+    def __init__(self, matcher: StudentMatcher, workers: int, batch_size: int):
+        self.matcher = matcher
+        self.batch_size = batch_size
+        self.pool = None
+        if workers > 1:
+            self.pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=get_context("spawn"),  # torch is not fork-safe once its threads started
+                initializer=_init_worker,
+                initargs=(max(1, (os.cpu_count() or 1) // workers),)
+            )
+
+    async def encode(self, texts: List[str]) -> List[np.ndarray]:
+        """Vectors of texts in input order"""
+        if self.pool is None:
+            return await self.matcher.encode_texts_async(texts, self.batch_size)
+
+        loop = asyncio.get_running_loop()
+        batches = length_sorted_batches(texts, self.batch_size)
+        results = await asyncio.gather(*(
+            loop.run_in_executor(self.pool, _encode_in_worker, [texts[i] for i in batch]) for batch in batches
+        ))
+        vectors: List[Optional[np.ndarray]] = [None] * len(texts)
+        for batch, encoded in zip(batches, results):
+            for i, vector in zip(batch, encoded):
+                vectors[i] = vector
+        return vectors
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+
+
+def load_checkpoint(path: str, model_name: str, database_url: str) -> Optional[Dict]:
+    """Checkpoint of an interrupted run for the same model and database, None otherwise"""
+    try:
+        with open(path) as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if state.get('model_name') != model_name or state.get('database_url') != database_url:
+        return None
+    return state
+
+
+def save_checkpoint(path: str, state: Dict):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def _chunks(items: List[int], size: int) -> List[List[int]]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+async def _stale_profiles(service: RecommendationService, user_ids: List[int]):
+    """Profiles of user_ids whose stored embedding is missing or stale, with their texts and keys"""
+    matcher = service.matcher
+    profiles = await service.get_profiles_bulk(user_ids)
+    texts = [matcher.build_profile_text(profile) for profile in profiles]
+    keys = [content_hash(text, matcher.model_name) for text in texts]
+    stored = await service.embedding_store.load_rows([p['id'] for p in profiles], matcher.model_name)
+    stale = []
+    for i, profile in enumerate(profiles):
+        row = stored.get(profile['id'])
+        if row is None or row.content_hash != keys[i]:
+            stale.append(i)
+    return [profiles[i]['id'] for i in stale], [texts[i] for i in stale], [keys[i] for i in stale]
+
+
+async def estimate(service: RecommendationService, user_ids: List[int], workers: int,
+                   batch_size: int, chunk_size: int) -> Dict:
+    """Dry run: count profiles to encode and time one batch to extrapolate the run"""
+    stale_count = 0
+    sample: List[str] = []
+    for chunk in _chunks(user_ids, chunk_size):
+        stale_ids, texts, _ = await _stale_profiles(service, chunk)
+        stale_count += len(stale_ids)
+        sample.extend(texts[:batch_size - len(sample)])
+
+    report = {'users': len(user_ids), 'to_encode': stale_count, 'workers': workers, 'batch_size': batch_size}
+    if not sample:
+        return report
+
+    matcher = service.matcher
+    if matcher.encode_text(sample[0]).size == 0:  # also loads the model outside the timing
+        report['error'] = "Sentence model unavailable"
+        return report
+    start = time.perf_counter()
+    vectors = matcher.encode_texts(sample, len(sample))
+    seconds_per_profile = (time.perf_counter() - start) / len(sample)
+    dim = vectors[0].size
+    report.update({
+        'dimension': dim,
+        'sample_profiles_per_s': round(1 / seconds_per_profile, 1),
+        'estimated_encode_s': round(stale_count * seconds_per_profile / max(workers, 1), 1),
+        'estimated_new_embedding_mb': round(stale_count * dim * 2 / 2 ** 20, 2)  # float16 rows
+    })
+    return report
+
+
+async def build_indexes(service: RecommendationService, user_ids: List[int], chunk_size: int):
+    """Rebuild the semantic ANN index, the shared corpus file and the MinHash signatures"""
+    indexed_ids, vectors = [], []
+    loaded_at = time.time()
+    for chunk in _chunks(user_ids, chunk_size):
+        profiles = await service.get_profiles_bulk(chunk)
+        # Profiles edited since they were encoded are re-encoded here
+        for profile, vector in zip(profiles, await service.embedding_store.get_vectors(profiles, service.matcher)):
+            if vector.size > 0:
+                indexed_ids.append(profile['id'])
+                vectors.append(vector)
+    if indexed_ids:
+        service.publish_semantic_indexes(indexed_ids, vectors, loaded_at)
+    print(f"Semantic indexes: {len(indexed_ids)} vectors", flush=True)
+
+    minhash = MinHashLSH()
+    await minhash.ensure_loaded(path=None)
+    minhash.save(MINHASH_SIGNATURES_PATH)
+    print(f"MinHash signatures: {len(minhash)} users", flush=True)
+
+
+async def precompute(database_url: str = DATABASE_URL, workers: int = PRECOMPUTE_WORKERS,
+                     batch_size: int = PRECOMPUTE_BATCH_SIZE, chunk_size: int = PRECOMPUTE_CHUNK_SIZE,
+                     checkpoint_path: str = PRECOMPUTE_CHECKPOINT_PATH, resume: bool = True,
+                     dry_run: bool = False, indexes: bool = True) -> int:
+    """
+    Encode every stale profile embedding, then rebuild the similarity indexes
+
+    Expects Tortoise to be initialised (main() does it from DATABASE_URL).
+
+    Returns:
+        Process exit code
+    """
+    service = RecommendationService()
+    matcher = service.matcher
+    user_ids = list(await Utilisateur.all().order_by('id').values_list('id', flat=True))
+
+    checkpoint = load_checkpoint(checkpoint_path, matcher.model_name, database_url) if resume else None
+    last_user_id = checkpoint['last_user_id'] if checkpoint else None
+    remaining = [uid for uid in user_ids if last_user_id is None or uid > last_user_id]
+    if checkpoint:
+        print(f"Resuming after user {last_user_id} ({len(user_ids) - len(remaining)} users already done)", flush=True)
+
+    if dry_run:
+        print(await estimate(service, remaining, workers, batch_size, chunk_size), flush=True)
+        return 0
+
+    state = checkpoint or {
+        'model_name': matcher.model_name, 'database_url': database_url,
+        'last_user_id': None, 'encoded': 0, 'started_at': time.time()
+    }
+    done = len(user_ids) - len(remaining)
+    encoded = 0
+    start = time.perf_counter()
+    encoder = BatchEncoder(matcher, workers, batch_size)
+    try:
+        for chunk in _chunks(remaining, chunk_size):
+            stale_ids, texts, keys = await _stale_profiles(service, chunk)
+            vectors = await encoder.encode(texts)
+            if vectors and all(vector.size == 0 for vector in vectors):
+                print("Sentence model unavailable, nothing was encoded", flush=True)
+                return 1
+            await service.embedding_store.save_vectors(stale_ids, keys, vectors, matcher.model_name)
+
+            done += len(chunk)
+            encoded += len(stale_ids)
+            state['last_user_id'] = chunk[-1]
+            state['encoded'] += len(stale_ids)
+            save_checkpoint(checkpoint_path, state)
+
+            elapsed = time.perf_counter() - start
+            rate = (done - (len(user_ids) - len(remaining))) / elapsed if elapsed else 0.0
+            eta = (len(user_ids) - done) / rate if rate else 0.0
+            print(f"Embeddings: {done}/{len(user_ids)} users, {encoded} encoded "
+                  f"({rate:.0f} users/s, ETA {eta:.0f}s)", flush=True)
+    finally:
+        encoder.close()
+
+    if indexes:
+        await build_indexes(service, user_ids, chunk_size)
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    print(f"Done: {state['encoded']} embeddings encoded in {time.time() - state['started_at']:.0f}s", flush=True)
+    return 0
+
+
+async def main(args: argparse.Namespace) -> int:
+    await Tortoise.init(db_url=args.database_url, modules={"models": ["app.models.models"]})
+    try:
+        await Tortoise.generate_schemas(safe=True)
+        return await precompute(
+            args.database_url, args.workers, args.batch_size, args.chunk_size, args.checkpoint,
+            resume=not args.restart, dry_run=args.dry_run, indexes=not args.skip_indexes
+        )
+    finally:
+        await Tortoise.close_connections()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=DATABASE_URL)
+    parser.add_argument("--workers", type=int, default=PRECOMPUTE_WORKERS,
+                        help="Encoding processes (1 encodes in this process)")
+    parser.add_argument("--batch-size", type=int, default=PRECOMPUTE_BATCH_SIZE)
+    parser.add_argument("--chunk-size", type=int, default=PRECOMPUTE_CHUNK_SIZE)
+    parser.add_argument("--checkpoint", default=PRECOMPUTE_CHECKPOINT_PATH)
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint of an interrupted run")
+    parser.add_argument("--dry-run", action="store_true", help="Only estimate the size of the run")
+    parser.add_argument("--skip-indexes", action="store_true", help="Only encode embeddings")
+    raise SystemExit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,132 @@
+from typing import Optional, Tuple, Union
+import numpy as np
+
+INT8 = 'int8'
+FLOAT16 = 'float16'
+FLOAT32 = 'float32'
+DTYPES = (INT8, FLOAT16, FLOAT32)
+
+# Rows decoded to float32 at a time when scoring, bounding the temporary memory of a scan
+SCORE_CHUNK_ROWS = 16384
+
+RowSelector = Union[slice, np.ndarray]
+
+
+def quantize_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Symmetric per-vector int8 quantisation
+
+    Returns:
+        (int8 codes, float32 scale per vector); codes * scale approximates the input
+    """
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def encode_vector(vector: np.ndarray, dtype: str):
+    """Compact form of one vector: (int8 codes, scale) for int8, a float16/float32 array otherwise"""
+    if dtype == INT8:
+        codes, scales = quantize_int8(vector)
+        return codes[0], float(scales[0])
+    return np.asarray(vector, dtype=dtype)
+
+
+def decode_vector(stored, dtype: str) -> np.ndarray:
+    """float32 vector back from encode_vector"""
+    if dtype == INT8:
+        codes, scale = stored
+        return codes.astype(np.float32) * np.float32(scale)
+    return np.asarray(stored, dtype=np.float32)
+
+
+def stored_nbytes(stored) -> int:
+    return stored[0].nbytes + 4 if isinstance(stored, tuple) else stored.nbytes
+
+
+class QuantizedMatrix:
+    """
+    Row matrix of vectors stored as int8 with a per-row scale, as float16, or as float32.
+
+    int8 takes a quarter of the float32 memory and float16 half of it. Scores are
+    computed on the compact rows, decoded to float32 a chunk at a time, so they
+    approximate float32 scores; callers re-rank a shortlist with exact vectors.
+    """
+
+    def __init__(self, dim: int = 0, dtype: str = INT8, capacity: int = 0):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unknown embedding dtype {dtype!r}, expected one of {DTYPES}")
+        self.dtype = dtype
+        self.dim = dim
+        self.codes = np.zeros((capacity, dim), dtype=np.int8 if dtype == INT8 else np.dtype(dtype))
+        self.scales = np.ones(capacity, dtype=np.float32)
+
+    @classmethod
+    def from_float32(cls, vectors: np.ndarray, dtype: str = INT8) -> "QuantizedMatrix":
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        matrix = cls(vectors.shape[1], dtype)
+        if dtype == INT8:
+            matrix.codes, matrix.scales = quantize_int8(vectors)
+        else:
+            matrix.codes = vectors.astype(dtype)
+            matrix.scales = np.ones(len(vectors), dtype=np.float32)
+        return matrix
+
+    @property
+    def capacity(self) -> int:
+        return self.codes.shape[0]
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + (self.scales.nbytes if self.dtype == INT8 else 0)
+
+    def resize(self, capacity: int):
+        """Grow or shrink to capacity rows, keeping the existing ones"""
+        keep = min(capacity, self.capacity)
+        codes = np.zeros((capacity, self.dim), dtype=self.codes.dtype)
+        codes[:keep] = self.codes[:keep]
+        scales = np.ones(capacity, dtype=np.float32)
+        scales[:keep] = self.scales[:keep]
+        self.codes, self.scales = codes, scales
+
+    def set_row(self, row: int, vector: np.ndarray):
+        if self.dtype == INT8:
+            codes, scales = quantize_int8(vector)
+            self.codes[row], self.scales[row] = codes[0], scales[0]
+        else:
+            self.codes[row] = vector
+
+    def clear_row(self, row: int):
+        self.codes[row] = 0
+        self.scales[row] = 1.0
+
+    def decode(self, rows: Optional[RowSelector] = None) -> np.ndarray:
+        """float32 approximation of the selected rows (every row when None)"""
+        rows = slice(None) if rows is None else rows
+        decoded = self.codes[rows].astype(np.float32)
+        if self.dtype == INT8:
+            decoded *= self.scales[rows][:, None]
+        return decoded
+
+    def dot(self, query: np.ndarray, rows: Optional[RowSelector] = None) -> np.ndarray:
+        """Approximate scores of the selected rows (a row slice or index array) against a float32 query"""
+        query = np.asarray(query, dtype=np.float32)
+        if rows is None or isinstance(rows, slice):
+            start, stop, _ = (rows or slice(None)).indices(self.capacity)
+            scores = np.empty(stop - start, dtype=np.float32)
+            for chunk_start in range(start, stop, SCORE_CHUNK_ROWS):
+                chunk_stop = min(chunk_start + SCORE_CHUNK_ROWS, stop)
+                scores[chunk_start - start:chunk_stop - start] = self.codes[chunk_start:chunk_stop].astype(np.float32) @ query
+            if self.dtype == INT8:
+                scores *= self.scales[start:stop]
+            return scores
+
+        scores = np.empty(len(rows), dtype=np.float32)
+        for chunk_start in range(0, len(rows), SCORE_CHUNK_ROWS):
+            chunk = rows[chunk_start:chunk_start + SCORE_CHUNK_ROWS]
+            scores[chunk_start:chunk_start + len(chunk)] = self.codes[chunk].astype(np.float32) @ query
+        if self.dtype == INT8:
+            scores *= self.scales[rows]
+        return scores
@@ -1,210 +1,428 @@
 from typing import List, Dict, Optional
+import time
 import numpy as np
 from .student_matcher import StudentMatcher
+from .skill_matrix import SkillMatrix
+from .model_registry import ModelRegistry
+from .embedding_store import get_embedding_store
+from .interest_index import get_interest_index
+from .academic_index import get_academic_index
+from .minhash import get_minhash_index, MINHASH_LSH_ENABLED, MINHASH_MIN_CORPUS
+from .snapshot import RecommendationSnapshot
+from .cache import get_recommendation_cache, user_tag, POOLS_TAG
+from .ann_index import (
+    IVFIndex, get_semantic_index, set_semantic_index,
+    SEMANTIC_ANN_MIN_CORPUS, SEMANTIC_INDEX_PATH, SEMANTIC_RERANK_FACTOR
+)
+from .index_rebuilder import get_index_rebuilder
+from .corpus_file import (
+    get_mapped_corpus, write_corpus_file,
+    SEMANTIC_CORPUS_PATH, SEMANTIC_CORPUS_MAX_AGE, SEMANTIC_CORPUS_MAX_CHANGED
+)
 from ..models.models import (
     Utilisateur, CentreInteret, Competence, UtilisateurCentreInteret, 
     UtilisateurCompetence, UtilisateurRole, RoleEnum
 )
 
+# Keeps IN (...) lists below SQLite's bound-parameter limit
+PROFILE_QUERY_CHUNK_SIZE = 900
+
+
 class RecommendationService:
-    def __init__(self):
-        self.matcher = StudentMatcher()
-        self.user_vectors_cache = {}
+    def __init__(self, registry: Optional[ModelRegistry] = None):
+        self.matcher = StudentMatcher(registry)
+        self.embedding_store = get_embedding_store()
+        self.semantic_index = get_semantic_index()
+        self.semantic_corpus = get_mapped_corpus()
+        self.interest_index = get_interest_index()
+        self.academic_index = get_academic_index()
+        self.minhash_index = get_minhash_index()
+        self.cache = get_recommendation_cache()
     
     async def get_user_profile_data(self, user_id: int) -> Dict:
         """Get complete user profile data including interests, competencies, and roles"""
         user = await Utilisateur.get(id=user_id)
+        profiles = await self._build_profiles([user])
+        return profiles[0]
+    
+    async def get_profiles_bulk(self, user_ids: Optional[List[int]] = None,
+                                roles: Optional[List[RoleEnum]] = None,
+                                exclude_ids: Optional[List[int]] = None) -> List[Dict]:
+        """
+        Load profiles for many users with a constant number of set-based queries
         
-        # Get user roles
-        user_roles = await UtilisateurRole.filter(
-            utilisateur_id=user_id, statut='active'
+        Args:
+            user_ids: Restrict to these users (None means every user)
+            roles: Restrict to users holding one of these active roles
+            exclude_ids: Users to leave out (typically the requester)
+        
+        Returns:
+            Profiles ordered by user id, in the same shape as get_user_profile_data
+        """
+        if user_ids is not None and not user_ids:
+            return []
+        
+        users = []
+        id_chunks = self._chunks(list(dict.fromkeys(user_ids))) if user_ids is not None else [None]
+        for chunk in id_chunks:
+            query = Utilisateur.all()
+            if chunk is not None:
+                query = query.filter(id__in=chunk)
+            if roles:
+                query = query.filter(
+                    user_roles__role__in=roles, user_roles__statut='active'
+                ).distinct()
+            if exclude_ids:
+                query = query.exclude(id__in=exclude_ids)
+            users.extend(await query)
+        
+        users.sort(key=lambda u: u.id)
+        return await self._build_profiles(users)
+    
+    async def get_cached_profile(self, user_id: int) -> Dict:
+        """Profile of a user through the shared cache (concurrent requests load it once)"""
+        return await self.cache.get_or_compute(
+            f"profile:{user_id}", lambda: self.get_user_profile_data(user_id), tags=[user_tag(user_id)]
         )
-        roles = [ur.role for ur in user_roles]
-        
-        # Get user interests
-        user_interests = await UtilisateurCentreInteret.filter(
-            utilisateur_id=user_id
-        ).prefetch_related('centreInteret')
-        interests = [ui.centreInteret.titre for ui in user_interests]
-        
-        # Get user competencies
-        user_competences = await UtilisateurCompetence.filter(
-            utilisateur_id=user_id
-        ).prefetch_related('competence')
-        competences = [{'nom': uc.competence.nom, 'niveau': uc.niveau} for uc in user_competences]
-        
-        return {
-            'id': user.id,
-            'nom': user.nom,
-            'prenom': user.prenom,
-            'roles': roles,
-            'score': user.score,
-            'filiere': user.filiere,
-            'niveau': user.niveau,
-            'interests': interests,
-            'competences': competences
-        }
     
-    async def find_study_buddies(self, user_id: int, limit: int = 5) -> List[Dict]:
-        """Find study buddies with similar interests and academic level"""
-        user_profile = await self.get_user_profile_data(user_id)
+    async def get_cached_pool(self, roles: Optional[List[RoleEnum]] = None) -> List[Dict]:
+        """
+        Profiles of every user holding one of roles (all users when None) through the shared cache.
+        The returned list is shared between requests and must not be modified.
+        """
+        key = "pool:" + (",".join(sorted(role.value for role in roles)) if roles else "all")
+        return await self.cache.get_or_compute(
+            key, lambda: self.get_profiles_bulk(roles=roles), tags=[POOLS_TAG]
+        )
+    
+    async def _build_profiles(self, users: List[Utilisateur]) -> List[Dict]:
+        """Attach roles, interests and competences to already loaded users"""
+        user_roles = {user.id: [] for user in users}
+        user_interests = {user.id: [] for user in users}
+        user_competences = {user.id: [] for user in users}
+        
+        for chunk in self._chunks([user.id for user in users]):
+            role_rows = await UtilisateurRole.filter(
+                utilisateur_id__in=chunk, statut='active'
+            ).order_by('id').values_list('utilisateur_id', 'role')
+            for uid, role in role_rows:
+                user_roles[uid].append(RoleEnum(role))
+            
+            interest_rows = await UtilisateurCentreInteret.filter(
+                utilisateur_id__in=chunk
+            ).order_by('id').values_list('utilisateur_id', 'centreInteret__titre')
+            for uid, titre in interest_rows:
+                user_interests[uid].append(titre)
+            
+            competence_rows = await UtilisateurCompetence.filter(
+                utilisateur_id__in=chunk
+            ).order_by('id').values_list('utilisateur_id', 'competence__nom', 'niveau')
+            for uid, nom, niveau in competence_rows:
+                user_competences[uid].append({'nom': nom, 'niveau': niveau})
+        
+        return [
+            {
+                'id': user.id,
+                'nom': user.nom,
+                'prenom': user.prenom,
+                'roles': user_roles[user.id],
+                'score': user.score,
+                'filiere': user.filiere,
+                'niveau': user.niveau,
+                'interests': user_interests[user.id],
+                'competences': user_competences[user.id]
+            }
+            for user in users
+        ]
+    
+    @staticmethod
+    def _chunks(ids: List[int], size: int = PROFILE_QUERY_CHUNK_SIZE) -> List[List[int]]:
+        """Split ids so IN clauses stay below the database parameter limit"""
+        return [ids[i:i + size] for i in range(0, len(ids), size)]
+    
+    async def _lsh_candidate_ids(self, user_id: int) -> Optional[List[int]]:
+        """
+        First-stage candidates from MinHash LSH over interests and competences
         
-        # Get all other users who have student role
-        student_role_users = await UtilisateurRole.filter(
-            role=RoleEnum.STUDENT, statut='active'
-        ).exclude(utilisateur_id=user_id)
+        Returns:
+            Candidate user ids, or None when the full student pool should be scanned
+            (LSH disabled, pool below MINHASH_MIN_CORPUS, or user without signature)
+        """
+        if not MINHASH_LSH_ENABLED:
+            return None
+        pool_size = await UtilisateurRole.filter(role=RoleEnum.STUDENT, statut='active').count()
+        if pool_size < MINHASH_MIN_CORPUS:
+            return None
+        await self.minhash_index.ensure_loaded()
+        if user_id not in self.minhash_index:
+            return None
+        return sorted(self.minhash_index.query(user_id))
+    
+    async def find_study_buddies(self, user_id: int, limit: int = 5,
+                                 snapshot: Optional[RecommendationSnapshot] = None) -> List[Dict]:
+        """Find study buddies with similar interests and academic level"""
+        snapshot = snapshot or RecommendationSnapshot(self, user_id)
+        user_profile = await snapshot.user_profile()
         
-        candidate_profiles = []
-        for ur in student_role_users:
-            profile = await self.get_user_profile_data(ur.utilisateur_id)
-            candidate_profiles.append(profile)
+        # Other students come from the filiere/niveau index (LSH-preselected on large pools);
+        # only the profiles of the selected students are loaded
+        await self.academic_index.ensure_loaded()
+        lsh_ids = await self._lsh_candidate_ids(user_id)
+        candidate_ids = set(lsh_ids) if lsh_ids is not None else None
         
         # Combine different matching strategies
-        results = []
+        matches = []
         
         # 1. Same filiere and niveau matching
         if user_profile.get('filiere') and user_profile.get('niveau'):
             filiere_val = user_profile['filiere'].value if hasattr(user_profile['filiere'], 'value') else str(user_profile['filiere'])
             niveau_val = user_profile['niveau'].value if hasattr(user_profile['niveau'], 'value') else int(user_profile['niveau'])
             
-            filiere_matches = self.matcher.match_by_filiere_niveau(
-                filiere_val, niveau_val, candidate_profiles
+            filiere_matches = self.matcher.match_by_filiere_niveau_index(
+                user_id, filiere_val, niveau_val, self.academic_index, limit // 2,
+                min_score=0.3, candidate_ids=candidate_ids
             )
-            
-            for idx, score in filiere_matches[:limit//2]:
-                if score > 0.3:
-                    candidate = candidate_profiles[idx].copy()
-                    candidate['match_type'] = 'same_program'
-                    candidate['similarity_score'] = score
-                    results.append(candidate)
+            matches.extend((candidate_id, score, 'same_program') for candidate_id, score in filiere_matches)
         
         # 2. Interest-based matching for remaining slots
-        remaining_slots = limit - len(results)
+        remaining_slots = limit - len(matches)
         if remaining_slots > 0:
-            candidate_interests = [profile['interests'] for profile in candidate_profiles]
-            interest_matches = self.matcher.match_students_by_interests(
-                user_profile['interests'], 
-                candidate_interests
+            await self.interest_index.ensure_loaded()
+            students = self.academic_index.student_ids()
+            if candidate_ids is not None:
+                students &= candidate_ids
+            students.discard(user_id)
+            selected_ids = {candidate_id for candidate_id, _, _ in matches}
+            # Enough matches to fill the remaining slots even if all selected students rank first
+            interest_matches = self.matcher.match_students_by_interest_index(
+                user_id, self.interest_index, students,
+                k=remaining_slots + len(selected_ids), min_score=0.1
             )
             
-            for idx, score in interest_matches[:remaining_slots]:
-                if score > 0.1 and candidate_profiles[idx] not in [r for r in results]:
-                    candidate = candidate_profiles[idx].copy()
-                    candidate['match_type'] = 'shared_interests'
-                    candidate['similarity_score'] = score
-                    results.append(candidate)
+            for candidate_id, score in interest_matches:
+                if remaining_slots <= 0:
+                    break
+                if candidate_id not in selected_ids:
+                    matches.append((candidate_id, score, 'shared_interests'))
+                    selected_ids.add(candidate_id)
+                    remaining_slots -= 1
+        
+        profiles = {
+            profile['id']: profile
+            for profile in await snapshot.candidates([RoleEnum.STUDENT], [candidate_id for candidate_id, _, _ in matches])
+        } if matches else {}
+        results = []
+        for candidate_id, score, match_type in matches:
+            if candidate_id in profiles:
+                candidate = profiles[candidate_id].copy()
+                candidate['match_type'] = match_type
+                candidate['similarity_score'] = score
+                results.append(candidate)
         
         return results[:limit]
     
-    async def find_mentors(self, student_id: int, limit: int = 5) -> List[Dict]:
+    async def find_mentors(self, student_id: int, limit: int = 5,
+                           snapshot: Optional[RecommendationSnapshot] = None) -> List[Dict]:
         """Find potential mentors based on competency gaps and academic progression"""
-        student_profile = await self.get_user_profile_data(student_id)
+        snapshot = snapshot or RecommendationSnapshot(self, student_id)
+        student_profile = await snapshot.user_profile()
         student_competences = [comp['nom'] for comp in student_profile['competences']]
         
         # Get all users with mentor or teacher roles
-        mentor_role_users = await UtilisateurRole.filter(
-            role__in=[RoleEnum.MENTOR, RoleEnum.TEACHER], statut='active'
-        )
-        
-        mentor_profiles = []
-        mentor_competences = []
-        for ur in mentor_role_users:
-            profile = await self.get_user_profile_data(ur.utilisateur_id)
-            mentor_profiles.append(profile)
-            mentor_competences.append([comp['nom'] for comp in profile['competences']])
+        mentor_profiles = await snapshot.pool([RoleEnum.MENTOR, RoleEnum.TEACHER])
+        mentor_competences = [
+            [comp['nom'] for comp in profile['competences']] for profile in mentor_profiles
+        ]
         
         # Find mentors with complementary skills
-        matches = self.matcher.recommend_mentors(student_competences, mentor_competences)
+        matches = self.matcher.recommend_mentors(student_competences, mentor_competences, k=limit, min_score=0)
         
         results = []
-        for idx, score in matches[:limit]:
-            if score > 0:
-                mentor = mentor_profiles[idx].copy()
-                mentor['match_score'] = score
-                mentor['match_type'] = 'skill_complementarity'
+        for idx, score in matches:
+            mentor = mentor_profiles[idx].copy()
+            mentor['match_score'] = score
+            mentor['match_type'] = 'skill_complementarity'
+            
+            # Bonus for mentors in same filiere but higher niveau
+            if (student_profile.get('filiere') and mentor.get('filiere') and 
+                student_profile.get('niveau') and mentor.get('niveau')):
                 
-                # Bonus for mentors in same filiere but higher niveau
-                if (student_profile.get('filiere') and mentor.get('filiere') and 
-                    student_profile.get('niveau') and mentor.get('niveau')):
-                    
-                    student_filiere = student_profile['filiere'].value if hasattr(student_profile['filiere'], 'value') else str(student_profile['filiere'])
-                    mentor_filiere = mentor['filiere'].value if hasattr(mentor['filiere'], 'value') else str(mentor['filiere'])
-                    student_niveau = student_profile['niveau'].value if hasattr(student_profile['niveau'], 'value') else int(student_profile['niveau'])
-                    mentor_niveau = mentor['niveau'].value if hasattr(mentor['niveau'], 'value') else int(mentor['niveau'])
-                    
-                    if student_filiere == mentor_filiere and mentor_niveau > student_niveau:
-                        mentor['match_score'] += 0.2
-                        mentor['match_type'] = 'senior_same_program'
+                student_filiere = student_profile['filiere'].value if hasattr(student_profile['filiere'], 'value') else str(student_profile['filiere'])
+                mentor_filiere = mentor['filiere'].value if hasattr(mentor['filiere'], 'value') else str(mentor['filiere'])
+                student_niveau = student_profile['niveau'].value if hasattr(student_profile['niveau'], 'value') else int(student_profile['niveau'])
+                mentor_niveau = mentor['niveau'].value if hasattr(mentor['niveau'], 'value') else int(mentor['niveau'])
                 
-                results.append(mentor)
+                if student_filiere == mentor_filiere and mentor_niveau > student_niveau:
+                    mentor['match_score'] += 0.2
+                    mentor['match_type'] = 'senior_same_program'
+            
+            results.append(mentor)
         
         # Sort by final score
         results.sort(key=lambda x: x['match_score'], reverse=True)
         return results[:limit]
     
-    async def get_semantic_matches(self, user_id: int, limit: int = 5) -> List[Dict]:
+    async def get_semantic_matches(self, user_id: int, limit: int = 5,
+                                   snapshot: Optional[RecommendationSnapshot] = None) -> List[Dict]:
         """Find matches using semantic similarity of profiles"""
-        user_profile = await self.get_user_profile_data(user_id)
-        user_vector = self.matcher.encode_profile(user_profile)
+        snapshot = snapshot or RecommendationSnapshot(self, user_id)
+        user_profile = await snapshot.user_profile()
+        user_vector = (await snapshot.vectors([user_profile]))[0]
         
         if user_vector.size == 0:
             return []
         
-        # Get all other users
-        candidates = await Utilisateur.all().exclude(id=user_id)
-        
-        candidate_profiles = []
-        candidate_vectors = []
-        
-        for candidate in candidates:
-            profile = await self.get_user_profile_data(candidate.id)
-            vector = self.matcher.encode_profile(profile)
-            if vector.size > 0:
-                candidate_profiles.append(profile)
-                candidate_vectors.append(vector)
-        
-        # Find semantic matches
-        matches = self.matcher.find_matches(user_vector, candidate_vectors, limit)
+        index = self.semantic_index
+        corpus = self.semantic_corpus
+        hits = None
+        if index.is_trained and len(index) >= SEMANTIC_ANN_MIN_CORPUS:
+            # Large corpus: approximate search on the compact index
+            index.upsert(user_id, user_vector)
+            hits = index.search(user_vector, limit * SEMANTIC_RERANK_FACTOR, exclude=[user_id])
+        elif corpus.refresh() and len(corpus) and corpus.age < SEMANTIC_CORPUS_MAX_AGE:
+            # Profiles created or edited since the file was published are missing or stale in it
+            changed = await self.embedding_store.changed_since(
+                corpus.created_at, self.matcher.model_name, SEMANTIC_CORPUS_MAX_CHANGED + 1
+            )
+            if len(changed) <= SEMANTIC_CORPUS_MAX_CHANGED:
+                # Scan of the corpus file mapped by every worker instead of loading every profile
+                hits = corpus.search(user_vector, limit * SEMANTIC_RERANK_FACTOR, exclude=[user_id])
+                # The changed profiles join the shortlist and are scored on their current vectors
+                shortlisted = {uid for uid, _ in hits}
+                hits.extend((uid, 0.0) for uid in changed if uid != user_id and uid not in shortlisted)
+        
+        if hits is not None:
+            # Load only the shortlisted profiles and re-rank them with their exact float32 vectors
+            shortlist = await snapshot.candidates(user_ids=[uid for uid, _ in hits])
+            shortlist_vectors = await snapshot.vectors(shortlist)
+            matches = [
+                (shortlist[idx], score)
+                for idx, score in self.matcher.find_matches(user_vector, shortlist_vectors, limit, min_score=0.3)
+            ]
+        else:
+            # Get all other users
+            candidates = await snapshot.candidates()
+            
+            # Stored embeddings are reused; only changed profiles get re-encoded
+            vectors = await snapshot.vectors(candidates)
+            loaded_at = time.time()
+            
+            candidate_profiles = []
+            candidate_vectors = []
+            
+            for profile, vector in zip(candidates, vectors):
+                if vector.size > 0:
+                    candidate_profiles.append(profile)
+                    candidate_vectors.append(vector)
+            
+            # Find semantic matches
+            matches = [
+                (candidate_profiles[idx], score)
+                for idx, score in self.matcher.find_matches(user_vector, candidate_vectors, limit, min_score=0.3)
+            ]
+            
+            # Trained and published in the background, so this request does not wait for it
+            get_index_rebuilder().schedule(
+                self,
+                [user_id] + [p['id'] for p in candidate_profiles],
+                [user_vector] + candidate_vectors,
+                loaded_at
+            )
         
         results = []
-        for idx, score in matches:
+        for profile, score in matches:
             if score > 0.3:  # Minimum similarity threshold
-                candidate = candidate_profiles[idx].copy()
+                candidate = profile.copy()
                 candidate['semantic_score'] = score
                 candidate['match_type'] = 'semantic_similarity'
                 results.append(candidate)
         
         return results
     
-    async def find_interdisciplinary_collaborators(self, user_id: int, limit: int = 5) -> List[Dict]:
+    def publish_semantic_indexes(self, user_ids: List[int], vectors: List[np.ndarray],
+                                 loaded_at: Optional[float] = None):
+        """Rebuild the ANN index and the shared corpus file now (offline jobs; requests use the rebuilder)"""
+        self.install_semantic_index(self.build_semantic_indexes(user_ids, vectors, loaded_at))
+    
+    def build_semantic_indexes(self, user_ids: List[int], vectors: List[np.ndarray],
+                               loaded_at: Optional[float] = None) -> Optional[IVFIndex]:
+        """
+        Train a new ANN index (large corpora only) and publish the shared corpus file from every user's vector
+        
+        Touches no in-memory state shared with requests, so it can run on a worker thread;
+        install_semantic_index makes the result live.
+        
+        Args:
+            loaded_at: When the vectors were read; embeddings saved after it are merged in at search time
+        
+        Returns:
+            The trained index, None when the corpus is below SEMANTIC_ANN_MIN_CORPUS
+        """
+        index = None
+        if len(user_ids) >= SEMANTIC_ANN_MIN_CORPUS:
+            index = IVFIndex()
+            index.upsert_many(user_ids, vectors)
+            index.train()
+            try:
+                index.save(SEMANTIC_INDEX_PATH)
+            except OSError as e:
+                print(f"Error saving semantic index: {e}")
+        try:
+            write_corpus_file(SEMANTIC_CORPUS_PATH, user_ids, vectors, created_at=loaded_at)
+        except OSError as e:
+            print(f"Error publishing semantic corpus: {e}")
+        return index
+    
+    def install_semantic_index(self, index: Optional[IVFIndex], updates: Optional[Dict[int, np.ndarray]] = None):
+        """Swap in a rebuilt index, with the profile updates made while it was built, and map the new corpus file"""
+        if index is not None:
+            for user_id, vector in (updates or {}).items():
+                index.upsert(user_id, vector)
+            set_semantic_index(index)
+            self.semantic_index = index
+        self.semantic_corpus.refresh(force=True)
+    
+    async def refresh_user_embedding(self, user_id: int):
+        """Re-encode a user's profile after it changed and update the ANN index"""
+        profile = await self.get_user_profile_data(user_id)
+        vector = (await self.embedding_store.get_vectors([profile], self.matcher))[0]
+        if vector.size > 0 and self.semantic_index.is_trained:
+            self.semantic_index.upsert(user_id, vector)
+        if vector.size > 0:
+            get_index_rebuilder().record_upsert(user_id, vector)
+    
+    async def find_interdisciplinary_collaborators(self, user_id: int, limit: int = 5,
+                                                   snapshot: Optional[RecommendationSnapshot] = None) -> List[Dict]:
         """Find collaborators from different filieres for interdisciplinary projects"""
-        user_profile = await self.get_user_profile_data(user_id)
+        snapshot = snapshot or RecommendationSnapshot(self, user_id)
+        user_profile = await snapshot.user_profile()
         
         if not user_profile.get('filiere') or not user_profile.get('niveau'):
             return []
         
-        # Get all students excluding same user
-        student_role_users = await UtilisateurRole.filter(
-            role=RoleEnum.STUDENT, statut='active'
-        ).exclude(utilisateur_id=user_id)
-        
-        candidate_profiles = []
-        for ur in student_role_users:
-            profile = await self.get_user_profile_data(ur.utilisateur_id)
-            candidate_profiles.append(profile)
+        # Students from the filiere/niveau index (LSH-preselected on large pools)
+        await self.academic_index.ensure_loaded()
+        lsh_ids = await self._lsh_candidate_ids(user_id)
         
         user_filiere = user_profile['filiere'].value if hasattr(user_profile['filiere'], 'value') else str(user_profile['filiere'])
         user_niveau = user_profile['niveau'].value if hasattr(user_profile['niveau'], 'value') else int(user_profile['niveau'])
         
         # Find cross-filiere collaborators
-        matches = self.matcher.find_cross_filiere_collaborators(
-            user_filiere, user_niveau, candidate_profiles
+        matches = self.matcher.find_cross_filiere_collaborators_index(
+            user_id, user_filiere, user_niveau, self.academic_index, limit,
+            min_score=0.3, candidate_ids=set(lsh_ids) if lsh_ids is not None else None
         )
+        if not matches:
+            return []
         
+        profiles = {
+            profile['id']: profile
+            for profile in await snapshot.candidates([RoleEnum.STUDENT], [candidate_id for candidate_id, _ in matches])
+        }
         results = []
-        for idx, score in matches[:limit]:
-            if score > 0.3:
-                candidate = candidate_profiles[idx].copy()
+        for candidate_id, score in matches:
+            if candidate_id in profiles:
+                candidate = profiles[candidate_id].copy()
                 candidate['collaboration_score'] = score
                 candidate['match_type'] = 'interdisciplinary'
                 results.append(candidate)
@@ -213,11 +431,13 @@ class RecommendationService:
     
     async def check_content_safety(self, text: str) -> bool:
         """Check if content is safe (non-toxic)"""
-        return not self.matcher.is_toxic_content(text)
+        return not await self.matcher.is_toxic_content_async(text)
     
-    async def get_group_recommendations(self, user_id: int, limit: int = 5) -> List[Dict]:
+    async def get_group_recommendations(self, user_id: int, limit: int = 5,
+                                        snapshot: Optional[RecommendationSnapshot] = None) -> List[Dict]:
         """Recommend groups based on user interests"""
-        user_profile = await self.get_user_profile_data(user_id)
+        snapshot = snapshot or RecommendationSnapshot(self, user_id)
+        user_profile = await snapshot.user_profile()
         user_interests = set(user_profile['interests'])
         
         # Get all groups with their center of interest
@@ -243,7 +463,8 @@ class RecommendationService:
         group_scores.sort(key=lambda x: x['match_score'], reverse=True)
         return group_scores[:limit]
     
-    async def skill_swap(self, user_id: int, limit: int = 10) -> List[Dict]:
+    async def skill_swap(self, user_id: int, limit: int = 10,
+                         snapshot: Optional[RecommendationSnapshot] = None) -> List[Dict]:
         """
         Recommends users who have skills that the current user lacks or needs improvement in.
         
@@ -254,59 +475,56 @@ class RecommendationService:
         Returns:
             List of recommended users with skill swap scores and explanations
         """
-        user_profile = await self.get_user_profile_data(user_id)
+        snapshot = snapshot or RecommendationSnapshot(self, user_id)
+        user_profile = await snapshot.user_profile()
         
-        # Get all other users excluding the current user
-        all_users = await Utilisateur.all().exclude(id=user_id)
+        # Every other user, from the shared cached pool
+        candidate_profiles = await snapshot.candidates()
         
-        if not all_users:
+        if not candidate_profiles:
             return []
         
-        # Get profiles for all candidates
-        candidate_profiles = []
-        for user in all_users:
-            profile = await self.get_user_profile_data(user.id)
-            candidate_profiles.append(profile)
-        
         try:
-            # Get user's current skills and levels
-            user_competences = user_profile.get('competences', [])
-            user_skills = {}
-            
-            # Map user's skills to their levels (convert to numeric for comparison)
-            for comp in user_competences:
-                skill_name = comp.get('nom', '').lower()
-                skill_level = self._normalize_skill_level(comp.get('niveau', ''))
-                user_skills[skill_name] = skill_level
-            
-            recommendations = []
-            
-            for candidate in candidate_profiles:
-                candidate_competences = candidate.get('competences', [])
-                if not candidate_competences:
-                    continue
-                
-                # Calculate skill swap score for this candidate
-                swap_score, swap_details = self._calculate_swap_score(
-                    user_skills, candidate_competences, user_profile, candidate
-                )
-                
-                if swap_score > 0:
-                    recommendations.append({
-                        **candidate,
-                        'swap_score': swap_score,
-                        'swap_details': swap_details,
-                        'recommendation_type': 'skill_swap'
-                    })
-            
-            # Sort by swap score and return top recommendations
-            recommendations.sort(key=lambda x: x['swap_score'], reverse=True)
-            return recommendations[:limit]
-            
+            return self._rank_skill_swaps(user_profile, candidate_profiles, limit)
         except Exception as e:
             print(f"Error in skill swap recommendation: {e}")
             return []
     
+    def _rank_skill_swaps(self, user_profile: Dict, candidate_profiles: List[Dict], limit: int) -> List[Dict]:
+        """
+        Score every candidate at once on the skill matrix, then build the
+        detailed swap explanation only for the candidates that can make the top `limit`
+        """
+        matrix = SkillMatrix(candidate_profiles, self._normalize_skill_level)
+        
+        # Map user's skills to their levels (convert to numeric for comparison)
+        user_skills = {}
+        for comp in user_profile.get('competences', []):
+            skill_name = comp.get('nom', '').lower()
+            user_skills[skill_name] = matrix.level(comp.get('niveau', ''))
+        
+        units = matrix.swap_scores(user_skills, user_profile.get('filiere'), user_profile.get('niveau'))
+        
+        recommendations = []
+        for idx in SkillMatrix.shortlist(units, limit):
+            candidate = candidate_profiles[idx]
+            
+            # Calculate skill swap score for this candidate
+            swap_score, swap_details = self._calculate_swap_score(
+                user_skills, candidate['competences'], user_profile, candidate
+            )
+            
+            recommendations.append({
+                **candidate,
+                'swap_score': swap_score,
+                'swap_details': swap_details,
+                'recommendation_type': 'skill_swap'
+            })
+        
+        # Sort by swap score and return top recommendations
+        recommendations.sort(key=lambda x: x['swap_score'], reverse=True)
+        return recommendations[:limit]
+    
     def _calculate_swap_score(self, user_skills: Dict[str, int], 
                             candidate_competences: List[Dict],
                             user_profile: Dict, candidate_profile: Dict) -> tuple:
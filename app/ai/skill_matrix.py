@@ -0,0 +1,110 @@
+from typing import Callable, Dict, List, Optional
+import numpy as np
+from .utils import enum_value
+
+# Every term of the skill swap formula is a multiple of 1/50, so scores are
+# accumulated as exact integers in these units and ties compare exactly.
+SWAP_SCORE_UNITS = 50
+
+_FILIERE_NONE = -1
+
+
+class SkillMatrix:
+    """
+    Users x competences level matrix (uint8, levels 0-5) for vectorised skill swap scoring.
+
+    Mirrors RecommendationService._calculate_swap_score: the score of every
+    candidate is computed at once, and only the shortlist needs the detailed
+    per-skill explanation.
+    """
+
+    def __init__(self, profiles: List[Dict], normalize_level: Callable[[str], int]):
+        self._level_cache: Dict[str, int] = {}
+        self._normalize_level = normalize_level
+        self.skill_index: Dict[str, int] = {}
+
+        rows = []
+        for profile in profiles:
+            skills = {}
+            for comp in profile.get('competences', []):
+                skills[comp.get('nom', '').lower()] = self.level(comp.get('niveau', ''))
+            rows.append(skills)
+            for skill in skills:
+                self.skill_index.setdefault(skill, len(self.skill_index))
+
+        self.levels = np.zeros((len(profiles), max(len(self.skill_index), 1)), dtype=np.uint8)
+        for i, skills in enumerate(rows):
+            for skill, level in skills.items():
+                self.levels[i, self.skill_index[skill]] = level
+
+        self.row_totals = self.levels.sum(axis=1, dtype=np.int64)
+        self.has_competences = np.array([bool(p.get('competences')) for p in profiles], dtype=bool)
+
+        filiere_codes: Dict[str, int] = {}
+        self.filieres = np.array([
+            filiere_codes.setdefault(enum_value(p['filiere']), len(filiere_codes)) if p.get('filiere') else _FILIERE_NONE
+            for p in profiles
+        ], dtype=np.int64)
+        self._filiere_codes = filiere_codes
+        self.niveaux = np.array([int(enum_value(p['niveau'])) if p.get('niveau') else 0 for p in profiles], dtype=np.int64)
+
+    def __len__(self) -> int:
+        return self.levels.shape[0]
+
+    def level(self, raw_level: str) -> int:
+        """Normalised skill level, memoised since the same level strings repeat"""
+        key = raw_level if isinstance(raw_level, str) else str(raw_level)
+        if key not in self._level_cache:
+            self._level_cache[key] = self._normalize_level(raw_level)
+        return self._level_cache[key]
+
+    def swap_scores(self, user_skills: Dict[str, int], user_filiere=None, user_niveau=None) -> np.ndarray:
+        """
+        Skill swap score of every candidate, in SWAP_SCORE_UNITS.
+        Candidates without competences get -1 so they are never selected.
+        """
+        n = len(self)
+        known = [(self.skill_index[s], level) for s, level in user_skills.items() if s in self.skill_index]
+        columns = np.array([col for col, _ in known], dtype=np.int64)
+        user_levels = np.array([level for _, level in known], dtype=np.int64)
+
+        candidate_levels = self.levels[:, columns].astype(np.int64) if columns.size else np.zeros((n, 0), dtype=np.int64)
+        held = user_levels > 0
+
+        # Skills they offer: ones the user lacks (level 0 or absent) and ones the user holds at a lower level
+        lacking_total = self.row_totals - candidate_levels[:, held].sum(axis=1)
+        improve = np.clip(candidate_levels[:, held] - user_levels[held], 0, None).sum(axis=1)
+        units = 20 * lacking_total + 10 * improve
+
+        # Skills the user offers back (only competent levels, > 2)
+        for skill, level in user_skills.items():
+            if level <= 2:
+                continue
+            if skill in self.skill_index:
+                their = self.levels[:, self.skill_index[skill]].astype(np.int64)
+                units += np.where(their == 0, 5 * level, np.where(level > their, 3 * (level - their), 0))
+            else:
+                units += 5 * level
+
+        # Cross-domain and similar academic level bonuses
+        if user_filiere:
+            code = self._filiere_codes.get(enum_value(user_filiere), -2)
+            units += np.where((self.filieres != _FILIERE_NONE) & (self.filieres != code), 25, 0)
+        if user_niveau:
+            user_niveau = int(enum_value(user_niveau))
+            units += np.where((self.niveaux > 0) & (np.abs(self.niveaux - user_niveau) <= 1), 15, 0)
+
+        return np.where(self.has_competences, units, -1)
+
+    @staticmethod
+    def shortlist(units: np.ndarray, limit: int) -> np.ndarray:
+        """
+        Indices (in candidate order) that can reach the top `limit` positive scores.
+        Every candidate tied with the last selected score is kept so the final
+        stable sort on exact scores reproduces the full ranking.
+        """
+        positive = np.flatnonzero(units > 0)
+        if positive.size <= limit:
+            return positive
+        threshold = np.partition(units[positive], positive.size - limit)[positive.size - limit]
+        return positive[units[positive] >= threshold]
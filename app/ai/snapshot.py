@@ -0,0 +1,90 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+import asyncio
+import numpy as np
+from ..models.models import RoleEnum
+
+
+class RecommendationSnapshot:
+    """
+    Request-scoped view of the data recommendation sections score against.
+
+    The requester profile, candidate pools and embeddings are loaded at most once
+    per request, even when sections run concurrently; profiles and pools also go
+    through the shared recommendation cache, so concurrent requests share them. Once the full pool is
+    loaded, role pools (students, mentors...) are filtered from it in memory
+    instead of being queried again.
+    """
+
+    def __init__(self, service, user_id: int):
+        self.service = service
+        self.user_id = user_id
+        self._user_profile: Optional[Dict] = None
+        self._pools: Dict[Optional[Tuple[str, ...]], List[Dict]] = {}
+        self._vectors: Dict[int, np.ndarray] = {}
+        self.pool_loads = 0
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def _pool_key(roles: Optional[Iterable[RoleEnum]]) -> Optional[Tuple[str, ...]]:
+        return tuple(sorted(role.value for role in roles)) if roles else None
+
+    async def user_profile(self) -> Dict:
+        """Requester profile, taken from an already loaded pool when possible"""
+        async with self._lock:
+            if self._user_profile is None:
+                await self._load_user_profile()
+        return self._user_profile
+
+    async def _load_user_profile(self):
+        for profiles in self._pools.values():
+            found = next((p for p in profiles if p['id'] == self.user_id), None)
+            if found is not None:
+                self._user_profile = found
+                return
+        self._user_profile = await self.service.get_cached_profile(self.user_id)
+
+    async def pool(self, roles: Optional[List[RoleEnum]] = None) -> List[Dict]:
+        """
+        Profiles of every user holding one of `roles` (every user when None), ordered by id.
+        The requester is included if they qualify, as with get_profiles_bulk.
+        """
+        key = self._pool_key(roles)
+        async with self._lock:
+            if key not in self._pools:
+                if None in self._pools:
+                    wanted = set(roles)
+                    self._pools[key] = [
+                        p for p in self._pools[None] if any(role in wanted for role in p['roles'])
+                    ]
+                else:
+                    self.pool_loads += 1
+                    self._pools[key] = await self.service.get_cached_pool(roles)
+        return self._pools[key]
+
+    async def candidates(self, roles: Optional[List[RoleEnum]] = None,
+                         user_ids: Optional[List[int]] = None) -> List[Dict]:
+        """
+        Pool without the requester, optionally restricted to user_ids.
+
+        A restricted lookup is served from a loaded pool when there is one;
+        otherwise only those users are fetched, so a small preselection never
+        triggers a full pool load.
+        """
+        key = self._pool_key(roles)
+        if user_ids is not None and key not in self._pools and None not in self._pools:
+            return await self.service.get_profiles_bulk(user_ids, roles=roles, exclude_ids=[self.user_id])
+
+        profiles = await self.pool(roles)
+        if user_ids is not None:
+            wanted = set(user_ids)
+            return [p for p in profiles if p['id'] in wanted and p['id'] != self.user_id]
+        return [p for p in profiles if p['id'] != self.user_id]
+
+    async def vectors(self, profiles: List[Dict]) -> List[np.ndarray]:
+        """Profile embeddings, fetched from the embedding store once per user and request"""
+        missing = [p for p in profiles if p['id'] not in self._vectors]
+        if missing:
+            vectors = await self.service.embedding_store.get_vectors(missing, self.service.matcher)
+            for profile, vector in zip(missing, vectors):
+                self._vectors[profile['id']] = vector
+        return [self._vectors[p['id']] for p in profiles]
@@ -1,37 +1,40 @@
-from sentence_transformers import SentenceTransformer
-from transformers import pipeline
 import numpy as np
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Optional
 import pickle
 import os
+from .model_registry import (
+    ModelRegistry, get_model_registry, SENTENCE_MODEL, SENTENCE_MODEL_NAME, TOXICITY_MODEL
+)
+from .vector_search import stack_vectors, cosine_top_k, top_k_pairs
+
+# Texts per forward pass when encoding many profiles at once
+PROFILE_ENCODE_BATCH_SIZE = int(os.getenv("PROFILE_ENCODE_BATCH_SIZE", "64"))
+
+
+def length_sorted_batches(texts: List[str], batch_size: int) -> List[List[int]]:
+    """Indices of texts grouped into batches of similar length, so each batch pads little"""
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    return [order[start:start + batch_size] for start in range(0, len(order), max(batch_size, 1))]
+
 
 class StudentMatcher:
-    def __init__(self):
+    def __init__(self, registry: Optional[ModelRegistry] = None):
         self.model_path = os.path.join(os.path.dirname(__file__), 'ai_models')
-        self.sentence_model = None
-        self.toxicity_classifier = None
-        self._load_models()
+        self.registry = registry or get_model_registry()
+        self.model_name = SENTENCE_MODEL_NAME
     
-    def _load_models(self):
-        """Load pre-trained models"""
-        try:
-            # Load sentence transformer for semantic similarity
-            self.sentence_model = SentenceTransformer('all-MiniLM-L6-v2')
-            
-            # Load toxicity detection model
-            self.toxicity_classifier = pipeline(
-                "text-classification",
-                model="unitary/toxic-bert",
-                device=-1  # Use CPU
-            )
-        except Exception as e:
-            print(f"Error loading models: {e}")
+    @property
+    def sentence_model(self):
+        """Shared sentence transformer, loaded on first use"""
+        return self.registry.sentence_model
     
-    def encode_profile(self, user_data: Dict) -> np.ndarray:
-        """Encode user profile into vector representation"""
-        if not self.sentence_model:
-            return np.array([])
-        
+    @property
+    def toxicity_classifier(self):
+        """Shared toxicity pipeline, loaded on first use"""
+        return self.registry.toxicity_classifier
+    
+    def build_profile_text(self, user_data: Dict) -> str:
+        """Build the text representation of a profile that gets embedded"""
         # Combine user information into text
         profile_text = f"{user_data.get('nom', '')} {user_data.get('prenom', '')} "
         
@@ -59,27 +62,89 @@ class StudentMatcher:
             comp_text = " ".join([comp['nom'] for comp in user_data['competences']])
             profile_text += f"Skills: {comp_text}"
         
+        return profile_text
+    
+    def encode_profile(self, user_data: Dict) -> np.ndarray:
+        """Encode user profile into vector representation"""
+        if not self.sentence_model:
+            return np.array([])
+        
+        return self.encode_text(self.build_profile_text(user_data))
+    
+    def encode_text(self, profile_text: str) -> np.ndarray:
+        """Encode an already built profile text"""
+        if not self.sentence_model:
+            return np.array([])
+        
         return self.sentence_model.encode(profile_text)
     
+    def encode_profiles(self, profiles: List[Dict],
+                        batch_size: int = PROFILE_ENCODE_BATCH_SIZE) -> List[np.ndarray]:
+        """Encode many profiles in a few batched forward passes; vectors come back in input order"""
+        return self.encode_texts([self.build_profile_text(profile) for profile in profiles], batch_size)
+    
+    def encode_texts(self, texts: List[str], batch_size: int = PROFILE_ENCODE_BATCH_SIZE) -> List[np.ndarray]:
+        """Encode already built profile texts, batched by length; vectors come back in input order"""
+        if not self.sentence_model:
+            return [np.array([]) for _ in texts]
+        
+        vectors: List[Optional[np.ndarray]] = [None] * len(texts)
+        for batch in length_sorted_batches(texts, batch_size):
+            encoded = self.sentence_model.encode([texts[i] for i in batch], batch_size=len(batch))
+            for i, vector in zip(batch, encoded):
+                vectors[i] = vector
+        return vectors
+    
+    async def encode_texts_async(self, texts: List[str],
+                                 batch_size: int = PROFILE_ENCODE_BATCH_SIZE) -> List[np.ndarray]:
+        """
+        Bulk version of encode_text_async for cold caches.
+        
+        Each length-sorted batch is one call on the inference executor, so other
+        requests' encode calls can run between the batches of a large pool.
+        """
+        vectors: List[Optional[np.ndarray]] = [None] * len(texts)
+        for batch in length_sorted_batches(texts, batch_size):
+            encoded = await self.registry.executor.run(
+                SENTENCE_MODEL, self.encode_texts, [texts[i] for i in batch], len(batch)
+            )
+            for i, vector in zip(batch, encoded):
+                vectors[i] = vector
+        return vectors
+    
+    async def encode_profile_async(self, user_data: Dict) -> np.ndarray:
+        """Encode a profile, batched with concurrent encode calls"""
+        return await self.encode_text_async(self.build_profile_text(user_data))
+    
+    async def encode_text_async(self, profile_text: str) -> np.ndarray:
+        """Encode a profile text, batched with concurrent encode calls"""
+        return await self.registry.batcher(SENTENCE_MODEL).submit(profile_text)
+    
     def find_matches(self, user_vector: np.ndarray, candidate_vectors: List[np.ndarray], 
-                    top_k: int = 5) -> List[Tuple[int, float]]:
-        """Find top k similar users based on vector similarity"""
-        if len(candidate_vectors) == 0:
+                    top_k: int = 5, min_score: Optional[float] = None) -> List[Tuple[int, float]]:
+        """Find top k similar users based on vector similarity, scoring above min_score"""
+        if len(candidate_vectors) == 0 or user_vector.size == 0:
             return []
         
-        # Calculate cosine similarities
-        similarities = []
-        for i, candidate_vector in enumerate(candidate_vectors):
-            if candidate_vector.size == 0:
-                continue
-            similarity = np.dot(user_vector, candidate_vector) / (
-                np.linalg.norm(user_vector) * np.linalg.norm(candidate_vector)
-            )
-            similarities.append((i, similarity))
+        # Normalise every candidate once, score them with a single product
+        candidate_matrix, positions = stack_vectors(candidate_vectors)
+        scores, indices = cosine_top_k(user_vector, candidate_matrix, top_k)
+        return [
+            (int(positions[i]), float(score)) for i, score in zip(indices, scores)
+            if min_score is None or score > min_score
+        ]
+    
+    def find_matches_batch(self, user_vectors: np.ndarray, candidate_vectors: List[np.ndarray],
+                          top_k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find top k similar candidates for many users at once
         
-        # Sort by similarity and return top k
-        similarities.sort(key=lambda x: x[1], reverse=True)
-        return similarities[:top_k]
+        Returns:
+            Tuple of (scores, indices), each shaped (n_users, k); indices refer to candidate_vectors
+        """
+        candidate_matrix, positions = stack_vectors(candidate_vectors)
+        scores, indices = cosine_top_k(np.atleast_2d(user_vectors), candidate_matrix, top_k)
+        return scores, positions[indices] if positions.size else indices
     
     def is_toxic_content(self, text: str) -> bool:
         """Check if text contains toxic content"""
@@ -87,105 +152,175 @@ class StudentMatcher:
             return False
         
         try:
-            result = self.toxicity_classifier(text)
-            # Return True if toxic label has high confidence
-            for item in result:
-                print(f"Label: {item['label']}, Score: {item['score']}")
-                if item['label'].lower() == 'toxic' and float(item['score']) > 0.7:
-                    print("Toxic content detected")
-                    return True
+            return self._is_toxic_result(self.toxicity_classifier(text))
+        except Exception as e:
+            print(f"Error in toxicity detection: {e}")
             return False
+    
+    async def is_toxic_content_async(self, text: str) -> bool:
+        """Check if text contains toxic content, batched with concurrent checks"""
+        try:
+            result = await self.registry.batcher(TOXICITY_MODEL).submit(text)
+            return self._is_toxic_result(result)
         except Exception as e:
             print(f"Error in toxicity detection: {e}")
             return False
     
+    def _is_toxic_result(self, result: List[Dict]) -> bool:
+        # Return True if toxic label has high confidence
+        for item in result:
+            if item['label'].lower() == 'toxic' and float(item['score']) > 0.7:
+                return True
+        return False
+    
     def match_students_by_interests(self, target_interests: List[str], 
-                                  candidate_interests: List[List[str]]) -> List[Tuple[int, float]]:
+                                  candidate_interests: List[List[str]], k: Optional[int] = None,
+                                  min_score: Optional[float] = None) -> List[Tuple[int, float]]:
         """Match students based on shared interests"""
-        scores = []
         target_set = set(target_interests)
         
-        for i, candidate_int in enumerate(candidate_interests):
-            candidate_set = set(candidate_int)
-            # Calculate Jaccard similarity
-            intersection = len(target_set & candidate_set)
-            union = len(target_set | candidate_set)
-            score = intersection / union if union > 0 else 0
-            scores.append((i, score))
+        def scores():
+            for i, candidate_int in enumerate(candidate_interests):
+                candidate_set = set(candidate_int)
+                # Calculate Jaccard similarity
+                intersection = len(target_set & candidate_set)
+                union = len(target_set | candidate_set)
+                yield i, intersection / union if union > 0 else 0
+        
+        return top_k_pairs(scores(), k, min_score)
+    
+    def match_students_by_interest_index(self, user_id: int, interest_index,
+                                         candidate_ids: Optional[set] = None, k: Optional[int] = None,
+                                         min_score: Optional[float] = None) -> List[Tuple[int, float]]:
+        """
+        Match students on shared interests using the inverted interest index.
+        Only users sharing at least one interest are scored; returns (user id, Jaccard) pairs.
+        """
+        return interest_index.jaccard(user_id, candidate_ids, k, min_score)
+    
+    @staticmethod
+    def filiere_niveau_score(target_filiere: str, target_niveau: int,
+                             filiere: Optional[str], niveau: Optional[int]) -> float:
+        """Same filiere and similar niveau score of one candidate"""
+        score = 0.0
+        
+        # Same filiere gets high score
+        if filiere and filiere == target_filiere:
+            score += 0.6
+        
+        # Similar niveau gets additional score
+        if niveau:
+            niveau_diff = abs(niveau - target_niveau)
+            if niveau_diff == 0:
+                score += 0.4
+            elif niveau_diff == 1:
+                score += 0.2
+            elif niveau_diff == 2:
+                score += 0.1
         
-        return sorted(scores, key=lambda x: x[1], reverse=True)
+        return score
+    
+    @staticmethod
+    def _filiere_niveau_values(candidate: Dict) -> Tuple[Optional[str], Optional[int]]:
+        candidate_filiere = candidate.get('filiere')
+        candidate_niveau = candidate.get('niveau')
+        filiere_val = (candidate_filiere.value if hasattr(candidate_filiere, 'value') else str(candidate_filiere)) if candidate_filiere else None
+        niveau_val = (candidate_niveau.value if hasattr(candidate_niveau, 'value') else int(candidate_niveau)) if candidate_niveau else None
+        return filiere_val, niveau_val
     
     def match_by_filiere_niveau(self, target_filiere: str, target_niveau: int,
-                               candidates: List[Dict]) -> List[Tuple[int, float]]:
+                               candidates: List[Dict], k: Optional[int] = None,
+                               min_score: Optional[float] = None) -> List[Tuple[int, float]]:
         """Match students by same filiere and similar niveau"""
-        scores = []
-        
-        for i, candidate in enumerate(candidates):
-            score = 0.0
-            
-            # Same filiere gets high score
-            candidate_filiere = candidate.get('filiere')
-            if candidate_filiere:
-                filiere_val = candidate_filiere.value if hasattr(candidate_filiere, 'value') else str(candidate_filiere)
-                if filiere_val == target_filiere:
-                    score += 0.6
-            
-            # Similar niveau gets additional score
-            candidate_niveau = candidate.get('niveau')
-            if candidate_niveau:
-                niveau_val = candidate_niveau.value if hasattr(candidate_niveau, 'value') else int(candidate_niveau)
-                niveau_diff = abs(niveau_val - target_niveau)
-                if niveau_diff == 0:
-                    score += 0.4
-                elif niveau_diff == 1:
-                    score += 0.2
-                elif niveau_diff == 2:
-                    score += 0.1
-            
-            scores.append((i, score))
-        
-        return sorted(scores, key=lambda x: x[1], reverse=True)
+        scores = (
+            (i, self.filiere_niveau_score(target_filiere, target_niveau, *self._filiere_niveau_values(candidate)))
+            for i, candidate in enumerate(candidates)
+        )
+        return top_k_pairs(scores, k, min_score)
+    
+    def match_by_filiere_niveau_index(self, user_id: int, target_filiere: str, target_niveau: int,
+                                      academic_index, k: int, min_score: float = 0.0,
+                                      candidate_ids: Optional[set] = None) -> List[Tuple[int, float]]:
+        """
+        match_by_filiere_niveau over the filiere/niveau bucket index: only the best
+        k students are visited; returns (user id, score) pairs, ties by id
+        """
+        return academic_index.ranked(
+            lambda filiere, niveau: self.filiere_niveau_score(target_filiere, target_niveau, filiere, niveau),
+            k, min_score, exclude_ids=[user_id], candidate_ids=candidate_ids
+        )
     
     def recommend_mentors(self, student_competences: List[str], 
-                         mentor_competences: List[List[str]]) -> List[Tuple[int, float]]:
+                         mentor_competences: List[List[str]], k: Optional[int] = None,
+                         min_score: Optional[float] = None) -> List[Tuple[int, float]]:
         """Recommend mentors based on competency gaps"""
-        scores = []
         student_comp_set = set(student_competences)
         
-        for i, mentor_comp in enumerate(mentor_competences):
-            mentor_comp_set = set(mentor_comp)
-            # Score based on how many skills mentor has that student lacks
-            missing_skills = mentor_comp_set - student_comp_set
-            score = len(missing_skills) / len(mentor_comp_set) if mentor_comp_set else 0
-            scores.append((i, score))
+        def scores():
+            for i, mentor_comp in enumerate(mentor_competences):
+                mentor_comp_set = set(mentor_comp)
+                # Score based on how many skills mentor has that student lacks
+                missing_skills = mentor_comp_set - student_comp_set
+                yield i, len(missing_skills) / len(mentor_comp_set) if mentor_comp_set else 0
         
-        return sorted(scores, key=lambda x: x[1], reverse=True)
+        return top_k_pairs(scores(), k, min_score)
+    
+    def mentor_score_matrix(self, student_competences: List[List[str]],
+                            mentor_competences: List[List[str]]) -> np.ndarray:
+        """
+        recommend_mentors scores of many students at once: entry (i, j) is the
+        share of mentor j's skills that student i lacks
+        """
+        index: Dict[str, int] = {}
+        for comps in mentor_competences:
+            for comp in comps:
+                index.setdefault(comp, len(index))
+        students = np.zeros((len(student_competences), max(len(index), 1)), dtype=np.float32)
+        mentors = np.zeros((len(mentor_competences), max(len(index), 1)), dtype=np.float32)
+        for i, comps in enumerate(student_competences):
+            students[i, [index[c] for c in set(comps) if c in index]] = 1.0
+        for j, comps in enumerate(mentor_competences):
+            mentors[j, [index[c] for c in set(comps)]] = 1.0
+        
+        sizes = mentors.sum(axis=1)
+        missing = sizes[None, :] - students @ mentors.T
+        return np.divide(missing, sizes[None, :], out=np.zeros_like(missing), where=sizes[None, :] > 0)
+    
+    @staticmethod
+    def cross_filiere_score(user_filiere: str, user_niveau: int,
+                            filiere: Optional[str], niveau: Optional[int]) -> float:
+        """Interdisciplinary collaboration score of one candidate"""
+        score = 0.0
+        
+        # Different filiere gets points (for diversity)
+        if filiere and filiere != user_filiere:
+            score += 0.5
+        
+        # Similar niveau is important for peer collaboration
+        if niveau:
+            niveau_diff = abs(niveau - user_niveau)
+            if niveau_diff == 0:
+                score += 0.5
+            elif niveau_diff == 1:
+                score += 0.3
+        
+        return score
     
     def find_cross_filiere_collaborators(self, user_filiere: str, user_niveau: int,
-                                       candidates: List[Dict]) -> List[Tuple[int, float]]:
+                                       candidates: List[Dict], k: Optional[int] = None,
+                                       min_score: Optional[float] = None) -> List[Tuple[int, float]]:
         """Find collaborators from different filieres but similar niveau for interdisciplinary projects"""
-        scores = []
-        
-        for i, candidate in enumerate(candidates):
-            score = 0.0
-            
-            # Different filiere gets points (for diversity)
-            candidate_filiere = candidate.get('filiere')
-            if candidate_filiere:
-                filiere_val = candidate_filiere.value if hasattr(candidate_filiere, 'value') else str(candidate_filiere)
-                if filiere_val != user_filiere:
-                    score += 0.5
-            
-            # Similar niveau is important for peer collaboration
-            candidate_niveau = candidate.get('niveau')
-            if candidate_niveau:
-                niveau_val = candidate_niveau.value if hasattr(candidate_niveau, 'value') else int(candidate_niveau)
-                niveau_diff = abs(niveau_val - user_niveau)
-                if niveau_diff == 0:
-                    score += 0.5
-                elif niveau_diff == 1:
-                    score += 0.3
-            
-            scores.append((i, score))
-        
-        return sorted(scores, key=lambda x: x[1], reverse=True)
\ No newline at end of file
+        scores = (
+            (i, self.cross_filiere_score(user_filiere, user_niveau, *self._filiere_niveau_values(candidate)))
+            for i, candidate in enumerate(candidates)
+        )
+        return top_k_pairs(scores, k, min_score)
+    
+    def find_cross_filiere_collaborators_index(self, user_id: int, user_filiere: str, user_niveau: int,
+                                               academic_index, k: int, min_score: float = 0.0,
+                                               candidate_ids: Optional[set] = None) -> List[Tuple[int, float]]:
+        """find_cross_filiere_collaborators over the filiere/niveau bucket index, best k only"""
+        return academic_index.ranked(
+            lambda filiere, niveau: self.cross_filiere_score(user_filiere, user_niveau, filiere, niveau),
+            k, min_score, exclude_ids=[user_id], candidate_ids=candidate_ids
+        )
@@ -0,0 +1,160 @@
+from typing import Dict, List, Optional
+import math
+import os
+import time
+import numpy as np
+
+# Objective weight of each distinct competence a team covers, next to pairwise compatibility
+TEAM_COVERAGE_WEIGHT = float(os.getenv("TEAM_COVERAGE_WEIGHT", "0.05"))
+TEAM_FORMATION_TIME_LIMIT = float(os.getenv("TEAM_FORMATION_TIME_LIMIT", "2.0"))
+
+_IMPROVEMENT_EPS = 1e-9
+
+
+class TeamFormer:
+    """
+    Partitions a cohort into teams of (at most) team_size members, sizes differing by at most one.
+
+    Objective: sum over teams of the pairwise compatibility of their members, plus
+    coverage_weight per distinct competence present in each team. A greedy
+    assignment builds the initial teams, then a swap local search exchanges
+    members between teams while it improves the objective and the time limit allows.
+    """
+
+    def __init__(self, compatibility: np.ndarray, skills: np.ndarray,
+                 coverage_weight: float = TEAM_COVERAGE_WEIGHT, seed: int = 0):
+        """
+        Args:
+            compatibility: Symmetric n x n pairwise compatibility, zero diagonal
+            skills: n x s boolean matrix, True where member i has competence s
+        """
+        self.compatibility = np.asarray(compatibility, dtype=np.float64)
+        self.n = self.compatibility.shape[0]
+        skills = np.asarray(skills, dtype=np.int64)
+        # A cohort without any competence has no skill column (reshape cannot infer it)
+        self.skills = skills.reshape(self.n, -1) if skills.size else np.zeros((self.n, 0), dtype=np.int64)
+        self.coverage_weight = coverage_weight
+        self.rng = np.random.default_rng(seed)
+
+    def solve(self, team_size: int, time_limit: float = TEAM_FORMATION_TIME_LIMIT) -> Dict:
+        """
+        Returns:
+            Dict with 'teams' (member indices per team), 'objective', 'total_compatibility',
+            'coverage', 'initial_objective', 'swaps', 'passes' and 'elapsed_s'
+        """
+        started_at = time.perf_counter()
+        deadline = started_at + time_limit
+        if self.n == 0:
+            return self._result([], 0, 0, 0.0, started_at)
+
+        n_teams = max(1, math.ceil(self.n / team_size))
+        capacities = np.array([self.n // n_teams + (1 if t < self.n % n_teams else 0) for t in range(n_teams)])
+        self._greedy(n_teams, capacities)
+        initial_objective = self._objective()
+
+        swaps = passes = 0
+        improved = True
+        while improved and n_teams > 1 and time.perf_counter() < deadline:
+            improved = False
+            passes += 1
+            for a in self.rng.permutation(self.n):
+                if time.perf_counter() >= deadline:
+                    break
+                if self._best_swap(a):
+                    swaps += 1
+                    improved = True
+
+        teams = [np.flatnonzero(self.team_of == t).tolist() for t in range(n_teams)]
+        return self._result(teams, swaps, passes, initial_objective, started_at)
+
+    def _greedy(self, n_teams: int, capacities: np.ndarray):
+        C, S = self.compatibility, self.skills
+        self.team_of = np.full(self.n, -1, dtype=np.int64)
+        self.gain = np.zeros((self.n, n_teams), dtype=np.float64)  # compatibility of i with team t
+        self.counts = np.zeros((n_teams, S.shape[1]), dtype=np.int64)  # members of t holding skill s
+        sizes = np.zeros(n_teams, dtype=np.int64)
+
+        # Most skilled members seed the teams, then everyone joins the team they gain most from
+        order = np.argsort(-S.sum(axis=1), kind='stable')
+        for rank, i in enumerate(order):
+            if rank < n_teams:
+                team = rank
+            else:
+                new_skills = ((self.counts == 0) & (S[i] > 0)[None, :]).sum(axis=1)
+                gains = self.gain[i] + self.coverage_weight * new_skills
+                gains[sizes >= capacities] = -np.inf
+                team = int(np.argmax(gains))
+            self.team_of[i] = team
+            sizes[team] += 1
+            self.gain[:, team] += C[:, i]
+            self.counts[team] += S[i]
+
+    def _best_swap(self, a: int) -> bool:
+        """Apply the best improving swap of member a with a member of another team"""
+        C, S, w = self.compatibility, self.skills, self.coverage_weight
+        team_of = self.team_of
+        A = team_of[a]
+        rows = np.arange(self.n)
+
+        delta = (self.gain[a, team_of] - C[a] - self.gain[a, A]) + (self.gain[:, A] - C[:, a] - self.gain[rows, team_of])
+
+        if w and S.shape[1]:
+            counts_a = self.counts[A] - S[a]
+            covered_a = (counts_a[None, :] + S > 0).sum(axis=1) - (self.counts[A] > 0).sum()
+            counts_b = self.counts[team_of]
+            covered_b = (counts_b - S + S[a][None, :] > 0).sum(axis=1) - (counts_b > 0).sum(axis=1)
+            delta = delta + w * (covered_a + covered_b)
+
+        delta[team_of == A] = -np.inf
+        b = int(np.argmax(delta))
+        if delta[b] <= _IMPROVEMENT_EPS:
+            return False
+
+        B = team_of[b]
+        self.gain[:, A] += C[:, b] - C[:, a]
+        self.gain[:, B] += C[:, a] - C[:, b]
+        self.counts[A] += S[b] - S[a]
+        self.counts[B] += S[a] - S[b]
+        team_of[a], team_of[b] = B, A
+        return True
+
+    def _objective(self) -> float:
+        return self._total_compatibility() + self.coverage_weight * self._coverage()
+
+    def _total_compatibility(self) -> float:
+        return float(self.gain[np.arange(self.n), self.team_of].sum() / 2)
+
+    def _coverage(self) -> int:
+        return int((self.counts > 0).sum())
+
+    def team_score(self, members: List[int]) -> Dict:
+        """Average pairwise compatibility and competence coverage of one team"""
+        block = self.compatibility[np.ix_(members, members)]
+        pairs = len(members) * (len(members) - 1) / 2
+        return {
+            'avg_compatibility': float(block.sum() / 2 / pairs) if pairs else 0.0,
+            'skills_covered': int((self.skills[members].sum(axis=0) > 0).sum())
+        }
+
+    def _result(self, teams: List[List[int]], swaps: int, passes: int,
+                initial_objective: float, started_at: float) -> Dict:
+        return {
+            'teams': teams,
+            'objective': self._objective() if teams else 0.0,
+            'total_compatibility': self._total_compatibility() if teams else 0.0,
+            'coverage': self._coverage() if teams else 0,
+            'initial_objective': initial_objective,
+            'swaps': swaps,
+            'passes': passes,
+            'elapsed_s': round(time.perf_counter() - started_at, 3)
+        }
+
+
+def form_teams(compatibility: np.ndarray, skills: np.ndarray, team_size: int,
+               coverage_weight: float = TEAM_COVERAGE_WEIGHT,
+               time_limit: float = TEAM_FORMATION_TIME_LIMIT, seed: Optional[int] = 0) -> Dict:
+    """Convenience wrapper around TeamFormer.solve, adding per-team scores"""
+    former = TeamFormer(compatibility, skills, coverage_weight, seed)
+    result = former.solve(team_size, time_limit)
+    result['team_scores'] = [former.team_score(members) for members in result['teams']]
+    return result
@@ -0,0 +1,3 @@
+def enum_value(value):
+    """Raw value of a model enum field (profiles may hold the enum or its value)"""
+    return value.value if hasattr(value, 'value') else value
@@ -0,0 +1,112 @@
+import heapq
+import numpy as np
+from typing import Hashable, Iterable, List, Optional, Sequence, Tuple, Union
+
+VectorInput = Union[np.ndarray, Sequence[np.ndarray]]
+
+
+def normalize_rows(vectors: VectorInput) -> np.ndarray:
+    """
+    L2-normalise vectors into a contiguous float32 matrix.
+    Zero vectors stay zero so they score 0 against everything.
+    """
+    matrix = np.array(vectors, dtype=np.float32, copy=True, order='C')
+    if matrix.ndim == 1:
+        matrix = matrix[np.newaxis, :]
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    return matrix
+
+
+def stack_vectors(vectors: Sequence[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Stack the non-empty vectors of a list into a normalised matrix
+
+    Returns:
+        Tuple of (normalised matrix, positions of the stacked rows in the input list)
+    """
+    positions = np.array([i for i, v in enumerate(vectors) if v is not None and v.size > 0], dtype=np.int64)
+    if positions.size == 0:
+        return np.empty((0, 0), dtype=np.float32), positions
+    return normalize_rows([vectors[i] for i in positions]), positions
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices of the k highest scores along the last axis, best first; equal scores
+    rank by ascending index, including at the k-th place.
+    Uses argpartition so the cost is linear in the number of scores.
+    """
+    n = scores.shape[-1]
+    k = min(k, n)
+    if k <= 0:
+        return np.empty(scores.shape[:-1] + (0,), dtype=np.int64)
+
+    if k < n:
+        candidates = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+        candidate_scores = np.take_along_axis(scores, candidates, axis=-1)
+        kth = candidate_scores.min(axis=-1, keepdims=True)
+        # argpartition keeps an arbitrary subset of the scores tied at the k-th place:
+        # where some were left out, keep the lowest indices of the tie instead
+        tied = scores == kth
+        straddling = tied.sum(axis=-1) > (candidate_scores == kth).sum(axis=-1)
+        if straddling.any():
+            flat_scores, flat_tied, flat_kth = scores.reshape(-1, n), tied.reshape(-1, n), kth.reshape(-1)
+            flat_candidates = candidates.reshape(-1, k)
+            for row in np.flatnonzero(straddling.reshape(-1)):
+                above = np.flatnonzero(flat_scores[row] > flat_kth[row])
+                flat_candidates[row] = np.concatenate([above, np.flatnonzero(flat_tied[row])[:k - above.size]])
+            candidates = flat_candidates.reshape(candidates.shape)
+        candidates.sort(axis=-1)
+    else:
+        candidates = np.broadcast_to(np.arange(n), scores.shape).copy()
+
+    candidate_scores = np.take_along_axis(scores, candidates, axis=-1)
+    order = np.argsort(-candidate_scores, axis=-1, kind='stable')
+    return np.take_along_axis(candidates, order, axis=-1)
+
+
+def top_k_pairs(pairs: Iterable[Tuple[Hashable, float]], k: Optional[int] = None,
+                min_score: Optional[float] = None) -> List[Tuple[Hashable, float]]:
+    """
+    (key, score) pairs with the k highest scores, best first, ties by ascending key.
+
+    Pairs scoring min_score or less are dropped before selection; heapq keeps the
+    cost at O(n log k) instead of sorting every pair. k=None keeps every pair.
+    """
+    if min_score is not None:
+        pairs = (pair for pair in pairs if pair[1] > min_score)
+    if k is None:
+        return sorted(pairs, key=lambda pair: (-pair[1], pair[0]))
+    if k <= 0:
+        return []
+    return heapq.nsmallest(k, pairs, key=lambda pair: (-pair[1], pair[0]))
+
+
+def cosine_top_k(queries: np.ndarray, normalized_matrix: np.ndarray,
+                 k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Cosine top-k of one or many query vectors against a pre-normalised matrix
+
+    Args:
+        queries: A single vector (dim,) or a batch (n_queries, dim)
+        normalized_matrix: Candidate matrix produced by normalize_rows
+        k: Number of results per query
+
+    Returns:
+        Tuple of (scores, indices); 1-D for a single query, 2-D for a batch
+    """
+    single = np.ndim(queries) == 1
+    if normalized_matrix.shape[0] == 0:
+        empty_shape = (0,) if single else (len(queries), 0)
+        return np.empty(empty_shape, dtype=np.float32), np.empty(empty_shape, dtype=np.int64)
+
+    query_matrix = normalize_rows(queries)
+    scores = query_matrix @ normalized_matrix.T
+    indices = top_k(scores, k)
+    top_scores = np.take_along_axis(scores, indices, axis=-1)
+
+    if single:
+        return top_scores[0], indices[0]
+    return top_scores, indices
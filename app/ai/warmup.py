@@ -0,0 +1,159 @@
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio
+import os
+import time
+from .academic_index import get_academic_index
+from .ann_index import get_semantic_index
+from .chatbot.chatbot import get_chatbot
+from .corpus_file import get_mapped_corpus
+from .interest_index import get_interest_index
+from .minhash import get_minhash_index, MINHASH_LSH_ENABLED
+from .model_registry import ModelRegistry, get_model_registry, SENTENCE_MODEL, TOXICITY_MODEL, CHATBOT_MODEL
+from .recommendation_service import RecommendationService
+from ..models.models import Utilisateur
+
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+# Profiles whose embeddings are loaded into the in-memory cache at startup
+WARMUP_PRIME_PROFILES = int(os.getenv("WARMUP_PRIME_PROFILES", "2000"))
+
+PENDING = 'pending'
+RUNNING = 'running'
+READY = 'ready'
+FAILED = 'failed'
+
+
+class ComponentState:
+    """Warm-up progress of one component"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.status = PENDING
+        self.duration_seconds: Optional[float] = None
+        self.error: Optional[str] = None
+
+    def to_dict(self) -> Dict:
+        return {
+            'status': self.status,
+            'duration_seconds': round(self.duration_seconds, 3) if self.duration_seconds is not None else None,
+            'error': self.error
+        }
+
+
+class Warmup:
+    """
+    Background warm-up run once the app has started.
+
+    The server accepts connections right away; this task then loads every model,
+    builds the chatbot's intent embeddings, loads the similarity indexes and
+    primes the embedding cache, one component after the other, recording the
+    state and duration of each for the health endpoints. Blocking loads run off
+    the event loop, so requests keep being served meanwhile.
+    """
+
+    def __init__(self, registry: Optional[ModelRegistry] = None,
+                 prime_profiles: int = WARMUP_PRIME_PROFILES):
+        self.registry = registry or get_model_registry()
+        self.prime_profiles = prime_profiles
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        self._steps: List[Tuple[str, Callable[[], Awaitable[None]]]] = [
+            ('sentence_model', self._load_sentence_model),
+            ('toxicity_model', self._load_toxicity_model),
+            ('chatbot', self._load_chatbot),
+            ('indexes', self._load_indexes),
+            ('embedding_cache', self._prime_embeddings)
+        ]
+        self.components: Dict[str, ComponentState] = {name: ComponentState(name) for name, _ in self._steps}
+
+    def start(self):
+        """Schedule the warm-up on the running loop (no-op if already started)"""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def run(self):
+        self.started_at = time.time()
+        for name, step in self._steps:
+            await self._run_step(self.components[name], step)
+        self.finished_at = time.time()
+        statuses = ", ".join(f"{name}={c.status}" for name, c in self.components.items())
+        print(f"Warm-up finished in {self.finished_at - self.started_at:.1f}s ({statuses})")
+
+    async def _run_step(self, component: ComponentState, step: Callable[[], Awaitable[None]]):
+        component.status = RUNNING
+        start = time.perf_counter()
+        try:
+            await step()
+            component.status = READY
+        except Exception as e:
+            component.status = FAILED
+            component.error = str(e)
+            print(f"Error warming up {component.name}: {e}")
+        finally:
+            component.duration_seconds = time.perf_counter() - start
+
+    async def _load_model(self, name: str):
+        model = await self.registry.executor.run(name, self.registry.get, name)
+        if model is None:
+            raise RuntimeError(self.registry.stats()[name]['error'] or f"Model {name} unavailable")
+
+    async def _load_sentence_model(self):
+        await self._load_model(SENTENCE_MODEL)
+
+    async def _load_toxicity_model(self):
+        await self._load_model(TOXICITY_MODEL)
+
+    async def _load_chatbot(self):
+        await self._load_model(CHATBOT_MODEL)
+        # Embeds every intent example
+        await asyncio.get_running_loop().run_in_executor(None, get_chatbot)
+
+    async def _load_indexes(self):
+        await asyncio.get_running_loop().run_in_executor(None, get_semantic_index)
+        get_mapped_corpus().refresh(force=True)
+        await get_academic_index().ensure_loaded()
+        await get_interest_index().ensure_loaded()
+        if MINHASH_LSH_ENABLED:
+            await get_minhash_index().ensure_loaded()
+
+    async def _prime_embeddings(self):
+        """Load the stored embeddings of the first profiles into memory (encoding the missing ones)"""
+        service = RecommendationService(self.registry)
+        user_ids = await Utilisateur.all().order_by('id').limit(self.prime_profiles).values_list('id', flat=True)
+        profiles = await service.get_profiles_bulk(list(user_ids))
+        await service.embedding_store.get_vectors(profiles, service.matcher)
+
+    @property
+    def finished(self) -> bool:
+        return self.finished_at is not None
+
+    def report(self) -> Dict:
+        if self.started_at is None:
+            duration = None
+        else:
+            duration = round((self.finished_at or time.time()) - self.started_at, 3)
+        return {
+            'enabled': WARMUP_ENABLED,
+            'finished': self.finished,
+            'duration_seconds': duration,
+            'components': {name: component.to_dict() for name, component in self.components.items()}
+        }
+
+
+_warmup: Optional[Warmup] = None
+
+
+def get_warmup() -> Warmup:
+    """Return the process-wide startup warm-up"""
+    global _warmup
+    if _warmup is None:
+        _warmup = Warmup()
+    return _warmup
@@ -5,8 +5,9 @@ from fastapi.staticfiles import StaticFiles
 from tortoise.contrib.fastapi import register_tortoise
 from app.utils import get_allowed_origins
 from app.models.models import *
-from app.routers import auth, contact, groupe, publication, dashboard, profile, demande_soutien, recommendation, request, mentor
+from app.routers import auth, contact, groupe, publication, dashboard, profile, demande_soutien, recommendation, request, mentor, health
 from app.ai.chatbot.router import router as chatbot_router
+from app.ai.warmup import get_warmup, WARMUP_ENABLED
 
 from data.mock import (
     populate_mock_data
@@ -63,6 +64,7 @@ app.include_router(demande_soutien.router)
 app.include_router(recommendation.router)
 app.include_router(request.router)
 app.include_router(mentor.router)
+app.include_router(health.router)
 
 @app.on_event("startup")
 async def startup_event():
@@ -80,3 +82,11 @@ async def startup_event():
             
     except Exception as e:
         print(f"Error during startup: {e}")
+    
+    # Models, indexes and embedding cache load in the background; /health/ready reports progress
+    if WARMUP_ENABLED:
+        get_warmup().start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await get_warmup().stop()
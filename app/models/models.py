@@ -321,6 +321,33 @@ class UtilisateurMentor(Model):
         unique_together = (("utilisateur", "mentor"),)
 
 
+class ProfileEmbedding(Model):
+    id = fields.IntField(pk=True)
+    utilisateur = fields.ForeignKeyField("models.Utilisateur", related_name="profile_embeddings")
+    model_name = fields.CharField(max_length=200)
+    content_hash = fields.CharField(max_length=64)  # sha256 of model name + profile text
+    dimension = fields.IntField()
+    vector = fields.BinaryField()  # float16 bytes
+    updated_at = fields.DatetimeField(auto_now=True, index=True)
+
+    class Meta:
+        table = "profileEmbedding"
+        unique_together = (("utilisateur", "model_name"),)
+
+
+class MaterializedRecommendation(Model):
+    id = fields.IntField(pk=True)
+    utilisateur = fields.ForeignKeyField("models.Utilisateur", related_name="materialized_recommendations")
+    recommendation_type = fields.CharField(max_length=50)  # skill_swap, study_buddies, mentors...
+    result_limit = fields.IntField()
+    payload = fields.JSONField()  # ranked results, as returned by the endpoint
+    computed_at = fields.DatetimeField(auto_now=True)
+
+    class Meta:
+        table = "materializedRecommendation"
+        unique_together = (("utilisateur", "recommendation_type", "result_limit"),)
+
+
 # Pydantic schemas for API responses
 class UtilisateurSchema(BaseModel):
     id: int
@@ -9,6 +9,7 @@ from app.utils import (
     create_access_token,
     get_current_user
 )
+from app.ai.cache import get_recommendation_cache
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -162,6 +163,7 @@ async def update_current_user(
         current_user.password = get_password_hash(user_update.password)
 
     await current_user.save()
+    await get_recommendation_cache().invalidate_user(current_user.id)
 
     return UtilisateurSchema(
         id=current_user.id,
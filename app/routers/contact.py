@@ -3,6 +3,7 @@ from typing import List
 from pydantic import BaseModel
 from ..models.models import Contact, ContactSchema, ContactCreateSchema
 from ..ai.ai_service import AIService
+from ..ai.dependencies import get_ai_service
 
 router = APIRouter(prefix="/contact", tags=["contact"])
 
@@ -11,13 +12,15 @@ class ContactCreationResponse(BaseModel):
     contact_id: int
 
 @router.post("/", response_model=ContactCreationResponse)
-async def create_contact(contact_data: ContactCreateSchema):
+async def create_contact(
+    contact_data: ContactCreateSchema,
+    ai_service: AIService = Depends(get_ai_service)
+):
     """
     Create a new contact message
     """
     try:
         # Check for toxic content using AI service
-        ai_service = AIService()
         message_moderation = await ai_service.moderate_content(contact_data.message)
         print(f"Moderation result: {message_moderation}")
         if message_moderation['is_toxic']:
@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Response
+from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
 from typing import List, Optional
 from app.models.models import (
@@ -12,6 +13,11 @@ from app.models.models import (
     NiveauEnum
 )
 from app.utils import get_current_user
+from app.ai.cache import get_recommendation_cache, user_tag
+import os
+
+# Dashboards are served from cache for this long, then stale while they are rebuilt
+DASHBOARD_CACHE_TTL = float(os.getenv("DASHBOARD_CACHE_TTL", "60"))
 
 router = APIRouter(prefix="/dashboard", tags=["dashboard"])
 
@@ -41,9 +47,23 @@ class DashboardResponse(BaseModel):
     score: int
 
 @router.get("/", response_model=DashboardResponse)
-async def get_user_dashboard(current_user: Utilisateur = Depends(get_current_user)):
+async def get_user_dashboard(response: Response, current_user: Utilisateur = Depends(get_current_user)):
     """Get user dashboard information including competences, interests, mentor, field, level, and score"""
-    
+    dashboard, cache_status, age = await get_recommendation_cache().get_or_revalidate(
+        f"dashboard:{current_user.id}",
+        lambda: _build_dashboard(current_user),
+        # The mentor's name and email are shown too, so their profile writes expire it
+        tags=lambda dashboard: [user_tag(current_user.id)] + (
+            [user_tag(dashboard['parrain']['id'])] if dashboard.get('parrain') else []
+        ),
+        ttl=DASHBOARD_CACHE_TTL
+    )
+    response.headers["X-Cache"] = cache_status
+    response.headers["Age"] = str(int(age))
+    return dashboard
+
+
+async def _build_dashboard(current_user: Utilisateur) -> dict:
     # Get user competences
     user_competences = await UtilisateurCompetence.filter(utilisateur=current_user).prefetch_related('competence')
     competences = [
@@ -88,11 +108,11 @@ async def get_user_dashboard(current_user: Utilisateur = Depends(get_current_use
                 email=parrain_user.email
             )
     
-    return DashboardResponse(
+    return jsonable_encoder(DashboardResponse(
         competences=competences,
         centres_interet=centres_interet,
         parrain=parrain,
         filiere=current_user.filiere,
         niveau=current_user.niveau,
         score=current_user.score
-    )
\ No newline at end of file
+    ))
\ No newline at end of file
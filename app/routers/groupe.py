@@ -2,6 +2,8 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from app.models.models import Utilisateur, Groupe, UtilisateurGroupe
 from app.models.models import CentreInteret
 from app.utils import get_current_user
+from app.ai.materializer import get_materializer
+from app.ai.cache import get_recommendation_cache
 from pydantic import BaseModel
 
 class ChangementRole(BaseModel):
@@ -38,6 +40,9 @@ async def creer_groupe(
         statut="actif"
     )
 
+    await get_recommendation_cache().invalidate_user(current_user.id)
+    get_materializer().enqueue(current_user.id)
+
     return {"message": "Groupe créé", "groupe_id": groupe.id}
 
 
@@ -66,6 +71,9 @@ async def rejoindre_groupe(
         statut="actif"
     )
 
+    await get_recommendation_cache().invalidate_user(current_user.id)
+    get_materializer().enqueue(current_user.id)
+
     return {"message": f"Utilisateur {current_user.nom} a rejoint le groupe {groupe.nom}"}
 
 
@@ -84,6 +92,9 @@ async def quitter_groupe(
     # Suppression ou mise à jour du statut
     await lien.delete()  # Ou bien lien.statut = "quitté"; await lien.save()
 
+    await get_recommendation_cache().invalidate_user(current_user.id)
+    get_materializer().enqueue(current_user.id)
+
     return {"message": f"Utilisateur {current_user.nom} a quitté le groupe"}
 
 @router.post("/{groupe_id}/changer-role")
@@ -0,0 +1,69 @@
+from fastapi import APIRouter, Response, status
+from typing import Dict
+from tortoise import Tortoise
+from app.ai.warmup import get_warmup, WARMUP_ENABLED, FAILED
+import time
+
+router = APIRouter(prefix="/health", tags=["health"])
+
+STARTED_AT = time.time()
+
+
+async def _database_state() -> Dict:
+    start = time.perf_counter()
+    try:
+        await Tortoise.get_connection("default").execute_query("SELECT 1")
+    except Exception as e:
+        return {'status': FAILED, 'error': str(e)}
+    return {'status': 'ready', 'latency_ms': round((time.perf_counter() - start) * 1000, 2)}
+
+
+async def _report() -> Dict:
+    warmup = get_warmup()
+    database = await _database_state()
+    warmed_up = warmup.finished or not WARMUP_ENABLED
+    report = warmup.report()
+    return {
+        'status': 'ready' if warmed_up and database['status'] != FAILED else 'starting',
+        'uptime_seconds': round(time.time() - STARTED_AT, 1),
+        'database': database,
+        'warmup': report,
+        # Components that failed to warm up; the features using them answer in degraded mode
+        'degraded': [name for name, component in report['components'].items() if component['status'] == FAILED]
+    }
+
+
+@router.get("")
+async def health(response: Response):
+    """
+    Container health check: the process answers and the database is reachable.
+    """
+    report = await _report()
+    if report['database']['status'] == FAILED:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return report
+
+
+@router.get("/live")
+async def liveness():
+    """
+    The process is up and its event loop responds (even while warming up).
+    """
+    warmup = get_warmup()
+    return {
+        'status': 'alive',
+        'uptime_seconds': round(time.time() - STARTED_AT, 1),
+        'warmup': warmup.report()
+    }
+
+
+@router.get("/ready")
+async def readiness(response: Response):
+    """
+    Ready to take traffic: the database is reachable and the startup warm-up has finished.
+    Answers 503 until then, with the state and warm-up duration of every component.
+    """
+    report = await _report()
+    if report['status'] != 'ready':
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return report
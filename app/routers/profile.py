@@ -13,6 +13,11 @@ from app.models.models import (
     RoleEnum,
 )
 from app.utils import get_current_user
+from app.ai.interest_index import get_interest_index
+from app.ai.academic_index import get_academic_index
+from app.ai.minhash import get_minhash_index
+from app.ai.materializer import get_materializer
+from app.ai.cache import get_recommendation_cache
 
 router = APIRouter(prefix="/profile", tags=["profile"])
 
@@ -62,6 +67,7 @@ async def complete_profile(
     await UtilisateurCompetence.filter(utilisateur=current_user).delete()
 
     # Add new competences
+    competence_ids = []
     for competence_nom, competence_niveau in profile_data.competences.items():
         competence = await Competence.get_or_none(nom=competence_nom)
         if not competence:
@@ -72,11 +78,13 @@ async def complete_profile(
             niveau=competence_niveau,
             statut="active",
         )
+        competence_ids.append(competence.id)
 
     # Remove existing centres d'interet
     await UtilisateurCentreInteret.filter(utilisateur=current_user).delete()
 
     # Add new centres d'interet
+    centre_ids = []
     for centre_titre in profile_data.centres_interet:
         centre = await CentreInteret.get_or_none(titre=centre_titre)
         if not centre:
@@ -84,6 +92,14 @@ async def complete_profile(
         await UtilisateurCentreInteret.create(
             utilisateur=current_user, centreInteret=centre
         )
+        centre_ids.append(centre.id)
+    get_interest_index().set_user_interests(current_user.id, centre_ids)
+    get_minhash_index().update_user(current_user.id, centre_ids, competence_ids)
+    if await UtilisateurRole.exists(utilisateur=current_user, role=RoleEnum.STUDENT, statut="active"):
+        get_academic_index().set_user(current_user.id, current_user.filiere, current_user.niveau)
+    else:
+        # No longer an active student: out of the study-buddy and interdisciplinary pools
+        get_academic_index().remove_user(current_user.id)
 
     # Handle mentor role assignment
     if profile_data.is_mentor:
@@ -96,6 +112,13 @@ async def complete_profile(
                 utilisateur=current_user, role=RoleEnum.MENTOR, statut="active"
             )
 
+    # Cached profiles, pools and recommendations of this user are now outdated
+    await get_recommendation_cache().invalidate_user(current_user.id)
+
+    # Re-encode the profile for the semantic index, then recompute stored
+    # recommendations affected by the new profile and roles, in the background
+    get_materializer().enqueue(current_user.id, reembed=True)
+
     return {
         "message": "Profile completed successfully",
         "filiere": current_user.filiere,
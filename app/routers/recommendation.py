@@ -1,18 +1,48 @@
-from fastapi import APIRouter, HTTPException, status, Depends, Query
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Response
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 from app.models.models import (
     Utilisateur, 
+    UtilisateurRole,
     FiliereEnum, 
     NiveauEnum, 
     RoleEnum
 )
 from app.ai.recommendation_service import RecommendationService
+from app.ai.ai_service import AIService
+from app.ai.model_registry import ModelRegistry, get_model_registry
+from app.ai.dependencies import get_recommendation_service, get_ai_service
+from app.ai.materializer import get_materializer
+from app.ai.cache import get_recommendation_cache
+from app.ai.mentor_assignment import MENTOR_CAPACITY
 from app.utils import get_current_user
+import os
+
+# Maximum number of users compared in one batch compatibility request
+COMPATIBILITY_BATCH_MAX_USERS = int(os.getenv("COMPATIBILITY_BATCH_MAX_USERS", "100"))
+# Largest cohort split into teams in one request
+TEAM_FORMATION_MAX_USERS = int(os.getenv("TEAM_FORMATION_MAX_USERS", "1000"))
 
 router = APIRouter(prefix="/recommendations", tags=["recommendations"])
 
 
+async def _is_teacher(user: Utilisateur) -> bool:
+    return await UtilisateurRole.exists(utilisateur_id=user.id, role=RoleEnum.TEACHER, statut="active")
+
+
+async def _materialized(response: Response, recommendation_service: RecommendationService,
+                        user_id: int, recommendation_type: str, limit: int, fresh: bool) -> List[Dict]:
+    """Read stored recommendations (or recompute them) and expose their freshness in headers"""
+    stored = await get_materializer().get(
+        recommendation_service, user_id, recommendation_type, limit, fresh
+    )
+    response.headers["X-Recommendations-Computed-At"] = stored['computed_at'].isoformat()
+    response.headers["X-Recommendations-Source"] = stored['source']
+    response.headers["X-Cache"] = stored['cache']
+    response.headers["Age"] = str(int(stored['age']))
+    return stored['results']
+
+
 # Response models
 class SkillDetail(BaseModel):
     skill: str
@@ -74,19 +104,40 @@ class GroupRecommendation(BaseModel):
     interest: str
     match_score: float
 
+class CompatibilityBatchRequest(BaseModel):
+    other_ids: List[int]
+    user_id: Optional[int] = None  # defaults to the current user
+
+class TeamFormationRequest(BaseModel):
+    groupe_id: Optional[int] = None  # active members of this group...
+    filiere: Optional[FiliereEnum] = None  # ...or the students of this filiere/niveau
+    niveau: Optional[NiveauEnum] = None
+    team_size: int = 4
+    time_limit: float = 2.0  # seconds allowed to the solver
+
+class MentorAssignmentRequest(BaseModel):
+    capacity: int = MENTOR_CAPACITY  # maximum mentees per mentor
+    filiere: Optional[FiliereEnum] = None
+    niveau: Optional[NiveauEnum] = None
+    dry_run: bool = False  # compute the proposals without creating requests
+
 
 @router.get("/skill-swap", response_model=List[SkillSwapRecommendation])
 async def get_skill_swap_recommendations(
+    response: Response,
     limit: int = Query(default=10, ge=1, le=20, description="Maximum number of recommendations"),
-    current_user: Utilisateur = Depends(get_current_user)
+    fresh: bool = Query(default=False, description="Recompute now instead of reading stored results"),
+    current_user: Utilisateur = Depends(get_current_user),
+    recommendation_service: RecommendationService = Depends(get_recommendation_service)
 ):
     """
     Get AI-powered skill swap recommendations.
     Finds users who have skills you lack or need improvement in, and vice versa.
     """
     try:
-        recommendation_service = RecommendationService()
-        recommendations = await recommendation_service.skill_swap(current_user.id, limit)
+        recommendations = await _materialized(
+            response, recommendation_service, current_user.id, 'skill_swap', limit, fresh
+        )
         
         # Convert to response model
         response_recommendations = []
@@ -147,15 +198,19 @@ async def get_skill_swap_recommendations(
 
 @router.get("/study-buddies", response_model=List[StudyBuddyRecommendation])
 async def get_study_buddy_recommendations(
+    response: Response,
     limit: int = Query(default=5, ge=1, le=20, description="Maximum number of recommendations"),
-    current_user: Utilisateur = Depends(get_current_user)
+    fresh: bool = Query(default=False, description="Recompute now instead of reading stored results"),
+    current_user: Utilisateur = Depends(get_current_user),
+    recommendation_service: RecommendationService = Depends(get_recommendation_service)
 ):
     """
     Get study buddy recommendations based on similar interests and academic level.
     """
     try:
-        recommendation_service = RecommendationService()
-        recommendations = await recommendation_service.find_study_buddies(current_user.id, limit)
+        recommendations = await _materialized(
+            response, recommendation_service, current_user.id, 'study_buddies', limit, fresh
+        )
         
         response_recommendations = []
         for rec in recommendations:
@@ -183,15 +238,19 @@ async def get_study_buddy_recommendations(
 
 @router.get("/mentors", response_model=List[MentorRecommendation])
 async def get_mentor_recommendations(
+    response: Response,
     limit: int = Query(default=5, ge=1, le=20, description="Maximum number of recommendations"),
-    current_user: Utilisateur = Depends(get_current_user)
+    fresh: bool = Query(default=False, description="Recompute now instead of reading stored results"),
+    current_user: Utilisateur = Depends(get_current_user),
+    recommendation_service: RecommendationService = Depends(get_recommendation_service)
 ):
     """
     Get mentor recommendations based on competency gaps and academic progression.
     """
     try:
-        recommendation_service = RecommendationService()
-        recommendations = await recommendation_service.find_mentors(current_user.id, limit)
+        recommendations = await _materialized(
+            response, recommendation_service, current_user.id, 'mentors', limit, fresh
+        )
         
         response_recommendations = []
         for rec in recommendations:
@@ -219,15 +278,19 @@ async def get_mentor_recommendations(
 
 @router.get("/interdisciplinary", response_model=List[StudyBuddyRecommendation])
 async def get_interdisciplinary_recommendations(
+    response: Response,
     limit: int = Query(default=5, ge=1, le=20, description="Maximum number of recommendations"),
-    current_user: Utilisateur = Depends(get_current_user)
+    fresh: bool = Query(default=False, description="Recompute now instead of reading stored results"),
+    current_user: Utilisateur = Depends(get_current_user),
+    recommendation_service: RecommendationService = Depends(get_recommendation_service)
 ):
     """
     Get interdisciplinary collaboration recommendations from different academic programs.
     """
     try:
-        recommendation_service = RecommendationService()
-        recommendations = await recommendation_service.find_interdisciplinary_collaborators(current_user.id, limit)
+        recommendations = await _materialized(
+            response, recommendation_service, current_user.id, 'interdisciplinary', limit, fresh
+        )
         
         response_recommendations = []
         for rec in recommendations:
@@ -255,15 +318,19 @@ async def get_interdisciplinary_recommendations(
 
 @router.get("/groups", response_model=List[GroupRecommendation])
 async def get_group_recommendations(
+    response: Response,
     limit: int = Query(default=5, ge=1, le=20, description="Maximum number of recommendations"),
-    current_user: Utilisateur = Depends(get_current_user)
+    fresh: bool = Query(default=False, description="Recompute now instead of reading stored results"),
+    current_user: Utilisateur = Depends(get_current_user),
+    recommendation_service: RecommendationService = Depends(get_recommendation_service)
 ):
     """
     Get group recommendations based on user interests.
     """
     try:
-        recommendation_service = RecommendationService()
-        recommendations = await recommendation_service.get_group_recommendations(current_user.id, limit)
+        recommendations = await _materialized(
+            response, recommendation_service, current_user.id, 'groups', limit, fresh
+        )
         
         response_recommendations = []
         for rec in recommendations:
@@ -285,15 +352,19 @@ async def get_group_recommendations(
 
 @router.get("/semantic", response_model=List[StudyBuddyRecommendation])
 async def get_semantic_recommendations(
+    response: Response,
     limit: int = Query(default=5, ge=1, le=20, description="Maximum number of recommendations"),
-    current_user: Utilisateur = Depends(get_current_user)
+    fresh: bool = Query(default=False, description="Recompute now instead of reading stored results"),
+    current_user: Utilisateur = Depends(get_current_user),
+    recommendation_service: RecommendationService = Depends(get_recommendation_service)
 ):
     """
     Get semantic similarity recommendations using AI profile matching.
     """
     try:
-        recommendation_service = RecommendationService()
-        recommendations = await recommendation_service.get_semantic_matches(current_user.id, limit)
+        recommendations = await _materialized(
+            response, recommendation_service, current_user.id, 'semantic', limit, fresh
+        )
         
         response_recommendations = []
         for rec in recommendations:
@@ -317,4 +388,142 @@ async def get_semantic_recommendations(
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error generating semantic recommendations: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+@router.post("/compatibility")
+async def get_compatibility_batch(
+    request: CompatibilityBatchRequest,
+    current_user: Utilisateur = Depends(get_current_user),
+    ai_service: AIService = Depends(get_ai_service)
+):
+    """
+    Compare one user (the current user by default) with up to COMPATIBILITY_BATCH_MAX_USERS others.
+    Each result is the same analysis as for a single pair. Only teachers can compare another user.
+    """
+    if request.user_id is not None and request.user_id != current_user.id:
+        if not await _is_teacher(current_user):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Seuls les enseignants peuvent analyser la compatibilité d'un autre utilisateur"
+            )
+    if len(request.other_ids) > COMPATIBILITY_BATCH_MAX_USERS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {COMPATIBILITY_BATCH_MAX_USERS} users can be compared at once"
+        )
+    
+    try:
+        return await ai_service.analyze_compatibility_batch(
+            request.user_id or current_user.id, request.other_ids
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error computing compatibility: {str(e)}"
+        )
+
+@router.post("/teams")
+async def form_teams(
+    request: TeamFormationRequest,
+    current_user: Utilisateur = Depends(get_current_user),
+    ai_service: AIService = Depends(get_ai_service)
+):
+    """
+    Staff job (teachers only): split a cohort (the members of a group, or the students
+    of a filiere/niveau) into balanced project teams maximising compatibility and competence coverage
+    """
+    if not await _is_teacher(current_user):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Seuls les enseignants peuvent former les équipes"
+        )
+    if request.groupe_id is None and request.filiere is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="groupe_id or filiere is required"
+        )
+    if request.team_size < 2 or not 0 < request.time_limit <= 30:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="team_size must be at least 2 and time_limit between 0 and 30 seconds"
+        )
+    
+    try:
+        user_ids = await ai_service.cohort_user_ids(request.groupe_id, request.filiere, request.niveau)
+        if not user_ids:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Cohorte vide")
+        if len(user_ids) > TEAM_FORMATION_MAX_USERS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"At most {TEAM_FORMATION_MAX_USERS} users can be split into teams at once"
+            )
+        return await ai_service.form_teams(user_ids, request.team_size, request.time_limit)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error forming teams: {str(e)}"
+        )
+
+@router.post("/mentor-assignments")
+async def assign_mentors(
+    request: MentorAssignmentRequest,
+    current_user: Utilisateur = Depends(get_current_user),
+    ai_service: AIService = Depends(get_ai_service)
+):
+    """
+    Staff job (teachers only): assign mentors to the whole student cohort under
+    mentor capacities and create the proposals as pending mentoring requests
+    """
+    if not await _is_teacher(current_user):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Seuls les enseignants peuvent lancer l'affectation des mentors"
+        )
+    if request.capacity < 1:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="capacity must be at least 1"
+        )
+    
+    try:
+        return await ai_service.propose_mentor_assignments(
+            request.capacity, request.filiere, request.niveau, request.dry_run
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error assigning mentors: {str(e)}"
+        )
+
+async def _require_staff(current_user: Utilisateur = Depends(get_current_user)) -> Utilisateur:
+    """Operational endpoints are reserved to teachers"""
+    if not await _is_teacher(current_user):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Réservé aux enseignants"
+        )
+    return current_user
+
+@router.get("/models/stats")
+async def get_model_stats(
+    current_user: Utilisateur = Depends(_require_staff),
+    registry: ModelRegistry = Depends(get_model_registry)
+):
+    """
+    Get load count, load time and memory footprint of each shared AI model (teachers only).
+    """
+    return registry.stats()
+
+@router.get("/cache/stats")
+async def get_cache_stats(current_user: Utilisateur = Depends(_require_staff)):
+    """
+    Get hit rates of the recommendation cache and the state of the background materializer (teachers only).
+    """
+    return {
+        'cache': get_recommendation_cache().stats(),
+        'materializer': get_materializer().stats()
+    }
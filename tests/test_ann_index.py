@@ -0,0 +1,58 @@
+import numpy as np
+from app.ai.ann_index import ExactIndex, IVFIndex
+
+
+def clustered_vectors(n: int, dim: int = 32, clusters: int = 20, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    return (centers[rng.integers(clusters, size=n)] + 0.3 * rng.normal(size=(n, dim))).astype(np.float32)
+
+
+def build(index, vectors):
+    index.upsert_many(list(range(len(vectors))), vectors)
+    return index
+
+
+def test_exact_index_returns_nearest_neighbours_first():
+    vectors = clustered_vectors(200)
+    index = build(ExactIndex(dtype='float32'), vectors)
+    hits = index.search(vectors[7], 5)
+    assert hits[0][0] == 7
+    assert [score for _, score in hits] == sorted((score for _, score in hits), reverse=True)
+
+
+def test_ivf_recall_against_exact_search():
+    vectors = clustered_vectors(2000)
+    index = build(IVFIndex(n_probe=8), vectors)
+    index.train()
+    report = index.recall_report(clustered_vectors(50, seed=1), k=10)
+    assert index.is_trained
+    assert report['recall_at_k'] >= 0.9
+
+
+def test_ivf_keeps_upserts_and_deletes_after_training():
+    vectors = clustered_vectors(500)
+    index = build(IVFIndex(n_probe=4), vectors)
+    index.train()
+    index.upsert(10_000, vectors[3])
+    assert 10_000 in {item_id for item_id, _ in index.search(vectors[3], 2)}
+    index.delete(3)
+    assert 3 not in {item_id for item_id, _ in index.search(vectors[3], 10)}
+    assert 3 not in index and len(index) == 500
+
+
+def test_search_excludes_ids():
+    vectors = clustered_vectors(100)
+    index = build(ExactIndex(), vectors)
+    assert 5 not in {item_id for item_id, _ in index.search(vectors[5], 10, exclude=[5])}
+
+
+def test_saved_index_loads_with_the_same_results(tmp_path):
+    vectors = clustered_vectors(500)
+    index = build(IVFIndex(n_probe=4), vectors)
+    index.train()
+    path = str(tmp_path / "index.npz")
+    index.save(path)
+    loaded = ExactIndex.load(path)
+    assert isinstance(loaded, IVFIndex) and loaded.is_trained
+    assert loaded.search(vectors[0], 10) == index.search(vectors[0], 10)
@@ -0,0 +1,94 @@
+import asyncio
+from app.ai.cache import RecommendationCache, CACHE_HIT, CACHE_MISS, CACHE_STALE, user_tag
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class Counter:
+    """Async compute recording how many times it ran"""
+
+    def __init__(self, delay: float = 0.0):
+        self.calls = 0
+        self.delay = delay
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return f"value-{self.calls}"
+
+
+def test_concurrent_misses_compute_once():
+    async def scenario():
+        cache = RecommendationCache()
+        compute = Counter(delay=0.05)
+        results = await asyncio.gather(*(cache.get_or_compute("k", compute) for _ in range(10)))
+        return cache, compute, results
+
+    cache, compute, results = run(scenario())
+    assert compute.calls == 1
+    assert results == ["value-1"] * 10
+    assert cache.misses == 1 and cache.coalesced == 9
+
+
+def test_cancelled_first_caller_does_not_cancel_waiters():
+    async def scenario():
+        cache = RecommendationCache()
+        compute = Counter(delay=0.05)
+        first = asyncio.create_task(cache.get_or_compute("k", compute))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(cache.get_or_compute("k", compute))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        value = await second
+        return value, compute.calls, await cache.get_or_compute("k", compute)
+
+    value, calls, cached = run(scenario())
+    assert value == "value-1"
+    assert calls == 1
+    assert cached == "value-1"
+
+
+def test_expired_entry_is_served_stale_and_refreshed_in_background():
+    async def scenario():
+        cache = RecommendationCache(ttl=0.05)
+        compute = Counter()
+        first = await cache.get_or_revalidate("k", compute)
+        hit = await cache.get_or_revalidate("k", compute)
+        await asyncio.sleep(0.1)
+        stale = await cache.get_or_revalidate("k", compute)
+        await asyncio.gather(*cache._refreshes)
+        refreshed = await cache.get_or_revalidate("k", compute)
+        return first, hit, stale, refreshed
+
+    first, hit, stale, refreshed = run(scenario())
+    assert first[:2] == ("value-1", CACHE_MISS)
+    assert hit[:2] == ("value-1", CACHE_HIT)
+    assert stale[:2] == ("value-1", CACHE_STALE)
+    assert refreshed[:2] == ("value-2", CACHE_HIT)
+
+
+def test_invalidated_user_entries_become_stale():
+    async def scenario():
+        cache = RecommendationCache()
+        compute = Counter()
+        await cache.get_or_revalidate("mine", compute, tags=[user_tag(1)])
+        await cache.get_or_revalidate("other", compute, tags=[user_tag(2)])
+        await cache.invalidate_user(1)
+        return (await cache.get_or_revalidate("mine", compute))[1], (await cache.get_or_revalidate("other", compute))[1]
+
+    assert run(scenario()) == (CACHE_STALE, CACHE_HIT)
+
+
+def test_compute_in_flight_during_invalidation_is_not_stored():
+    async def scenario():
+        cache = RecommendationCache()
+        compute = Counter(delay=0.05)
+        pending = asyncio.create_task(cache.get_or_compute("k", compute, tags=[user_tag(1)]))
+        await asyncio.sleep(0.01)
+        await cache.invalidate_user(1)
+        await pending
+        return await cache.get_or_compute("k", compute, tags=[user_tag(1)])
+
+    assert run(scenario()) == "value-2"
@@ -0,0 +1,42 @@
+import itertools
+import numpy as np
+from app.ai.mentor_assignment import assign_mentors
+
+
+def brute_force_best(scores: np.ndarray, capacities) -> float:
+    """Best total over every choice of mentor (or none) per student"""
+    best = 0.0
+    options = [None] + list(range(scores.shape[1]))
+    for choice in itertools.product(options, repeat=scores.shape[0]):
+        load = [sum(1 for mentor in choice if mentor == j) for j in range(scores.shape[1])]
+        if any(count > capacity for count, capacity in zip(load, capacities)):
+            continue
+        best = max(best, sum(scores[i, j] for i, j in enumerate(choice) if j is not None and scores[i, j] > 0))
+    return best
+
+
+def test_assignment_respects_capacities():
+    scores = np.random.default_rng(0).random((12, 3))
+    pairs = assign_mentors(scores, [2, 5, 1])
+    load = np.bincount([mentor for _, mentor, _ in pairs], minlength=3)
+    assert np.all(load <= [2, 5, 1])
+    assert len({student for student, _, _ in pairs}) == len(pairs) == 8
+
+
+def test_assignment_maximises_the_total_score():
+    rng = np.random.default_rng(1)
+    for _ in range(5):
+        scores = rng.random((5, 3)) - 0.2
+        capacities = rng.integers(0, 3, size=3).tolist()
+        pairs = assign_mentors(scores, capacities)
+        assert np.isclose(sum(score for _, _, score in pairs), brute_force_best(scores, capacities))
+
+
+def test_pairs_without_a_positive_score_are_not_proposed():
+    scores = np.array([[0.5, 0.0], [-1.0, 0.0]])
+    assert assign_mentors(scores, [1, 1]) == [(0, 0, 0.5)]
+
+
+def test_no_mentor_slots():
+    assert assign_mentors(np.ones((3, 2)), [0, 0]) == []
+    assert assign_mentors(np.zeros((0, 2)), [1, 1]) == []
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+from app.ai.ann_index import ExactIndex
+from app.ai.quantization import QuantizedMatrix, quantize_int8, encode_vector, decode_vector, DTYPES, INT8
+from app.ai.vector_search import normalize_rows, cosine_top_k
+
+
+def random_vectors(n: int, dim: int = 64, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+
+
+def test_int8_codes_approximate_the_input():
+    vectors = random_vectors(100)
+    codes, scales = quantize_int8(vectors)
+    assert codes.dtype == np.int8
+    error = np.abs(codes * scales[:, None] - vectors).max(axis=1)
+    assert np.all(error <= scales / 2 + 1e-6)
+
+
+@pytest.mark.parametrize("dtype", DTYPES)
+def test_encoded_vector_round_trips(dtype):
+    vector = random_vectors(1)[0]
+    decoded = decode_vector(encode_vector(vector, dtype), dtype)
+    assert decoded.dtype == np.float32
+    assert np.allclose(decoded, vector, atol=0.05)
+
+
+@pytest.mark.parametrize("dtype", DTYPES)
+def test_matrix_scores_approximate_float32_scores(dtype):
+    vectors = normalize_rows(random_vectors(500))
+    query = normalize_rows(random_vectors(1, seed=1))[0]
+    scores = QuantizedMatrix.from_float32(vectors, dtype).dot(query)
+    assert np.abs(scores - vectors @ query).max() < 0.02
+
+
+def test_int8_shortlist_reranked_in_float32_matches_exact_top_k():
+    k, rerank_factor = 10, 4
+    vectors = random_vectors(3000)
+    index = ExactIndex(dtype=INT8)
+    index.upsert_many(list(range(len(vectors))), vectors)
+    normalized = normalize_rows(vectors)
+    for query in random_vectors(20, seed=2):
+        shortlist = [item_id for item_id, _ in index.search(query, k * rerank_factor)]
+        _, positions = cosine_top_k(query, normalized[shortlist], k)
+        _, expected = cosine_top_k(query, normalized, k)
+        assert [shortlist[i] for i in positions] == expected.tolist()
@@ -0,0 +1,43 @@
+import numpy as np
+from app.ai.team_formation import TeamFormer, form_teams
+
+
+def random_cohort(n: int, skills: int = 12, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    compatibility = rng.random((n, n))
+    compatibility = (compatibility + compatibility.T) / 2
+    np.fill_diagonal(compatibility, 0.0)
+    return compatibility, rng.random((n, skills)) < 0.2
+
+
+def test_every_member_is_placed_once_in_balanced_teams():
+    compatibility, skills = random_cohort(23)
+    result = form_teams(compatibility, skills, team_size=4, time_limit=1.0)
+    members = sorted(member for team in result['teams'] for member in team)
+    sizes = [len(team) for team in result['teams']]
+    assert members == list(range(23))
+    assert max(sizes) <= 4 and max(sizes) - min(sizes) <= 1
+    assert len(result['team_scores']) == len(result['teams'])
+
+
+def test_local_search_never_lowers_the_greedy_objective():
+    compatibility, skills = random_cohort(40, seed=3)
+    result = TeamFormer(compatibility, skills).solve(team_size=5, time_limit=1.0)
+    assert result['objective'] >= result['initial_objective'] - 1e-9
+
+
+def test_compatible_pairs_end_up_together():
+    # Two obvious cliques: members only like the members of their own clique
+    compatibility = np.zeros((6, 6))
+    for clique in ([0, 2, 4], [1, 3, 5]):
+        for a in clique:
+            for b in clique:
+                if a != b:
+                    compatibility[a, b] = 1.0
+    result = form_teams(compatibility, np.zeros((6, 1), dtype=bool), team_size=3, time_limit=1.0)
+    assert sorted(sorted(team) for team in result['teams']) == [[0, 2, 4], [1, 3, 5]]
+
+
+def test_empty_cohort():
+    result = form_teams(np.zeros((0, 0)), np.zeros((0, 0), dtype=bool), team_size=4)
+    assert result['teams'] == []
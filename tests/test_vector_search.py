@@ -0,0 +1,128 @@
+import numpy as np
+import pytest
+from app.ai.student_matcher import StudentMatcher
+from app.ai.vector_search import normalize_rows, stack_vectors, top_k, cosine_top_k
+
+
+def naive_cosine(a: np.ndarray, b: np.ndarray) -> float:
+    norms = np.linalg.norm(a) * np.linalg.norm(b)
+    return float(np.dot(a, b) / norms) if norms else 0.0
+
+
+def naive_matches(user_vector, candidate_vectors, k, min_score=None):
+    """Per-pair cosine over the non-empty candidates, best first, ties by position"""
+    scored = [
+        (i, naive_cosine(user_vector, vector)) for i, vector in enumerate(candidate_vectors)
+        if vector is not None and vector.size > 0
+    ]
+    scored.sort(key=lambda pair: (-pair[1], pair[0]))
+    return [(i, score) for i, score in scored[:k] if min_score is None or score > min_score]
+
+
+def random_vectors(n: int, dim: int = 16, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+
+
+def assert_same_matches(actual, expected):
+    assert [i for i, _ in actual] == [i for i, _ in expected]
+    assert np.allclose([score for _, score in actual], [score for _, score in expected], atol=1e-5)
+
+
+@pytest.fixture
+def matcher():
+    return StudentMatcher()  # the sentence model is only loaded on first encode
+
+
+def test_find_matches_agrees_with_per_pair_cosine(matcher):
+    candidates = list(random_vectors(200))
+    user_vector = random_vectors(1, seed=1)[0]
+    for k in (1, 5, 50):
+        assert_same_matches(matcher.find_matches(user_vector, candidates, k), naive_matches(user_vector, candidates, k))
+
+
+def test_k_larger_than_the_candidate_count_returns_every_candidate(matcher):
+    candidates = list(random_vectors(7))
+    user_vector = random_vectors(1, seed=1)[0]
+    matches = matcher.find_matches(user_vector, candidates, 100)
+    assert len(matches) == 7
+    assert_same_matches(matches, naive_matches(user_vector, candidates, 100))
+
+
+def test_min_score_cutoff_is_exclusive(matcher):
+    candidates = list(random_vectors(100))
+    user_vector = candidates[0].copy()
+    for min_score in (-1.0, 0.0, 0.2, 0.999):
+        matches = matcher.find_matches(user_vector, candidates, 100, min_score=min_score)
+        assert all(score > min_score for _, score in matches)
+        assert_same_matches(matches, naive_matches(user_vector, candidates, 100, min_score))
+
+
+def test_empty_inputs(matcher):
+    assert matcher.find_matches(np.array([]), list(random_vectors(3)), 5) == []
+    assert matcher.find_matches(random_vectors(1)[0], [], 5) == []
+    assert matcher.find_matches(random_vectors(1)[0], [np.array([]), None], 5) == []
+
+
+def test_empty_candidates_are_skipped_and_positions_kept(matcher):
+    vectors = random_vectors(4)
+    candidates = [np.array([]), vectors[0], None, vectors[1], np.array([]), vectors[2]]
+    matches = matcher.find_matches(vectors[1], candidates, 3)
+    assert matches[0] == (3, pytest.approx(1.0, abs=1e-5))
+    assert {i for i, _ in matches} == {1, 3, 5}
+    assert_same_matches(matches, naive_matches(vectors[1], candidates, 3))
+
+
+def test_zero_vectors_score_zero(matcher):
+    candidates = [np.zeros(16, dtype=np.float32), random_vectors(1)[0]]
+    scores = dict(matcher.find_matches(random_vectors(1, seed=1)[0], candidates, 2))
+    assert scores[0] == 0.0
+    assert dict(matcher.find_matches(np.zeros(16, dtype=np.float32), candidates, 2)) == {0: 0.0, 1: 0.0}
+
+
+def test_find_matches_batch_agrees_with_single_queries(matcher):
+    candidates = list(random_vectors(50))
+    candidates[10] = np.array([])
+    queries = random_vectors(6, seed=2)
+    scores, indices = matcher.find_matches_batch(queries, candidates, 5)
+    assert scores.shape == indices.shape == (6, 5)
+    for query, row_scores, row_indices in zip(queries, scores, indices):
+        expected = naive_matches(query, candidates, 5)
+        assert row_indices.tolist() == [i for i, _ in expected]
+        assert np.allclose(row_scores, [score for _, score in expected], atol=1e-5)
+
+
+def test_stack_vectors_positions_map_rows_to_the_input():
+    vectors = random_vectors(3)
+    matrix, positions = stack_vectors([None, vectors[0], np.array([]), vectors[1], vectors[2]])
+    assert positions.tolist() == [1, 3, 4]
+    assert np.allclose(matrix, normalize_rows(vectors))
+    matrix, positions = stack_vectors([np.array([]), None])
+    assert matrix.shape == (0, 0) and positions.size == 0
+
+
+def test_cosine_top_k_single_and_batched_queries():
+    matrix = normalize_rows(random_vectors(30))
+    queries = random_vectors(4, seed=3)
+    batch_scores, batch_indices = cosine_top_k(queries, matrix, 5)
+    assert batch_indices.shape == (4, 5)
+    for query, row_scores, row_indices in zip(queries, batch_scores, batch_indices):
+        scores, indices = cosine_top_k(query, matrix, 5)
+        assert indices.tolist() == row_indices.tolist()
+        assert np.allclose(scores, row_scores)
+    scores, indices = cosine_top_k(queries[0], np.empty((0, 0), dtype=np.float32), 5)
+    assert scores.size == indices.size == 0
+
+
+def test_top_k_breaks_ties_by_ascending_index():
+    scores = np.array([1.0, 3.0, 2.0, 3.0, 2.0, 2.0, 0.0])
+    assert top_k(scores, 3).tolist() == [1, 3, 2]
+    assert top_k(scores, 4).tolist() == [1, 3, 2, 4]
+    assert top_k(np.tile(scores, (2, 1)), 3).tolist() == [[1, 3, 2], [1, 3, 2]]
+    assert top_k(np.zeros(10), 4).tolist() == [0, 1, 2, 3]
+
+
+def test_top_k_bounds():
+    scores = np.array([0.5, 0.1, 0.9])
+    assert top_k(scores, 10).tolist() == [2, 0, 1]
+    assert top_k(scores, 0).tolist() == []
+    assert top_k(np.zeros((2, 3)), 0).shape == (2, 0)